@@ -0,0 +1,124 @@
+"""
+Order parameters describing the structure of a flock.
+
+They are computed from the neighbor relations found while updating the flock,
+so they cost no spatial query of their own: `update_boids` records every pair
+of boids within the locality radius, and the distance to each boid's nearest
+neighbor, on the frames analytics are due.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class NeighborGraph:
+    """
+    Neighbor relations of one frame. `pairs` is an (m, 2) array with every pair of
+    boids within the locality radius once, lower index first. `nearest_distances`
+    holds the distance from each boid to its nearest neighbor, or infinity where
+    there is none within the radius.
+    """
+
+    pairs: np.ndarray
+    nearest_distances: np.ndarray
+
+
+@dataclass(frozen=True)
+class FlockAnalytics:
+    frame: int
+    polarization: float
+    angular_momentum: float
+    cluster_sizes: np.ndarray
+    nearest_distances: np.ndarray
+
+    @property
+    def clusters(self) -> int:
+        return len(self.cluster_sizes)
+
+    @property
+    def largest_cluster(self) -> int:
+        return int(self.cluster_sizes[0]) if len(self.cluster_sizes) else 0
+
+    def nearest_distance_quantiles(self, quantiles=(0.05, 0.5, 0.95)) -> list[float]:
+        if not len(self.nearest_distances):
+            return [float("nan")] * len(quantiles)
+
+        return np.quantile(self.nearest_distances, quantiles).tolist()
+
+
+def polarization(velocities: np.ndarray) -> float:
+    """
+    Length of the mean heading: 1 when all boids fly the same way, near 0 when headings cancel out.
+    """
+    speeds = np.hypot(velocities[:, 0], velocities[:, 1])
+    moving = speeds > 0
+
+    if not moving.any():
+        return 0.0
+
+    headings = velocities[moving] / speeds[moving, np.newaxis]
+    return float(np.hypot(*headings.mean(axis=0)))
+
+
+def angular_momentum(positions: np.ndarray, velocities: np.ndarray) -> float:
+    """
+    Normalized angular momentum about the center of the flock: the mean of
+    `r x v / (|r| |v|)`, which is ±1 when every boid circles the center in the same
+    direction (positive is clockwise on screen) and near 0 for a translating flock.
+    """
+    offsets = positions - positions.mean(axis=0)
+    cross = offsets[:, 0] * velocities[:, 1] - offsets[:, 1] * velocities[:, 0]
+    norms = np.hypot(offsets[:, 0], offsets[:, 1]) * np.hypot(velocities[:, 0], velocities[:, 1])
+    valid = norms > 0
+
+    if not valid.any():
+        return 0.0
+
+    return float((cross[valid] / norms[valid]).mean())
+
+
+def cluster_labels(count: int, pairs: np.ndarray) -> np.ndarray:
+    """
+    Connected components of the graph with `count` nodes and the given edges,
+    found with union-find. Returns the root index of every node's component.
+    """
+    parents = list(range(count))
+
+    def find(node: int) -> int:
+        while parents[node] != node:
+            parents[node] = parents[parents[node]]
+            node = parents[node]
+
+        return node
+
+    for a, b in pairs.tolist():
+        root_a = find(a)
+        root_b = find(b)
+
+        if root_a != root_b:
+            parents[max(root_a, root_b)] = min(root_a, root_b)
+
+    return np.array([find(node) for node in range(count)], dtype=np.intp)
+
+
+def cluster_sizes(labels: np.ndarray) -> np.ndarray:
+    """
+    Sizes of the clusters given by `cluster_labels`, largest first.
+    """
+    return np.sort(np.unique(labels, return_counts=True)[1])[::-1]
+
+
+def analyze(positions: np.ndarray, velocities: np.ndarray, graph: NeighborGraph, frame: int) -> FlockAnalytics:
+    nearest = graph.nearest_distances
+
+    return FlockAnalytics(
+        frame=frame,
+        polarization=polarization(velocities),
+        angular_momentum=angular_momentum(positions, velocities),
+        cluster_sizes=cluster_sizes(cluster_labels(len(positions), graph.pairs)),
+        nearest_distances=nearest[np.isfinite(nearest)],
+    )
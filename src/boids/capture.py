@@ -0,0 +1,159 @@
+"""
+Encodes captured frames in the background.
+
+`FrameExporter` hands RGBA frames to a pool of encoder threads through a bounded
+queue: `submit` returns as soon as the frame is queued and only waits while the
+queue is full, so memory stays flat however far the encoders fall behind. PNG
+sequences are encoded on all threads at once, since zlib releases the GIL. A pipe
+to an external encoder such as ffmpeg takes raw frames in order, from one thread.
+
+This module does not depend on OpenGL; `boids.recorder` renders the frames.
+"""
+
+from __future__ import annotations
+
+import os
+import shlex
+import struct
+import subprocess
+import threading
+import time
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import BinaryIO, cast
+
+import numpy as np
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# Fast compression: most of a frame is background, which compresses well at any level.
+PNG_COMPRESSION_LEVEL = 1
+
+DEFAULT_QUEUE_SIZE = 8
+
+
+def encode_png(pixels: np.ndarray) -> bytes:
+    """
+    Encodes an (height, width, 4) array of 8-bit RGBA pixels, top row first, as a PNG.
+    """
+    height, width, channels = pixels.shape
+    rows = np.zeros((height, 1 + width * channels), dtype=np.uint8)
+    rows[:, 1:] = pixels.reshape(height, -1)
+    header = struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)
+
+    return b"".join(
+        [
+            PNG_SIGNATURE,
+            _png_chunk(b"IHDR", header),
+            _png_chunk(b"IDAT", zlib.compress(rows.tobytes(), PNG_COMPRESSION_LEVEL)),
+            _png_chunk(b"IEND", b""),
+        ]
+    )
+
+
+def _png_chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+class PngSequenceSink:
+    """
+    Writes every frame to `directory` as a numbered PNG file.
+    """
+
+    ordered = False
+
+    def __init__(self, directory: str, pattern: str = "frame_{:06d}.png"):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.pattern = pattern
+
+    def write(self, number: int, pixels: np.ndarray):
+        with open(os.path.join(self.directory, self.pattern.format(number)), "wb") as file:
+            file.write(encode_png(pixels))
+
+    def close(self):
+        pass
+
+
+class PipeSink:
+    """
+    Writes raw RGBA frames to the standard input of `command`, such as
+    `ffmpeg -f rawvideo -pix_fmt rgba -s {width}x{height} -r {fps} -i - video.mp4`.
+    The placeholders are filled in from the frame size and rate.
+    """
+
+    ordered = True
+
+    def __init__(self, command: str, size: tuple[int, int], fps: float):
+        width, height = size
+        arguments = shlex.split(command.format(width=width, height=height, fps=fps))
+        self.process = subprocess.Popen(arguments, stdin=subprocess.PIPE)
+        self.stdin = cast(BinaryIO, self.process.stdin)
+
+    def write(self, _number: int, pixels: np.ndarray):
+        self.stdin.write(np.ascontiguousarray(pixels).data)
+
+    def close(self):
+        """
+        Closes the pipe and waits for the encoder to finish the file.
+        """
+        self.stdin.close()
+
+        if self.process.wait():
+            raise RuntimeError(f"Encoder exited with status {self.process.returncode}.")
+
+
+class FrameExporter:
+    """
+    Writes frames to `sink` on `workers` background threads, one if the sink needs its
+    frames in order, with at most `queue_size` frames queued or in progress.
+    `stall_seconds` is the time `submit` spent waiting for room in the queue.
+    """
+
+    def __init__(
+        self, sink: PngSequenceSink | PipeSink, workers: int | None = None, queue_size: int = DEFAULT_QUEUE_SIZE
+    ):
+        self.sink = sink
+        self.workers = 1 if sink.ordered else workers or os.cpu_count() or 1
+        self.frames = 0
+        self.stall_seconds = 0.0
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="boids-capture")
+        self._slots = threading.BoundedSemaphore(queue_size)
+        self._error: BaseException | None = None
+
+    def submit(self, number: int, pixels: np.ndarray):
+        """
+        Queues a frame for writing. The exporter takes ownership of `pixels`. Raises the
+        first error an encoder ran into.
+        """
+        self._raise_error()
+
+        if not self._slots.acquire(blocking=False):
+            started_at = time.perf_counter()
+            self._slots.acquire()
+            self.stall_seconds += time.perf_counter() - started_at
+
+        future = self._executor.submit(self.sink.write, number, pixels)
+        future.add_done_callback(self._finish)
+        self.frames += 1
+
+    def close(self):
+        """
+        Waits for the queued frames to be written and closes the sink.
+        """
+        self._executor.shutdown(wait=True)
+        self.sink.close()
+        self._raise_error()
+
+    def _finish(self, future: Future):
+        self._slots.release()
+        error = future.exception()
+
+        if error is not None and self._error is None:
+            self._error = error
+
+    def _raise_error(self):
+        error, self._error = self._error, None
+
+        if error is not None:
+            raise error
@@ -16,9 +16,15 @@ BOID_DIMENSIONS = 2
 BOID_COLOR = (0.86, 0.08, 0.24, 1.0)
 BOID_MIN_INIT_SPEED = 1.0
 BOID_MAX_INIT_SPEED = 3.0
+COLOR_MODES = ["none", "heading", "speed", "neighbors", "density"]
+PALETTE_SIZE = 256
 
 # Environment
 GOAL_COLOR = (0.2, 0.8, 0.1, 1.0)
 GOAL_SIZE = 10.0
+OBSTACLE_COLOR = (0.35, 0.4, 0.45, 1.0)
 PERTURBATION_MIN = -0.2
 PERTURBATION_MAX = 0.2
+FLOW_FIELD_KINDS = ["none", "vortices", "noise", "file"]
+SPATIAL_INDEXES = ["grid", "quadtree"]
+FLOW_FIELD_UPDATE_NODES = 4096
@@ -1,12 +1,24 @@
-from boids.constants import SCREEN_HEIGHT, SCREEN_WIDTH
+from array import array
+
+import imgui
+
+from boids.constants import SCREEN_HEIGHT, SCREEN_WIDTH, TOP_MENU_HEIGHT
 from boids.entities import State
 from boids.graphics import draw_line
+from boids.quadtree import QuadTree
 from boids.settings.settings import Settings
 
+CLUSTER_PLOT_SIZE = 32
+
 
 def render_debug_info(state: State, _settings: Settings):
     line_width = 0.5
     line_color = (1.0, 1.0, 1.0, 0.05)
+
+    if isinstance(state.boids, QuadTree):
+        render_quadtree(state.boids, line_color, line_width)
+        return
+
     x_lines = int(SCREEN_WIDTH // state.boids.cell_size)
     y_lines = int(SCREEN_HEIGHT // state.boids.cell_size)
 
@@ -39,3 +51,57 @@ def render_debug_info(state: State, _settings: Settings):
             color=line_color,
             line_width=line_width,
         )
+
+
+def render_quadtree(tree: QuadTree, color: tuple[float, float, float, float], line_width: float):
+    """
+    Outlines the non-empty leaves of the quadtree index.
+    """
+    for leaf in tree.leaves():
+        if not leaf.items:
+            continue
+
+        (left, top), size = leaf.lower, leaf.size
+        corners = [(left, top), (left + size, top), (left + size, top + size), (left, top + size)]
+
+        for start, end in zip(corners, corners[1:] + corners[:1]):
+            draw_line(start=start, end=end, color=color, line_width=line_width)
+
+
+def render_analytics(state: State, settings: Settings):
+    analytics = state.analytics
+
+    if not settings.get("analytics", "interval") or analytics is None:
+        return
+
+    imgui.set_next_window_position(SCREEN_WIDTH - 10, 12 + TOP_MENU_HEIGHT, pivot_x=1.0)
+    imgui.begin("Analytics", flags=imgui.WINDOW_ALWAYS_AUTO_RESIZE | imgui.WINDOW_NO_FOCUS_ON_APPEARING)
+    imgui.text(f"Frame: {analytics.frame}")
+    imgui.text(f"Polarization: {analytics.polarization:.3f}")
+    imgui.text(f"Angular momentum: {analytics.angular_momentum:+.3f}")
+    imgui.text(f"Clusters: {analytics.clusters} (largest {analytics.largest_cluster})")
+
+    low, median, high = analytics.nearest_distance_quantiles()
+    imgui.text(f"Nearest neighbor: {median:.1f} px (p5 {low:.1f}, p95 {high:.1f})")
+
+    if len(analytics.cluster_sizes):
+        sizes = array("f", analytics.cluster_sizes[:CLUSTER_PLOT_SIZE].tolist())
+        imgui.plot_histogram("Cluster sizes", sizes, graph_size=(0, 60))
+
+    imgui.end()
+
+
+def render_schedule(state: State, settings: Settings):
+    scheduler = state.scheduler
+
+    if not settings.get("performance", "frame_budget_ms") or scheduler is None or not len(scheduler.intervals):
+        return
+
+    rates = scheduler.update_rates
+    frame_rate = imgui.get_io().framerate
+    imgui.set_next_window_position(SCREEN_WIDTH - 10, SCREEN_HEIGHT - 10, pivot_x=1.0, pivot_y=1.0)
+    imgui.begin("Update schedule", flags=imgui.WINDOW_ALWAYS_AUTO_RESIZE | imgui.WINDOW_NO_FOCUS_ON_APPEARING)
+    imgui.text(f"Cost per boid: {scheduler.cost * 1e6:.1f} us")
+    imgui.text(f"Updates per boid: {rates.mean():.3f} per frame ({rates.mean() * frame_rate:.1f} Hz)")
+    imgui.text(f"Slowest boid: every {scheduler.update_intervals.max()} frames ({rates.min() * frame_rate:.1f} Hz)")
+    imgui.end()
@@ -0,0 +1,579 @@
+"""
+Domain-decomposed simulation across worker processes connected over TCP.
+
+The world is split into vertical strips, one per worker. Workers form a ring:
+each one keeps a connection to the worker on its left and on its right. Every
+step, a worker sends its neighbors the boids within the locality radius of the
+shared edge (the halo), evaluates the flocking rules for the boids it owns
+against its own and the received boids, moves them, and hands the boids that
+left its strip to the neighbor in their direction. Strips are never narrower
+than the locality radius, so the halo of the adjacent strips covers every
+neighbor. As in the single-process simulation, neighborhoods do not wrap around
+the screen edges, so no halo crosses the seam between the last strip and the
+first; boids that wrap around still migrate across it.
+
+A coordinator drives the workers in lockstep, collects the frame of every
+worker, and when the busiest worker holds too many more boids than the average,
+moves the strip boundaries to the quantiles of the boid positions and
+redistributes the flock.
+
+Rule evaluation follows the pairwise, double-buffered path: every boid reads the
+previous frame. Random perturbations are derived from the seed, the frame number
+and the boid's ID, so results do not depend on how the world is split. Goals,
+obstacles and flow fields are not supported in this mode.
+
+Messages are a pair of little-endian uint32 lengths, a JSON header naming the
+message kind, its metadata and the dtype and shape of each array, and the raw
+array bytes.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import json
+import multiprocessing
+import queue
+import socket
+import struct
+import threading
+import time
+from dataclasses import dataclass
+from typing import cast
+
+import numpy as np
+
+from boids.constants import BOID_DIMENSIONS, FPS, PERTURBATION_MAX, PERTURBATION_MIN, SCREEN_WIDTH
+from boids.entities import Flock
+from boids.rules import accumulate_neighbor_sums, evaluate_flocking, evaluate_wind_and_boundary
+from boids.settings.settings import Settings, load_settings
+from boids.simulation import create_boids, wrap_positions
+from boids.utils import parse_address
+from boids.verlet import candidate_pairs
+
+MESSAGE_HEADER = struct.Struct("<II")
+DEFAULT_REBALANCE_THRESHOLD = 1.25
+LEFT = -1
+RIGHT = 1
+
+# Seconds the coordinator waits for a worker before giving up on it.
+WORKER_TIMEOUT = 60.0
+
+# Seconds a local cluster waits for its worker processes to start listening.
+STARTUP_TIMEOUT = 60.0
+
+Arrays = dict[str, np.ndarray]
+
+
+def send_message(connection: socket.socket, kind: str, meta: dict | None = None, arrays: Arrays | None = None):
+    arrays = arrays or {}
+    contiguous = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+    header = json.dumps(
+        {
+            "kind": kind,
+            "meta": meta or {},
+            "arrays": [[name, array.dtype.str, list(array.shape)] for name, array in contiguous.items()],
+        }
+    ).encode()
+    body = b"".join(array.tobytes() for array in contiguous.values())
+    connection.sendall(MESSAGE_HEADER.pack(len(header), len(body)) + header + body)
+
+
+def receive_message(connection: socket.socket) -> tuple[str, dict, Arrays]:
+    header_length, body_length = MESSAGE_HEADER.unpack(_receive_exactly(connection, MESSAGE_HEADER.size))
+    header = json.loads(_receive_exactly(connection, header_length))
+    body = _receive_exactly(connection, body_length)
+    arrays: Arrays = {}
+    offset = 0
+
+    for name, dtype, shape in header["arrays"]:
+        array = np.frombuffer(body, dtype=dtype, count=int(np.prod(shape)), offset=offset).reshape(shape)
+        arrays[name] = array
+        offset += array.nbytes
+
+    return header["kind"], header["meta"], arrays
+
+
+def _receive_exactly(connection: socket.socket, size: int) -> bytes:
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+
+    while received < size:
+        chunk = connection.recv_into(view[received:])
+
+        if not chunk:
+            raise ConnectionError("Connection closed in the middle of a message.")
+
+        received += chunk
+
+    return bytes(buffer)
+
+
+def strip_bounds(positions: np.ndarray, workers: int, width: float, min_width: float) -> np.ndarray:
+    """
+    Edges of `workers` strips covering [0, width) that hold about the same number of the
+    given boids each, without any strip being narrower than `min_width`.
+    """
+    if workers * min_width > width:
+        raise ValueError(f"{workers} strips of at least {min_width} do not fit in a width of {width}.")
+
+    if len(positions):
+        inner = np.quantile(positions[:, 0], np.arange(1, workers) / workers)
+    else:
+        inner = np.arange(1, workers) * (width / workers)
+
+    bounds = np.concatenate([[0.0], np.clip(inner, 0, width), [width]])
+
+    for edge in range(1, workers):
+        bounds[edge] = max(bounds[edge], bounds[edge - 1] + min_width)
+
+    for edge in range(workers - 1, 0, -1):
+        bounds[edge] = min(bounds[edge], bounds[edge + 1] - min_width)
+
+    return bounds
+
+
+def owners(positions: np.ndarray, bounds: np.ndarray) -> np.ndarray:
+    """
+    Index of the strip that owns each position. The outer strips extend past the world edges.
+    """
+    return np.searchsorted(bounds[1:-1], positions[:, 0], side="right")
+
+
+def perturbations(ids: np.ndarray, frame: int, seed: int) -> np.ndarray:
+    """
+    Random perturbation velocities that depend only on the seed, the frame and each boid's
+    ID, from a SplitMix64 hash of the three.
+    """
+    state = ids.astype(np.uint64)[:, np.newaxis] * np.uint64(BOID_DIMENSIONS) + np.arange(
+        BOID_DIMENSIONS, dtype=np.uint64
+    )
+    state += np.uint64((seed * 0x9E3779B97F4A7C15 + frame * 0xD1B54A32D192ED03) % 2**64)
+    state = (state ^ (state >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    state = (state ^ (state >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    state ^= state >> np.uint64(31)
+    uniform = (state >> np.uint64(11)).astype(np.float64) / 2**53
+    return PERTURBATION_MIN + uniform * (PERTURBATION_MAX - PERTURBATION_MIN)
+
+
+def advance(
+    positions: np.ndarray,
+    velocities: np.ndarray,
+    noise: np.ndarray,
+    settings: Settings,
+    delta_time: float,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Next positions and velocities of the first `len(noise)` boids, which see every boid
+    in the arrays as a potential neighbor.
+    """
+    owned = len(noise)
+    locality = cast(float, settings.get("boids", "locality_radius"))
+    separation_distance = cast(int, settings.get("boids", "separation_distance"))
+    max_speed = cast(float, settings.get("boids", "max_speed"))
+    speed = cast(float, settings.get("boids", "speed"))
+
+    rows, columns = candidate_pairs(positions, locality)
+    upper = rows < columns
+    pairs = np.stack([rows[upper], columns[upper]], axis=-1)
+    offsets = positions[pairs[:, 0]] - positions[pairs[:, 1]]
+    distances = np.einsum("ij,ij->i", offsets, offsets).astype(np.float64)
+    sums = accumulate_neighbor_sums(positions, velocities, pairs, distances, locality, separation_distance)
+
+    own_positions = positions[:owned]
+    own_velocities = velocities[:owned]
+    forces = evaluate_flocking(sums, positions, velocities, settings)[:owned]
+    forces += evaluate_wind_and_boundary(own_positions, settings)
+    next_velocities = (own_velocities + forces + noise).astype(np.float32)
+
+    speeds = np.hypot(next_velocities[:, 0], next_velocities[:, 1])
+    too_fast = speeds > max_speed
+    next_velocities[too_fast] *= (max_speed / speeds[too_fast])[:, np.newaxis]
+    next_positions = own_positions + next_velocities * (speed * delta_time)
+    wrap_positions(next_positions, settings)
+
+    return next_positions, next_velocities
+
+
+class StripWorker:
+    """
+    One strip of the world. Serves a coordinator over `coordinator` and exchanges halos and
+    migrating boids with the workers of the neighboring strips.
+    """
+
+    def __init__(self, coordinator: socket.socket, meta: dict, peers: dict[int, socket.socket]):
+        self.coordinator = coordinator
+        self.peers = peers
+        self.rank: int = meta["rank"]
+        self.workers: int = meta["workers"]
+        self.seed: int = meta["seed"]
+        self.frame: int = meta["frame"]
+        self.settings = Settings()
+        self.settings.load_dict(meta["settings"])
+        self.bounds = np.zeros(self.workers + 1)
+        self.positions = np.zeros((0, BOID_DIMENSIONS), dtype=np.float32)
+        self.velocities = np.zeros((0, BOID_DIMENSIONS), dtype=np.float32)
+        self.ids = np.zeros(0, dtype=np.int64)
+
+    def serve(self):
+        while True:
+            kind, meta, arrays = receive_message(self.coordinator)
+
+            match kind:
+                case "assign":
+                    self.bounds = np.array(meta["bounds"])
+                    self.positions = arrays["positions"].copy()
+                    self.velocities = arrays["velocities"].copy()
+                    self.ids = arrays["ids"].copy()
+                case "step":
+                    self.step(meta["delta_time"])
+                    arrays = {"positions": self.positions, "velocities": self.velocities, "ids": self.ids}
+                    send_message(self.coordinator, "frame", {"frame": self.frame}, arrays)
+                case "stop":
+                    return
+                case _:
+                    raise ValueError(f"Unknown message '{kind}'.")
+
+    def step(self, delta_time: float):
+        locality = cast(float, self.settings.get("boids", "locality_radius"))
+        left, right = self.bounds[self.rank], self.bounds[self.rank + 1]
+        halos = self._exchange(
+            {
+                LEFT: self._select(self.positions[:, 0] < left + locality, self.rank > 0),
+                RIGHT: self._select(self.positions[:, 0] >= right - locality, self.rank < self.workers - 1),
+            }
+        )
+        pool = [self.positions, *(halo["positions"] for halo in halos.values())]
+        pool_velocities = [self.velocities, *(halo["velocities"] for halo in halos.values())]
+        noise = perturbations(self.ids, self.frame, self.seed)
+        self.positions, self.velocities = advance(
+            np.concatenate(pool), np.concatenate(pool_velocities), noise, self.settings, delta_time
+        )
+        self.frame += 1
+        self._migrate()
+
+    def _migrate(self):
+        owner = owners(self.positions, self.bounds)
+        away = owner != self.rank
+        ahead = (owner - self.rank) % self.workers
+        going_right = away & (ahead <= self.workers // 2)
+        arrivals = self._exchange(
+            {LEFT: self._select(away & ~going_right, True), RIGHT: self._select(going_right, True)}
+        )
+        self.positions = np.concatenate([self.positions[~away], *(a["positions"] for a in arrivals.values())])
+        self.velocities = np.concatenate([self.velocities[~away], *(a["velocities"] for a in arrivals.values())])
+        self.ids = np.concatenate([self.ids[~away], *(a["ids"] for a in arrivals.values())])
+
+    def _select(self, mask: np.ndarray, allowed: bool) -> Arrays:
+        if not allowed:
+            mask = np.zeros(len(self.positions), dtype=bool)
+
+        return {"positions": self.positions[mask], "velocities": self.velocities[mask], "ids": self.ids[mask]}
+
+    def _exchange(self, outgoing: dict[int, Arrays]) -> dict[int, Arrays]:
+        """
+        Sends each neighbor its arrays and receives theirs. Sends run on threads, so two
+        neighbors sending large messages to each other cannot block one another.
+        """
+        if self.workers == 1:
+            return {side: outgoing[-side] for side in (LEFT, RIGHT)}
+
+        senders = [
+            threading.Thread(target=send_message, args=(self.peers[side], "boids", None, outgoing[side]))
+            for side in (LEFT, RIGHT)
+        ]
+
+        for sender in senders:
+            sender.start()
+
+        incoming = {side: receive_message(self.peers[side])[2] for side in (LEFT, RIGHT)}
+
+        for sender in senders:
+            sender.join()
+
+        return incoming
+
+
+def serve_worker(listener: socket.socket):
+    """
+    Runs one worker on an already listening socket until its coordinator stops it. The
+    coordinator and the worker on the left may connect in either order.
+    """
+    coordinator: socket.socket | None = None
+    meta: dict = {}
+    peers: dict[int, socket.socket] = {}
+
+    while coordinator is None or (meta["workers"] > 1 and LEFT not in peers):
+        connection, _ = listener.accept()
+        connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        kind, message_meta, _ = receive_message(connection)
+
+        if kind == "peer":
+            peers[LEFT] = connection
+        elif kind == "init":
+            coordinator = connection
+            meta = message_meta
+
+            if meta["workers"] > 1:
+                host, port = meta["right"]
+                peers[RIGHT] = socket.create_connection((host, port))
+                peers[RIGHT].setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                send_message(peers[RIGHT], "peer", {"rank": meta["rank"]})
+
+    send_message(coordinator, "ready")
+
+    try:
+        StripWorker(coordinator, meta, peers).serve()
+    finally:
+        for connection in [coordinator, *peers.values()]:
+            connection.close()
+
+
+@dataclass(frozen=True)
+class DistributedFrame:
+    """
+    The whole flock after one step, ordered by boid ID, and the number of boids each worker owns.
+    """
+
+    number: int
+    positions: np.ndarray
+    velocities: np.ndarray
+    ids: np.ndarray
+    counts: np.ndarray
+
+
+class Coordinator:
+    """
+    Drives workers listening at `addresses`, one strip each in that order from left to
+    right. Starts from `flock`, or from `boids.count` random boids, on strips of equal width.
+    """
+
+    def __init__(
+        self,
+        addresses: list[tuple[str, int]],
+        settings: Settings,
+        *,
+        seed: int = 0,
+        flock: Flock | None = None,
+        rebalance_threshold: float = DEFAULT_REBALANCE_THRESHOLD,
+    ):
+        self.settings = settings
+        self.workers = len(addresses)
+        self.rebalance_threshold = rebalance_threshold
+        self.rebalances = 0
+        self.frame = 0
+
+        if flock is None:
+            flock = create_boids(cast(int, settings.get("boids", "count")), np.random.default_rng(seed))
+
+        self.connections: list[socket.socket] = []
+
+        try:
+            for rank, address in enumerate(addresses):
+                connection = socket.create_connection(address, timeout=WORKER_TIMEOUT)
+                connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                self.connections.append(connection)
+                meta = {
+                    "rank": rank,
+                    "workers": self.workers,
+                    "seed": seed,
+                    "frame": self.frame,
+                    "settings": settings.dump_dict(),
+                    "right": list(addresses[(rank + 1) % self.workers]),
+                }
+                send_message(connection, "init", meta)
+
+            for connection in self.connections:
+                receive_message(connection)
+        except (OSError, ValueError):
+            # Stops the workers reached so far, so they do not wait for a coordinator.
+            self.close()
+            raise
+
+        self.bounds = np.linspace(0, SCREEN_WIDTH, self.workers + 1)
+        self.assign(flock.positions, flock.velocities, flock.ids.astype(np.int64))
+
+    def assign(self, positions: np.ndarray, velocities: np.ndarray, ids: np.ndarray):
+        """
+        Hands every worker the given boids within its strip.
+        """
+        owner = owners(positions, self.bounds)
+
+        for rank, connection in enumerate(self.connections):
+            mine = owner == rank
+            arrays = {"positions": positions[mine], "velocities": velocities[mine], "ids": ids[mine]}
+            send_message(connection, "assign", {"bounds": self.bounds.tolist()}, arrays)
+
+    def step(self, delta_time: float) -> DistributedFrame:
+        for connection in self.connections:
+            send_message(connection, "step", {"delta_time": delta_time})
+
+        parts = [receive_message(connection)[2] for connection in self.connections]
+        ids = np.concatenate([part["ids"] for part in parts])
+        order = np.argsort(ids)
+        frame = DistributedFrame(
+            number=self.frame,
+            positions=np.concatenate([part["positions"] for part in parts])[order],
+            velocities=np.concatenate([part["velocities"] for part in parts])[order],
+            ids=ids[order],
+            counts=np.array([len(part["ids"]) for part in parts]),
+        )
+        self.frame += 1
+
+        if self.workers > 1 and frame.counts.max() > self.rebalance_threshold * max(frame.counts.mean(), 1):
+            self.rebalance(frame)
+
+        return frame
+
+    def rebalance(self, frame: DistributedFrame):
+        """
+        Moves the strip boundaries so every worker gets about the same number of boids, unless
+        the minimum strip width leaves no better split than the current one.
+        """
+        locality = cast(float, self.settings.get("boids", "locality_radius"))
+        bounds = strip_bounds(frame.positions, self.workers, SCREEN_WIDTH, locality)
+        counts = np.bincount(owners(frame.positions, bounds), minlength=self.workers)
+
+        if counts.max() >= frame.counts.max():
+            return
+
+        self.bounds = bounds
+        self.assign(frame.positions, frame.velocities, frame.ids)
+        self.rebalances += 1
+
+    def close(self):
+        for connection in self.connections:
+            with contextlib.suppress(OSError):
+                send_message(connection, "stop")
+
+            connection.close()
+
+        self.connections = []
+
+
+def _run_local_worker(ports: multiprocessing.Queue):
+    listener = socket.create_server(("127.0.0.1", 0))
+    ports.put(listener.getsockname()[1])
+
+    with listener:
+        serve_worker(listener)
+
+
+class LocalCluster:
+    """
+    Worker processes on this machine, for testing and for using several cores.
+    """
+
+    def __init__(self, workers: int):
+        context = multiprocessing.get_context("spawn")
+        ports = context.Queue()
+        self.processes = [context.Process(target=_run_local_worker, args=(ports,), daemon=True) for _ in range(workers)]
+
+        for process in self.processes:
+            process.start()
+
+        try:
+            self.addresses = [("127.0.0.1", ports.get(timeout=STARTUP_TIMEOUT)) for _ in self.processes]
+        except queue.Empty:
+            self.terminate()
+            raise TimeoutError("the local workers did not start in time") from None
+
+    def join(self):
+        """
+        Waits for workers that were told to stop and terminates those that do not.
+        """
+        for process in self.processes:
+            process.join(timeout=WORKER_TIMEOUT)
+
+            if process.is_alive():
+                process.terminate()
+
+    def terminate(self):
+        for process in self.processes:
+            process.terminate()
+            process.join()
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(prog="boids-distributed", description="Run the simulation across workers.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    worker = commands.add_parser("worker", help="Serve one strip of the world.")
+    worker.add_argument("--listen", type=parse_address, default=("127.0.0.1", 7700), metavar="HOST:PORT")
+    run = commands.add_parser("run", help="Coordinate workers.")
+    source = run.add_mutually_exclusive_group(required=True)
+    source.add_argument("--local", type=int, metavar="N", help="Start N workers on this machine.")
+    source.add_argument("--workers", type=lambda text: [parse_address(part) for part in text.split(",")])
+    run.add_argument("--frames", type=int, default=None, help="Number of frames to simulate (default: forever).")
+    run.add_argument("--delta-time", type=float, default=1 / FPS, help="Simulation time step in seconds.")
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--rebalance-threshold", type=float, default=DEFAULT_REBALANCE_THRESHOLD)
+    run.add_argument("--serve", type=parse_address, metavar="HOST:PORT", help="Stream frames over TCP.")
+    args = parser.parse_args(argv)
+
+    if args.command == "worker":
+        with socket.create_server(args.listen) as listener:
+            print(f"Worker listening on {args.listen[0]}:{listener.getsockname()[1]}.")
+            serve_worker(listener)
+
+        return
+
+    run_coordinator(parser, args)
+
+
+def run_coordinator(parser: argparse.ArgumentParser, args: argparse.Namespace):
+    with contextlib.ExitStack() as cleanup:
+        server = start_server(parser, args.serve, cleanup) if args.serve else None
+        cluster = None
+
+        try:
+            if args.local:
+                cluster = LocalCluster(args.local)
+                cleanup.callback(cluster.join)
+
+            coordinator = Coordinator(
+                cluster.addresses if cluster is not None else args.workers,
+                load_settings(),
+                seed=args.seed,
+                rebalance_threshold=args.rebalance_threshold,
+            )
+        except (OSError, ValueError) as error:
+            if cluster is not None:
+                cluster.terminate()
+
+            parser.error(f"Could not start the workers: {error}.")
+
+        cleanup.callback(coordinator.close)
+        started_at = time.perf_counter()
+
+        try:
+            while args.frames is None or coordinator.frame < args.frames:
+                frame = coordinator.step(args.delta_time)
+
+                if server is not None:
+                    server.publish_arrays(frame.positions, frame.velocities, frame.number)
+        except KeyboardInterrupt:
+            pass
+
+    elapsed = time.perf_counter() - started_at
+    print(f"{coordinator.frame} frames in {elapsed:.1f} s, {coordinator.rebalances} rebalances.")
+
+
+def start_server(parser: argparse.ArgumentParser, address: tuple[str, int], cleanup: contextlib.ExitStack):
+    from boids.streaming import StreamServer
+
+    host, port = address
+    server = StreamServer(host, port)
+
+    try:
+        server.start()
+    except OSError as error:
+        parser.error(f"Could not stream on {host}:{port}: {error.strerror or error}.")
+
+    cleanup.callback(server.stop)
+    print(f"Streaming flock state on {host}:{server.port}.")
+    return server
+
+
+if __name__ == "__main__":
+    main()
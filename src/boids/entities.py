@@ -1,34 +1,250 @@
 from __future__ import annotations
 
 from dataclasses import dataclass, field
+from typing import Iterator
 
-from pygame.math import Vector2
+import numpy as np
 
-from boids.constants import BOID_COLOR
+from boids.analytics import FlockAnalytics
+from boids.constants import BOID_DIMENSIONS
+from boids.flowfield import FlowField
 from boids.kdtree import PointLike
+from boids.metrics import Metrics
+from boids.obstacles import Obstacle, ObstacleField
+from boids.palette import get_palette
+from boids.quadtree import QuadTree
+from boids.scheduler import UpdateScheduler
 from boids.spatialgrid import SpatialGrid
+from boids.vector import Vector2
+from boids.verlet import VerletList
+
+
+class Flock:
+    """
+    Structure-of-arrays storage for the state of every boid in the simulation.
+
+    Positions, velocities, palette color indices and per-frame neighborhood
+    statistics live in contiguous typed arrays which grow geometrically as boids
+    are added. Individual boids are exposed as `Boid` views that read and write
+    through to these arrays. Every boid also gets an ID that is never reused, which
+    identifies it regardless of where it is stored.
+    """
+
+    def __init__(self, capacity: int = 0):
+        self.count = 0
+        self.next_id = 0
+        self.palette = get_palette("none")
+        self._positions = np.zeros((capacity, BOID_DIMENSIONS), dtype=np.float32)
+        self._velocities = np.zeros((capacity, BOID_DIMENSIONS), dtype=np.float32)
+        self._color_indices = np.zeros(capacity, dtype=np.uint8)
+        self._neighbor_counts = np.zeros(capacity, dtype=np.int32)
+        self._densities = np.zeros(capacity, dtype=np.float32)
+        self._ids = np.zeros(capacity, dtype=np.uint32)
+        self._next_positions = np.zeros((0, BOID_DIMENSIONS), dtype=np.float32)
+        self._next_velocities = np.zeros((0, BOID_DIMENSIONS), dtype=np.float32)
+
+    @property
+    def ids(self) -> np.ndarray:
+        return self._ids[: self.count]
+
+    @property
+    def positions(self) -> np.ndarray:
+        return self._positions[: self.count]
+
+    @property
+    def velocities(self) -> np.ndarray:
+        return self._velocities[: self.count]
+
+    @property
+    def color_indices(self) -> np.ndarray:
+        return self._color_indices[: self.count]
+
+    @property
+    def neighbor_counts(self) -> np.ndarray:
+        return self._neighbor_counts[: self.count]
+
+    @property
+    def densities(self) -> np.ndarray:
+        return self._densities[: self.count]
+
+    @property
+    def nbytes(self) -> int:
+        arrays = [self.positions, self.velocities, self.color_indices, self.neighbor_counts, self.densities, self.ids]
+        return sum(array.nbytes for array in arrays)
+
+    def reserve(self, capacity: int):
+        if capacity <= len(self._positions):
+            return
+
+        self._positions = self._grow(self._positions, capacity)
+        self._velocities = self._grow(self._velocities, capacity)
+        self._color_indices = self._grow(self._color_indices, capacity)
+        self._neighbor_counts = self._grow(self._neighbor_counts, capacity)
+        self._densities = self._grow(self._densities, capacity)
+        self._ids = self._grow(self._ids, capacity)
+
+    def back_buffers(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Position and velocity arrays for the next frame, separate from the current ones
+        and allocated on first use. Their contents are undefined until written.
+        """
+        if len(self._next_positions) != len(self._positions):
+            self._next_positions = np.zeros_like(self._positions)
+            self._next_velocities = np.zeros_like(self._velocities)
+
+        return self._next_positions[: self.count], self._next_velocities[: self.count]
+
+    def swap_buffers(self):
+        """
+        Makes the back buffers the current positions and velocities.
+        """
+        self._positions, self._next_positions = self._next_positions, self._positions
+        self._velocities, self._next_velocities = self._next_velocities, self._velocities
+
+    def add(self, position: Vector2, velocity: Vector2) -> Boid:
+        if self.count == len(self._positions):
+            self.reserve(max(16, self.count * 2))
+
+        index = self.count
+        self._positions[index] = (position.x, position.y)
+        self._velocities[index] = (velocity.x, velocity.y)
+        self._color_indices[index] = 0
+        self._neighbor_counts[index] = 0
+        self._densities[index] = 0.0
+        self._ids[index] = self.next_id
+        self.next_id += 1
+        self.count += 1
+
+        return Boid(self, index)
+
+    def add_many(self, positions: np.ndarray, velocities: np.ndarray) -> range:
+        """
+        Appends a batch of boids and returns the range of their indices.
+        """
+        start = self.count
+        end = start + len(positions)
+
+        if end > len(self._positions):
+            self.reserve(max(16, end, self.count * 2))
+
+        self._positions[start:end] = positions
+        self._velocities[start:end] = velocities
+        self._color_indices[start:end] = 0
+        self._neighbor_counts[start:end] = 0
+        self._densities[start:end] = 0.0
+        self._ids[start:end] = np.arange(self.next_id, self.next_id + len(positions))
+        self.next_id += len(positions)
+        self.count = end
+
+        return range(start, end)
+
+    def truncate(self, count: int):
+        """
+        Removes the boids from index `count` onwards, the most recently added ones.
+        """
+        self.count = min(self.count, count)
+
+    @staticmethod
+    def _grow(array: np.ndarray, capacity: int) -> np.ndarray:
+        grown = np.zeros((capacity, *array.shape[1:]), dtype=array.dtype)
+        grown[: len(array)] = array
+        return grown
+
+    def __getitem__(self, index: int) -> Boid:
+        if not 0 <= index < self.count:
+            raise IndexError(f"Boid index {index} is out of range.")
+
+        return Boid(self, index)
+
+    def __iter__(self) -> Iterator[Boid]:
+        for index in range(self.count):
+            yield Boid(self, index)
+
+    def __len__(self):
+        return self.count
 
 
-@dataclass
 class Boid(PointLike):
-    velocity: Vector2 = field(default_factory=lambda: Vector2(0, 0))
-    position: Vector2 = field(default_factory=lambda: Vector2(0, 0))
-    color: tuple[float, float, float, float] = field(default=BOID_COLOR, init=False, repr=False)
+    """
+    Lightweight view of a single boid stored in a `Flock`.
+    """
+
+    __slots__ = ("flock", "index")
+
+    def __init__(self, flock: Flock, index: int):
+        self.flock = flock
+        self.index = index
+
+    @property
+    def id(self) -> int:
+        return self.flock._ids.item(self.index)
+
+    @property
+    def position(self) -> Vector2:
+        positions = self.flock._positions
+        return Vector2(positions.item(self.index, 0), positions.item(self.index, 1))
+
+    @position.setter
+    def position(self, value: Vector2):
+        self.flock._positions[self.index] = (value[0], value[1])
+
+    @property
+    def velocity(self) -> Vector2:
+        velocities = self.flock._velocities
+        return Vector2(velocities.item(self.index, 0), velocities.item(self.index, 1))
+
+    @velocity.setter
+    def velocity(self, value: Vector2):
+        self.flock._velocities[self.index] = (value[0], value[1])
+
+    @property
+    def color_index(self) -> int:
+        return self.flock._color_indices.item(self.index)
+
+    @color_index.setter
+    def color_index(self, value: int):
+        self.flock._color_indices[self.index] = value
+
+    @property
+    def color(self) -> tuple[float, float, float, float]:
+        r, g, b, a = self.flock.palette[self.color_index].tolist()
+        return (r, g, b, a)
 
     def __getitem__(self, index: int) -> float:
-        return self.position[index]
+        return self.flock._positions.item(self.index, index)
 
     def __eq__(self, value: object, /) -> bool:
         if not isinstance(value, Boid):
             return NotImplemented
 
-        return self.position == value.position
+        return self.flock is value.flock and self.id == value.id
+
+    def __hash__(self) -> int:
+        return hash(self.id)
+
+    def __repr__(self) -> str:
+        return f"Boid(id={self.id}, index={self.index}, position={self.position}, velocity={self.velocity})"
 
 
 @dataclass
 class State:
-    boids: SpatialGrid[Boid]
+    flock: Flock
+    boids: SpatialGrid[Boid] | QuadTree[Boid]
     running: bool = field(default=True)
     goal_position: Vector2 = field(default_factory=lambda: Vector2(0, 0))
     goal_next_rotation: int = field(default=0)
     goal_alive: bool = field(default=False)
+    elapsed: float = field(default=0.0)
+    frame: int = field(default=0)
+    obstacles: list[Obstacle] = field(default_factory=list)
+    obstacle_field: ObstacleField | None = field(default=None)
+    obstacle_steering: np.ndarray = field(default_factory=lambda: np.zeros((0, BOID_DIMENSIONS), dtype=np.float32))
+    flow_field: FlowField | None = field(default=None)
+    flow_field_kind: str = field(default="none")
+    flow_velocities: np.ndarray = field(default_factory=lambda: np.zeros((0, BOID_DIMENSIONS), dtype=np.float32))
+    metrics: Metrics | None = field(default=None)
+    analytics: FlockAnalytics | None = field(default=None)
+    verlet: VerletList | None = field(default=None)
+    scheduler: UpdateScheduler | None = field(default=None)
+    index_cells: np.ndarray = field(default_factory=lambda: np.zeros((0, BOID_DIMENSIONS), dtype=np.int64))
+    rng: np.random.Generator = field(default_factory=np.random.default_rng)
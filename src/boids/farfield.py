@@ -0,0 +1,144 @@
+"""
+Hierarchical neighborhood sums for large locality radii.
+
+Cohesion and alignment only need the number of neighbors and the sums of their
+positions and velocities, so a neighborhood that covers whole regions of the
+flock does not have to be visited boid by boid. `AggregatePyramid` stores those
+sums (and the sum of squared position lengths, which gives the density term) for
+every cell of a grid and of each coarser grid above it, where every level has
+cells twice the size of the level below.
+
+A query walks the pyramid from the top: cells entirely inside the radius
+contribute their sums, cells entirely outside are dropped and cells on the edge
+of the circle are split into their four children, down to the individual boids
+of the finest level. All query points are processed together, level by level.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+
+from boids.kernels import build_cell_layout
+
+# Count, position sum (x, y), velocity sum (x, y) and sum of squared position lengths.
+AGGREGATE_FIELDS = 6
+
+# Levels are added until the top one is at most this many cells across.
+TOP_LEVEL_CELLS = 2
+
+
+class AggregatePyramid:
+    def __init__(self, positions: np.ndarray, velocities: np.ndarray, cell_size: float):
+        self.cell_size = cell_size
+        self.layout = build_cell_layout(positions, cell_size)
+        self.origin = np.array(self.layout.origin, dtype=np.float64) * cell_size
+        self.points = np.column_stack(
+            [
+                np.ones(len(positions)),
+                positions.astype(np.float64),
+                velocities.astype(np.float64),
+                np.einsum("ij,ij->i", positions.astype(np.float64), positions.astype(np.float64)),
+            ]
+        )
+
+        cells = np.floor(positions / cell_size).astype(np.int64) - self.layout.origin
+        keys = cells[:, 1] * self.layout.columns + cells[:, 0]
+        finest = np.zeros((self.layout.rows * self.layout.columns, AGGREGATE_FIELDS))
+
+        for field in range(AGGREGATE_FIELDS):
+            finest[:, field] = np.bincount(keys, self.points[:, field], minlength=len(finest))
+
+        self.levels = [finest.reshape(self.layout.rows, self.layout.columns, AGGREGATE_FIELDS)]
+
+        while max(self.levels[-1].shape[:2]) > TOP_LEVEL_CELLS:
+            self.levels.append(_coarsen(self.levels[-1]))
+
+    def totals(self, points: np.ndarray, radius: float, threshold: float = 0.0) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns, for every query point, the count and the position and velocity sums of
+        the boids within `radius` as an (m, 5) array, and the density, the sum of
+        `1 - d^2 / radius^2` over those boids.
+
+        With `threshold` above zero, a cell on the edge of the circle whose size is at most
+        `threshold * radius` is taken whole when its center of mass is within the radius
+        and dropped otherwise, instead of being split further. Zero gives exact results.
+        """
+        points = points.astype(np.float64)
+        radius_squared = radius * radius
+        totals = np.zeros((len(points), AGGREGATE_FIELDS))
+        top = len(self.levels) - 1
+        top_cells = np.flatnonzero(self.levels[top][..., 0].ravel())
+        queries = np.repeat(np.arange(len(points)), len(top_cells))
+        cells = np.tile(top_cells, len(points))
+
+        for level in range(top, -1, -1):
+            sums = self.levels[level]
+            columns = sums.shape[1]
+            size = self.cell_size * 2**level
+            corner = self.origin + np.column_stack([cells % columns, cells // columns]) * size
+            offsets = points[queries] - corner
+            nearest = np.maximum(np.maximum(-offsets, offsets - size), 0)
+            farthest = np.maximum(np.abs(offsets), np.abs(offsets - size))
+            inside = np.einsum("ij,ij->i", farthest, farthest) <= radius_squared
+            edge = ~inside & (np.einsum("ij,ij->i", nearest, nearest) <= radius_squared)
+            aggregates = sums.reshape(-1, AGGREGATE_FIELDS)[cells]
+
+            if threshold > 0 and size <= threshold * radius:
+                centers = aggregates[:, 1:3] / aggregates[:, :1] - points[queries]
+                inside |= edge & (np.einsum("ij,ij->i", centers, centers) <= radius_squared)
+                edge[:] = False
+
+            _accumulate(totals, queries[inside], aggregates[inside])
+
+            if level:
+                queries, cells = _children(queries[edge], cells[edge], columns, self.levels[level - 1])
+            else:
+                queries, cells = queries[edge], cells[edge]
+
+        # What remains are finest cells on the edge of the circle: test their boids one by one.
+        boids, queries = self._boids(cells, queries)
+        offsets = self.points[boids, 1:3] - points[queries]
+        close = np.einsum("ij,ij->i", offsets, offsets) <= radius_squared
+        _accumulate(totals, queries[close], self.points[boids[close]])
+
+        counts = totals[:, 0]
+        lengths = np.einsum("ij,ij->i", points, points)
+        spread = counts * lengths - 2 * np.einsum("ij,ij->i", points, totals[:, 1:3]) + totals[:, 5]
+        return totals[:, :5], counts - spread / radius_squared
+
+    def _boids(self, cells: np.ndarray, queries: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        starts = self.layout.cell_starts[cells]
+        lengths = self.layout.cell_starts[cells + 1] - starts
+        total = int(lengths.sum())
+        within = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        return self.layout.order[np.repeat(starts, lengths) + within], np.repeat(queries, lengths)
+
+
+def _coarsen(sums: np.ndarray) -> np.ndarray:
+    rows, columns = sums.shape[:2]
+    padded = np.zeros((rows + rows % 2, columns + columns % 2, AGGREGATE_FIELDS))
+    padded[:rows, :columns] = sums
+    return padded.reshape(len(padded) // 2, 2, padded.shape[1] // 2, 2, AGGREGATE_FIELDS).sum(axis=(1, 3))
+
+
+def _children(
+    queries: np.ndarray,
+    cells: np.ndarray,
+    columns: int,
+    finer: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Replaces every (query, cell) pair with the pairs for the non-empty children of the cell.
+    """
+    rows, finer_columns = finer.shape[:2]
+    column = (cells % columns)[:, np.newaxis] * 2 + np.array([0, 1, 0, 1])
+    row = (cells // columns)[:, np.newaxis] * 2 + np.array([0, 0, 1, 1])
+    valid = (column < finer_columns) & (row < rows)
+    children = row * finer_columns + column
+    valid[valid] = finer.reshape(-1, AGGREGATE_FIELDS)[children[valid], 0] > 0
+    return np.repeat(queries, valid.sum(axis=1)), children[valid]
+
+
+def _accumulate(totals: np.ndarray, queries: np.ndarray, aggregates: np.ndarray):
+    for field in range(AGGREGATE_FIELDS):
+        totals[:, field] += np.bincount(queries, aggregates[:, field], minlength=len(totals))
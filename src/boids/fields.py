@@ -0,0 +1,89 @@
+import math
+
+import numpy as np
+
+
+def grid_nodes(world_size: tuple[float, float], spacing: float) -> np.ndarray:
+    """
+    Returns the (rows, columns, 2) positions of the nodes of a regular grid
+    with the given spacing that covers the world rectangle.
+    """
+    columns = math.ceil(world_size[0] / spacing) + 1
+    rows = math.ceil(world_size[1] / spacing) + 1
+    ys, xs = np.mgrid[0:rows, 0:columns].astype(np.float32) * spacing
+    return np.stack([xs, ys], axis=-1)
+
+
+class GridField:
+    """
+    Multi-channel values stored at the nodes of a regular grid, with batched
+    bilinear sampling.
+
+    The bilinear patch of every cell is stored as precomputed coefficients
+    (a + b * fx + c * fy + d * fx * fy), so sampling a point costs one gather
+    and a few multiply-adds regardless of the grid resolution.
+    """
+
+    def __init__(self, values: np.ndarray, spacing: float, origin: tuple[float, float] = (0.0, 0.0)):
+        if values.ndim == 2:
+            values = values[:, :, np.newaxis]
+
+        if values.shape[0] < 2 or values.shape[1] < 2:
+            raise ValueError("Grid field needs at least 2x2 nodes.")
+
+        self.spacing = spacing
+        self.origin = np.asarray(origin, dtype=np.float32)
+        self.values = np.ascontiguousarray(values, dtype=np.float32)
+        self.coefficients = np.empty((values.shape[0] - 1, values.shape[1] - 1, 4, values.shape[2]), dtype=np.float32)
+        self._update_coefficients(0, self.rows - 1)
+
+    @property
+    def rows(self) -> int:
+        return self.values.shape[0]
+
+    @property
+    def columns(self) -> int:
+        return self.values.shape[1]
+
+    @property
+    def channels(self) -> int:
+        return self.values.shape[2]
+
+    def update_rows(self, start: int, values: np.ndarray):
+        """
+        Replaces node rows starting at `start` and refreshes only the coefficients
+        of the cells that touch them.
+        """
+        if values.ndim == 2:
+            values = values[:, :, np.newaxis]
+
+        stop = start + len(values)
+        self.values[start:stop] = values
+        self._update_coefficients(max(start - 1, 0), min(stop, self.rows - 1))
+
+    def sample(self, points: np.ndarray) -> np.ndarray:
+        """
+        Bilinearly interpolates the field at an (n, 2) array of points, returning
+        an (n, channels) array. Points outside the grid are clamped to its edge.
+        """
+        local = (points - self.origin) / self.spacing
+        column = np.clip(np.floor(local[:, 0]).astype(np.intp), 0, self.columns - 2)
+        row = np.clip(np.floor(local[:, 1]).astype(np.intp), 0, self.rows - 2)
+        fx = np.clip(local[:, 0] - column, 0.0, 1.0)[:, np.newaxis]
+        fy = np.clip(local[:, 1] - row, 0.0, 1.0)[:, np.newaxis]
+
+        a, b, c, d = np.moveaxis(self.coefficients[row, column], 1, 0)
+
+        return a + b * fx + c * fy + d * (fx * fy)
+
+    def _update_coefficients(self, start: int, stop: int):
+        v00 = self.values[start:stop, :-1]
+        v10 = self.values[start:stop, 1:]
+        v01 = self.values[start + 1 : stop + 1, :-1]
+        v11 = self.values[start + 1 : stop + 1, 1:]
+
+        coefficients = self.coefficients[start:stop]
+        coefficients[:, :, 0] = v00
+        coefficients[:, :, 1] = v10 - v00
+        coefficients[:, :, 2] = v01 - v00
+        coefficients[:, :, 3] = v11 - v10 - v01 + v00
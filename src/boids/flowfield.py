@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import math
+import os
+from dataclasses import dataclass
+from typing import Protocol
+
+import numpy as np
+
+from boids.constants import FLOW_FIELD_UPDATE_NODES
+from boids.fields import GridField, grid_nodes
+
+
+class FlowSource(Protocol):
+    def evaluate(self, points: np.ndarray, time: float) -> np.ndarray:
+        """
+        Returns flow vectors, roughly unit-sized, at an (..., 2) array of points at the given time.
+        """
+        raise NotImplementedError
+
+
+@dataclass(frozen=True)
+class Vortex:
+    center: tuple[float, float]
+    radius: float
+    strength: float = 1.0
+
+
+@dataclass(frozen=True)
+class VortexFlow:
+    """
+    Sum of Lamb-Oseen-like vortices. Positive strength spins clockwise on screen.
+    Vortex centers drift with `drift` pixels per unit of time, wrapping around the world.
+    """
+
+    vortices: tuple[Vortex, ...]
+    world_size: tuple[float, float]
+    drift: tuple[float, float] = (0.0, 0.0)
+
+    def evaluate(self, points: np.ndarray, time: float) -> np.ndarray:
+        flow = np.zeros(points.shape, dtype=np.float32)
+        world_size = np.asarray(self.world_size, dtype=np.float32)
+
+        for vortex in self.vortices:
+            center = (np.asarray(vortex.center, dtype=np.float32) + np.asarray(self.drift) * time) % world_size
+            offsets = points - center
+            offsets = (offsets + world_size / 2) % world_size - world_size / 2
+            distances_squared = (offsets * offsets).sum(axis=-1)
+            radius_squared = vortex.radius * vortex.radius
+            falloff = (1.0 - np.exp(-distances_squared / radius_squared)) / np.maximum(distances_squared, 1e-6)
+            # Scaled so that the peak tangential speed, reached near `radius`, is about `strength`.
+            falloff *= vortex.strength * vortex.radius * 1.6
+            flow[..., 0] -= offsets[..., 1] * falloff
+            flow[..., 1] += offsets[..., 0] * falloff
+
+        return flow
+
+
+@dataclass(frozen=True)
+class NoiseFlow:
+    """
+    Divergence-free turbulence: the curl of a potential built from a few random
+    plane waves, each drifting at its own angular speed.
+    """
+
+    seed: int = 0
+    wavelength: float = 400.0
+    waves: int = 8
+
+    def evaluate(self, points: np.ndarray, time: float) -> np.ndarray:
+        rng = np.random.default_rng(self.seed)
+        angles = rng.uniform(0, 2 * math.pi, self.waves)
+        frequencies = 2 * math.pi / self.wavelength * rng.uniform(0.5, 1.5, self.waves)
+        wave_vectors = np.stack([np.cos(angles), np.sin(angles)], axis=-1) * frequencies[:, np.newaxis]
+        phases = rng.uniform(0, 2 * math.pi, self.waves) + rng.uniform(-1, 1, self.waves) * time
+        amplitudes = 1.0 / (frequencies * math.sqrt(self.waves))
+
+        derivative = np.cos(points @ wave_vectors.T + phases) * amplitudes
+        gradient = derivative @ wave_vectors
+        flow = np.empty(points.shape, dtype=np.float32)
+        flow[..., 0] = gradient[..., 1]
+        flow[..., 1] = -gradient[..., 0]
+
+        return flow
+
+
+class FlowField:
+    """
+    Environment flow sampled on a regular grid, with batched bilinear lookups.
+
+    Time-varying sources are refreshed incrementally: each `advance` call
+    re-evaluates a fixed budget of grid nodes in rotating row bands, so the
+    per-frame cost does not grow with the field resolution.
+    """
+
+    def __init__(self, source: FlowSource | None, values: np.ndarray, spacing: float):
+        self.source = source
+        self.grid = GridField(values, spacing=spacing)
+        ys, xs = np.mgrid[0 : self.grid.rows, 0 : self.grid.columns].astype(np.float32) * spacing
+        self._nodes = np.stack([xs, ys], axis=-1)
+        self._next_row = 0
+
+    @classmethod
+    def from_source(cls, source: FlowSource, world_size: tuple[float, float], resolution: float) -> FlowField:
+        return cls(source, source.evaluate(grid_nodes(world_size, resolution), 0.0), resolution)
+
+    @classmethod
+    def from_file(cls, path: str, world_size: tuple[float, float]) -> FlowField:
+        """
+        Loads a static field from a `.npy` file holding a (rows, columns, 2) array
+        of flow vectors whose nodes span the world width.
+        """
+        values = np.load(path)
+
+        if values.ndim != 3 or values.shape[2] != 2:
+            raise ValueError(f"Flow field in '{path}' must have shape (rows, columns, 2).")
+
+        return cls(None, values, world_size[0] / (values.shape[1] - 1))
+
+    @property
+    def spacing(self) -> float:
+        return self.grid.spacing
+
+    def advance(self, time: float, budget: int = FLOW_FIELD_UPDATE_NODES):
+        if self.source is None:
+            return
+
+        rows = max(1, budget // self.grid.columns)
+        start = self._next_row
+        stop = min(start + rows, self.grid.rows)
+        self.grid.update_rows(start, self.source.evaluate(self._nodes[start:stop], time))
+        self._next_row = stop % self.grid.rows
+
+    def sample(self, points: np.ndarray) -> np.ndarray:
+        return self.grid.sample(points)
+
+
+def create_flow_field(kind: str, world_size: tuple[float, float], resolution: float) -> FlowField | None:
+    match kind:
+        case "none":
+            return None
+        case "vortices":
+            width, height = world_size
+            vortices = (
+                Vortex(center=(width * 0.25, height * 0.3), radius=220.0, strength=1.0),
+                Vortex(center=(width * 0.7, height * 0.65), radius=260.0, strength=-1.0),
+                Vortex(center=(width * 0.5, height * 0.15), radius=160.0, strength=0.7),
+            )
+            return FlowField.from_source(VortexFlow(vortices, world_size, drift=(40.0, 15.0)), world_size, resolution)
+        case "noise":
+            return FlowField.from_source(NoiseFlow(), world_size, resolution)
+        case "file":
+            if not os.path.exists("flow_field.npy"):
+                print("Could not load flow field - 'flow_field.npy' does not exist.")
+                return None
+
+            return FlowField.from_file("flow_field.npy", world_size)
+        case _:
+            raise ValueError(f"Unknown flow field '{kind}'.")
@@ -1,10 +1,26 @@
+import ctypes
 import math
+from collections import deque
+from typing import cast
 
 import numpy as np
 import OpenGL.GL as gl
 from pygame import Vector2
 
-from boids.constants import TOP_MENU_HEIGHT
+from boids.constants import (
+    BOID_SIZE,
+    BOUND_COLOR,
+    BOUND_WIDTH,
+    GOAL_COLOR,
+    GOAL_SIZE,
+    OBSTACLE_COLOR,
+    PALETTE_SIZE,
+    TOP_MENU_HEIGHT,
+)
+from boids.entities import State
+from boids.settings.settings import Settings
+
+TRIANGLE_CORNER_ANGLES = np.array([0, 2 * math.pi / 3, 4 * math.pi / 3], dtype=np.float32)
 
 
 def draw_line(
@@ -98,127 +114,267 @@ def draw_rect_outline(
     gl.glEnd()
 
 
-def hsl_to_rgb(hue: float, saturation: float, lightness: float) -> tuple[float, float, float, float]:
+class StaticMesh:
     """
-    Converts a color from HSL (Hue, Saturation, Lightness) color space to RGBA (Red, Green, Blue, Alpha).
-
-    Args:
-        hue (float): The hue component of the color, in the range [0.0, 1.0].
-        saturation (float): The saturation component of the color, in the range [0.0, 1.0].
-        lightness (float): The lightness component of the color, in the range [0.0, 1.0].
-
-    Returns:
-        (tuple[float, float, float, float]): A tuple representing the RGBA components, each in the range [0.0, 1.0].
+    Triangles uploaded once to a vertex buffer and redrawn from it every frame.
+    The buffer is only re-uploaded when a different triangle array is set.
     """
 
-    def hue_to_rgb(p, q, t):
-        if t < 0:
-            t += 1
-
-        if t > 1:
-            t -= 1
-
-        if t < 1 / 6:
-            return p + (q - p) * 6 * t
+    def __init__(self):
+        self.vbo_id = gl.glGenBuffers(1)
+        self._triangles: np.ndarray | None = None
+        self._vertices_count = 0
 
-        if t < 1 / 2:
-            return q
+    def set_triangles(self, triangles: np.ndarray):
+        if triangles is self._triangles:
+            return
 
-        if t < 2 / 3:
-            return p + (q - p) * (2 / 3 - t) * 6
+        self._triangles = triangles
+        vertices = np.ascontiguousarray(triangles, dtype=np.float32).reshape(-1)
+        self._vertices_count = len(vertices) // 2
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.vbo_id)
+        gl.glBufferData(gl.GL_ARRAY_BUFFER, vertices.nbytes, vertices, gl.GL_STATIC_DRAW)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
 
-        return p
+    def draw(self, color: tuple[float, float, float, float]):
+        if not self._vertices_count:
+            return
 
-    if saturation == 0:
-        r = g = b = lightness
-    else:
-        q = lightness * (1 + saturation) if lightness < 0.5 else lightness + saturation - lightness * saturation
-        p = 2 * lightness - q
-        r = hue_to_rgb(p, q, hue + 1 / 3)
-        g = hue_to_rgb(p, q, hue)
-        b = hue_to_rgb(p, q, hue - 1 / 3)
+        gl.glColor4f(*color)
+        gl.glEnableClientState(gl.GL_VERTEX_ARRAY)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.vbo_id)
+        gl.glVertexPointer(2, gl.GL_FLOAT, 0, None)
+        gl.glDrawArrays(gl.GL_TRIANGLES, 0, self._vertices_count)
+        gl.glDisableClientState(gl.GL_VERTEX_ARRAY)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
 
-    return (r, g, b, 1.0)
+    def cleanup(self):
+        if self.vbo_id is not None:
+            gl.glDeleteBuffers(1, [self.vbo_id])
+            self.vbo_id = None
 
 
 class BatchRenderer:
+    """
+    Draws batches of triangles from vertex buffers. Triangle colors are uploaded
+    as a single palette coordinate per vertex and resolved on the GPU through
+    a 1D palette texture. `uploaded_bytes` holds the bytes sent to the GPU by
+    the last `render` call, including palette changes since the one before.
+    """
+
     def __init__(self):
-        self._vertices = []
-        self._colors = []
+        self._vertices: list[np.ndarray] = []
+        self._palette_coords: list[np.ndarray] = []
+        self._vertices_count = 0
+        self._palette: np.ndarray | None = None
+        self._pending_upload_bytes = 0
+        self.uploaded_bytes = 0
 
         ids = gl.glGenBuffers(2)
         self.vbo_positions_id = ids[0]
-        self.vbo_colors_id = ids[1]
+        self.vbo_palette_coords_id = ids[1]
+        self.palette_texture_id = gl.glGenTextures(1)
 
     def render(self):
         self._update()
         self._draw()
         self._dispose()
+        self.uploaded_bytes = self._pending_upload_bytes
+        self._pending_upload_bytes = 0
+
+    def set_palette(self, palette: np.ndarray):
+        if palette is self._palette:
+            return
+
+        self._palette = palette
+        gl.glBindTexture(gl.GL_TEXTURE_1D, self.palette_texture_id)
+        gl.glTexParameteri(gl.GL_TEXTURE_1D, gl.GL_TEXTURE_MIN_FILTER, gl.GL_NEAREST)
+        gl.glTexParameteri(gl.GL_TEXTURE_1D, gl.GL_TEXTURE_MAG_FILTER, gl.GL_NEAREST)
+        gl.glTexParameteri(gl.GL_TEXTURE_1D, gl.GL_TEXTURE_WRAP_S, gl.GL_CLAMP_TO_EDGE)
+        gl.glTexImage1D(gl.GL_TEXTURE_1D, 0, gl.GL_RGBA, len(palette), 0, gl.GL_RGBA, gl.GL_FLOAT, palette)
+        gl.glBindTexture(gl.GL_TEXTURE_1D, 0)
+        self._pending_upload_bytes += palette.nbytes
 
-    def push_triangle(
+    def push_triangles(
         self,
-        center: tuple[float, float],
+        centers: np.ndarray,
+        directions: np.ndarray,
         size: float,
-        color: tuple[float, float, float, float],
-        direction: float
+        color_indices: np.ndarray,
     ):
-        center_x, center_y = center
+        if not len(centers):
+            return
 
-        for i in range(3):
-            angle = direction + 2 * math.pi * i / 3
-            x = center_x + math.cos(angle) * size
-            y = center_y + math.sin(angle) * size
-            self._push_vertex((x, y), color)
+        angles = directions[:, np.newaxis] + TRIANGLE_CORNER_ANGLES
+        vertices = np.empty((len(centers), 3, 2), dtype=np.float32)
+        vertices[:, :, 0] = centers[:, np.newaxis, 0] + np.cos(angles) * size
+        vertices[:, :, 1] = centers[:, np.newaxis, 1] + np.sin(angles) * size
+
+        palette_coords = (color_indices.astype(np.float32) + 0.5) / PALETTE_SIZE
+        self._vertices.append(vertices.reshape(-1))
+        self._palette_coords.append(np.repeat(palette_coords, 3))
+        self._vertices_count += len(centers) * 3
 
     def cleanup(self):
-        if self.vbo_positions_id is not None and self.vbo_colors_id is not None:
-            gl.glDeleteBuffers(2, [self.vbo_positions_id, self.vbo_colors_id])
+        if self.vbo_positions_id is not None and self.vbo_palette_coords_id is not None:
+            gl.glDeleteBuffers(2, [self.vbo_positions_id, self.vbo_palette_coords_id])
+            gl.glDeleteTextures([self.palette_texture_id])
             self.vbo_positions_id = None
-            self.vbo_colors_id = None
-
-    def _push_vertex(
-        self,
-        position: tuple[float, float],
-        color: tuple[float, float, float, float],
-    ):
-        self._vertices.extend(position)
-        self._colors.extend(color)
+            self.vbo_palette_coords_id = None
+            self.palette_texture_id = None
 
     def _update(self):
-        if not self._vertices:
+        if not self._vertices_count:
             return
 
-        positions_np = np.array(self._vertices, dtype=np.float32)
+        positions_np = np.concatenate(self._vertices)
         gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.vbo_positions_id)
         gl.glBufferData(gl.GL_ARRAY_BUFFER, positions_np.nbytes, positions_np, gl.GL_DYNAMIC_DRAW)
 
-        colors_np = np.array(self._colors, dtype=np.float32)
-        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.vbo_colors_id)
-        gl.glBufferData(gl.GL_ARRAY_BUFFER, colors_np.nbytes, colors_np, gl.GL_DYNAMIC_DRAW)
+        palette_coords_np = np.concatenate(self._palette_coords)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.vbo_palette_coords_id)
+        gl.glBufferData(gl.GL_ARRAY_BUFFER, palette_coords_np.nbytes, palette_coords_np, gl.GL_DYNAMIC_DRAW)
 
         gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
+        self._pending_upload_bytes += positions_np.nbytes + palette_coords_np.nbytes
 
     def _draw(self):
-        if not self._vertices:
+        if not self._vertices_count:
             return
 
+        gl.glEnable(gl.GL_TEXTURE_1D)
+        gl.glBindTexture(gl.GL_TEXTURE_1D, self.palette_texture_id)
+        gl.glColor4f(1.0, 1.0, 1.0, 1.0)
+
         gl.glEnableClientState(gl.GL_VERTEX_ARRAY)
-        gl.glEnableClientState(gl.GL_COLOR_ARRAY)
+        gl.glEnableClientState(gl.GL_TEXTURE_COORD_ARRAY)
 
         gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.vbo_positions_id)
         gl.glVertexPointer(2, gl.GL_FLOAT, 0, None)
 
-        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.vbo_colors_id)
-        gl.glColorPointer(4, gl.GL_FLOAT, 0, None)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.vbo_palette_coords_id)
+        gl.glTexCoordPointer(1, gl.GL_FLOAT, 0, None)
 
-        vertices_count = len(self._vertices) // 2
-        gl.glDrawArrays(gl.GL_TRIANGLES, 0, vertices_count)
+        gl.glDrawArrays(gl.GL_TRIANGLES, 0, self._vertices_count)
 
-        gl.glDisableClientState(gl.GL_COLOR_ARRAY)
+        gl.glDisableClientState(gl.GL_TEXTURE_COORD_ARRAY)
         gl.glDisableClientState(gl.GL_VERTEX_ARRAY)
         gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
+        gl.glBindTexture(gl.GL_TEXTURE_1D, 0)
+        gl.glDisable(gl.GL_TEXTURE_1D)
 
     def _dispose(self):
         self._vertices.clear()
-        self._colors.clear()
+        self._palette_coords.clear()
+        self._vertices_count = 0
+
 
+class OffscreenFramebuffer:
+    """
+    A framebuffer object of `size` pixels to render into without a window. `read` starts
+    an asynchronous copy of the rendered frame into one of `buffers` pixel buffer objects
+    and returns the frames whose copies were started `buffers - 1` reads earlier, so the
+    GPU is never waited on for the frame just drawn. `drain` returns the rest.
+    """
+
+    def __init__(self, size: tuple[int, int], buffers: int = 2):
+        self.size = size
+        width, height = size
+        self.frame_bytes = width * height * 4
+        self.framebuffer_id = gl.glGenFramebuffers(1)
+        self.renderbuffer_id = gl.glGenRenderbuffers(1)
+        gl.glBindRenderbuffer(gl.GL_RENDERBUFFER, self.renderbuffer_id)
+        gl.glRenderbufferStorage(gl.GL_RENDERBUFFER, gl.GL_RGBA8, width, height)
+        gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, self.framebuffer_id)
+        gl.glFramebufferRenderbuffer(
+            gl.GL_FRAMEBUFFER, gl.GL_COLOR_ATTACHMENT0, gl.GL_RENDERBUFFER, self.renderbuffer_id
+        )
+        status = gl.glCheckFramebufferStatus(gl.GL_FRAMEBUFFER)
+        gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, 0)
+
+        if status != gl.GL_FRAMEBUFFER_COMPLETE:
+            raise RuntimeError(f"Framebuffer of {width}x{height} is incomplete (status {status:#x}).")
+
+        self.pixel_buffer_ids = list(np.atleast_1d(gl.glGenBuffers(buffers)))
+
+        for buffer_id in self.pixel_buffer_ids:
+            gl.glBindBuffer(gl.GL_PIXEL_PACK_BUFFER, buffer_id)
+            gl.glBufferData(gl.GL_PIXEL_PACK_BUFFER, self.frame_bytes, None, gl.GL_STREAM_READ)
+
+        gl.glBindBuffer(gl.GL_PIXEL_PACK_BUFFER, 0)
+        self._pending: deque[tuple[int, int]] = deque()
+        self._next_buffer = 0
+
+    def bind(self):
+        gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, self.framebuffer_id)
+        gl.glViewport(0, 0, *self.size)
+
+    def read(self, number: int) -> list[tuple[int, np.ndarray]]:
+        buffer_id = self.pixel_buffer_ids[self._next_buffer]
+        self._next_buffer = (self._next_buffer + 1) % len(self.pixel_buffer_ids)
+        gl.glBindFramebuffer(gl.GL_READ_FRAMEBUFFER, self.framebuffer_id)
+        gl.glPixelStorei(gl.GL_PACK_ALIGNMENT, 1)
+        gl.glBindBuffer(gl.GL_PIXEL_PACK_BUFFER, buffer_id)
+        gl.glReadPixels(0, 0, *self.size, gl.GL_RGBA, gl.GL_UNSIGNED_BYTE, ctypes.c_void_p(0))
+        gl.glBindBuffer(gl.GL_PIXEL_PACK_BUFFER, 0)
+        self._pending.append((number, buffer_id))
+        frames = []
+
+        while len(self._pending) >= len(self.pixel_buffer_ids):
+            frames.append(self._map(*self._pending.popleft()))
+
+        return frames
+
+    def drain(self) -> list[tuple[int, np.ndarray]]:
+        frames = [self._map(number, buffer_id) for number, buffer_id in self._pending]
+        self._pending.clear()
+        return frames
+
+    def _map(self, number: int, buffer_id: int) -> tuple[int, np.ndarray]:
+        """
+        Copies a finished read out of its pixel buffer, top row first.
+        """
+        width, height = self.size
+        gl.glBindBuffer(gl.GL_PIXEL_PACK_BUFFER, buffer_id)
+        address = gl.glMapBuffer(gl.GL_PIXEL_PACK_BUFFER, gl.GL_READ_ONLY)
+
+        try:
+            mapped = np.ctypeslib.as_array((ctypes.c_ubyte * self.frame_bytes).from_address(address))
+            pixels = mapped.reshape(height, width, 4)[::-1].copy()
+        finally:
+            gl.glUnmapBuffer(gl.GL_PIXEL_PACK_BUFFER)
+            gl.glBindBuffer(gl.GL_PIXEL_PACK_BUFFER, 0)
+
+        return number, pixels
+
+    def cleanup(self):
+        gl.glDeleteBuffers(len(self.pixel_buffer_ids), self.pixel_buffer_ids)
+        gl.glDeleteRenderbuffers(1, [self.renderbuffer_id])
+        gl.glDeleteFramebuffers(1, [self.framebuffer_id])
+
+
+def draw_scene(state: State, settings: Settings, batch_renderer: BatchRenderer, obstacle_mesh: StaticMesh):
+    """
+    Draws obstacles, the flock, the boundary and the goal.
+    """
+    if state.obstacle_field is not None:
+        obstacle_mesh.set_triangles(state.obstacle_field.triangles)
+        obstacle_mesh.draw(OBSTACLE_COLOR)
+
+    flock = state.flock
+    batch_renderer.set_palette(flock.palette)
+    batch_renderer.push_triangles(
+        flock.positions,
+        np.arctan2(flock.velocities[:, 1], flock.velocities[:, 0]),
+        BOID_SIZE,
+        flock.color_indices,
+    )
+    batch_renderer.render()
+
+    if settings.get("boundary", "enabled"):
+        top_left = cast(tuple[float, float], settings.get("boundary", "top_left"))
+        bottom_right = cast(tuple[float, float], settings.get("boundary", "bottom_right"))
+        draw_rect_outline(top_left, bottom_right, BOUND_COLOR, line_width=BOUND_WIDTH)
+
+    if state.goal_alive:
+        draw_circle(state.goal_position, GOAL_SIZE, GOAL_COLOR)
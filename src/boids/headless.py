@@ -0,0 +1,187 @@
+import argparse
+import contextlib
+import time
+from typing import Callable, cast
+
+from boids.constants import FPS, SCREEN_SIZE
+from boids.entities import State
+from boids.metrics import Metrics, add_metrics_arguments, create_metrics
+from boids.settings.settings import Settings, load_settings
+from boids.simulation import setup_state, step
+from boids.utils import parse_address, parse_size
+
+
+def run_headless(
+    settings: Settings,
+    frames: int | None = None,
+    *,
+    delta_time: float = 1 / FPS,
+    realtime: bool = False,
+    on_frame: Callable[[State, int], None] | None = None,
+    metrics: Metrics | None = None,
+) -> State:
+    """
+    Steps the simulation with a fixed time step and no window. Runs for `frames`
+    frames, or until interrupted when `frames` is None. With `realtime` set, each
+    frame is paced to take at least `delta_time` seconds of wall time.
+    """
+    state = setup_state(settings)
+    state.metrics = metrics
+    frame = 0
+
+    while state.running and (frames is None or frame < frames):
+        started_at = time.perf_counter()
+        step(state, settings, delta_time)
+        frame += 1
+
+        if on_frame is not None:
+            on_frame(state, frame)
+
+        if metrics is not None:
+            metrics.end_frame()
+
+        if realtime:
+            time.sleep(max(0.0, delta_time - (time.perf_counter() - started_at)))
+
+    return state
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(prog="boids-headless", description="Run the boids simulation without a window.")
+    parser.add_argument("--frames", type=int, default=None, help="Number of frames to simulate (default: forever).")
+    parser.add_argument("--delta-time", type=float, default=1 / FPS, help="Simulation time step in seconds.")
+    parser.add_argument("--realtime", action="store_true", help="Pace frames to the time step.")
+    parser.add_argument("--serve", type=parse_address, metavar="HOST:PORT", help="Stream flock state over TCP.")
+    parser.add_argument("--keyframe-interval", type=int, default=60, help="Frames between streamed keyframes.")
+    parser.add_argument("--shared-memory", metavar="NAME", help="Publish flock state to a shared memory ring buffer.")
+    parser.add_argument("--shared-memory-slots", type=int, default=4, help="Frames kept in the ring buffer.")
+    capture = parser.add_mutually_exclusive_group()
+    capture.add_argument("--capture", metavar="DIRECTORY", help="Render every frame offscreen to a PNG sequence.")
+    capture.add_argument(
+        "--capture-pipe",
+        metavar="COMMAND",
+        help="Render every frame offscreen and pipe raw RGBA frames to COMMAND, "
+        "with {width}, {height} and {fps} filled in.",
+    )
+    parser.add_argument("--capture-size", type=parse_size, default=SCREEN_SIZE, metavar="WIDTHxHEIGHT")
+    parser.add_argument("--capture-workers", type=int, default=None, help="PNG encoder threads (default: CPUs).")
+    parser.add_argument("--capture-queue", type=int, default=8, help="Frames waiting for the encoders at most.")
+    add_metrics_arguments(parser)
+    args = parser.parse_args(argv)
+
+    settings = load_settings()
+    publishers: list[Callable[[State, int], None]] = []
+
+    def on_frame(state: State, number: int):
+        for publish in publishers:
+            publish(state, number)
+
+    # Publishers and metrics are closed on the way out, including when a later one fails to start.
+    with contextlib.ExitStack() as cleanup:
+        if args.serve:
+            publishers.append(start_server(parser, args, cleanup))
+
+        if args.shared_memory:
+            publishers.append(open_ring_buffer(parser, args, settings, cleanup))
+
+        if args.capture or args.capture_pipe:
+            publishers.append(start_capture(parser, args, settings, cleanup))
+
+        try:
+            metrics = create_metrics(args)
+        except OSError as error:
+            parser.error(f"Could not set up metrics: {error}.")
+
+        if metrics is not None:
+            cleanup.callback(metrics.close)
+
+        with contextlib.suppress(KeyboardInterrupt):
+            run_headless(
+                settings,
+                args.frames,
+                delta_time=args.delta_time,
+                realtime=args.realtime,
+                on_frame=on_frame if publishers else None,
+                metrics=metrics,
+            )
+
+
+def start_server(
+    parser: argparse.ArgumentParser,
+    args: argparse.Namespace,
+    cleanup: contextlib.ExitStack,
+) -> Callable[[State, int], None]:
+    from boids.streaming import StreamServer
+
+    host, port = args.serve
+    server = StreamServer(host, port, keyframe_interval=args.keyframe_interval)
+
+    try:
+        server.start()
+    except OSError as error:
+        parser.error(f"Could not stream on {host}:{port}: {error.strerror or error}.")
+
+    cleanup.callback(server.stop)
+    print(f"Streaming flock state on {host}:{server.port}.")
+    return server.publish_state
+
+
+def open_ring_buffer(
+    parser: argparse.ArgumentParser,
+    args: argparse.Namespace,
+    settings: Settings,
+    cleanup: contextlib.ExitStack,
+) -> Callable[[State, int], None]:
+    from boids.ringbuffer import RingWriter
+
+    # Sized for the largest flock the settings allow, so the count can change while running.
+    capacity = cast(int, settings.get_field("boids", "count")["max"])
+
+    try:
+        ring = RingWriter(capacity, slots=args.shared_memory_slots, name=args.shared_memory)
+    except (OSError, ValueError) as error:
+        parser.error(f"Could not create shared memory '{args.shared_memory}': {error}.")
+
+    cleanup.callback(ring.close)
+    print(f"Publishing flock state to shared memory '{ring.name}'.")
+    return ring.publish_state
+
+
+def start_capture(
+    parser: argparse.ArgumentParser,
+    args: argparse.Namespace,
+    settings: Settings,
+    cleanup: contextlib.ExitStack,
+) -> Callable[[State, int], None]:
+    from OpenGL.error import Error as GLError
+
+    from boids.capture import FrameExporter, PipeSink, PngSequenceSink
+    from boids.recorder import OffscreenRecorder
+
+    try:
+        if args.capture:
+            sink: PngSequenceSink | PipeSink = PngSequenceSink(args.capture)
+        else:
+            sink = PipeSink(args.capture_pipe, args.capture_size, 1 / args.delta_time)
+    except (OSError, ValueError) as error:
+        parser.error(f"Could not start capturing: {error}.")
+
+    exporter = FrameExporter(sink, workers=args.capture_workers, queue_size=args.capture_queue)
+
+    def report():
+        print(f"Captured {exporter.frames} frames, waited {exporter.stall_seconds:.1f} s for encoders.")
+
+    cleanup.callback(report)
+
+    try:
+        recorder = OffscreenRecorder(args.capture_size, settings, exporter)
+    except (RuntimeError, GLError) as error:
+        exporter.close()
+        parser.error(f"Could not render offscreen: {error}.")
+
+    cleanup.callback(recorder.close)
+    return recorder.publish_state
+
+
+if __name__ == "__main__":
+    main()
@@ -1,42 +1,131 @@
 from __future__ import annotations
 
+import math
 from dataclasses import dataclass, field
-from typing import Generic, Protocol, TypeVar, runtime_checkable
+from typing import Generic, Protocol, Sequence, TypeVar, runtime_checkable
+
+import numpy as np
 
 
 @runtime_checkable
 class PointLike(Protocol):
+    __slots__ = ()
+
     def __getitem__(self, index: int) -> float: ...
     def __eq__(self, value: object, /) -> bool: ...
 
 
 T = TypeVar("T", bound=PointLike)
 
+DEFAULT_LEAF_SIZE = 16
+
+# Weight balance a subtree may drift to before it is rebuilt, between 0.5 and 1.
+SCAPEGOAT_ALPHA = 0.7
 
-@dataclass
+
+@dataclass(eq=False, slots=True)
 class KDNode(Generic[T]):
+    """
+    A tree node, which is also the handle `KDTree.insert` returns for its item. `split`
+    is the coordinate on the node's axis that divides its subtrees, taken from `point`
+    when the node was placed. `lower` and `upper` bound the region its ancestors'
+    splits leave it, lower bound included, and stay fixed until the node is placed anew.
+    """
+
     data: T
+    point: tuple[float, ...]
+    split: float
+    lower: tuple[float, ...]
+    upper: tuple[float, ...]
+    parent: KDNode[T] | None = field(default=None, repr=False)
+    depth: int = field(default=0)
     left: KDNode[T] | None = field(default=None)
     right: KDNode[T] | None = field(default=None)
+    size: int = field(default=1)
+    deleted: bool = field(default=False)
+
+    def contains(self, point: Sequence[float]) -> bool:
+        return all(low <= value < high for low, value, high in zip(self.lower, point, self.upper))
 
 
 class KDTree(Generic[T]):
+    """
+    Dynamic KD tree. Items with a lower coordinate than a node's split on its axis go
+    left and the rest go right. Each node keeps a copy of its item's coordinates, so
+    items that move must be updated through `move`, with the handle `insert` returned.
+    An item still inside the region of its node only has the copy updated. Otherwise
+    the node is taken out, leaving a tombstone if it has children, and placed again.
+
+    Removal leaves a tombstone, and the tree is rebuilt once tombstones outnumber the
+    items. An insertion that lands deeper than a balanced tree with `SCAPEGOAT_ALPHA`
+    weight balance allows rebuilds the subtree of the nearest unbalanced ancestor,
+    scapegoat-tree style, so the depth stays logarithmic. Rebuilds reuse the nodes of
+    the live items, so handles stay valid.
+    """
+
     def __init__(self, dimensions: int):
         self.size: int = 0
-        self.is_dirty = False
+        self.tombstones: int = 0
         self.dimensions: int = dimensions
         self.root: KDNode[T] | None = None
+        self._unbounded = ((-math.inf,) * dimensions, (math.inf,) * dimensions)
 
-    def insert(self, item: T):
-        self.is_dirty = True
-        self.root = self._insert(item, self.root, 0)
+    def insert(self, item: T) -> KDNode[T]:
+        point = self._point(item)
+        lower, upper = self._unbounded
+        node = KDNode[T](data=item, point=point, split=point[0], lower=lower, upper=upper)
+        self._place(node)
+        return node
 
     def remove(self, item: T):
-        self.is_dirty = True
-        self.root = self._remove(self.root, item, depth=0)
+        node = self._find(item, self._point(item))
+
+        if node is not None:
+            self.discard(node)
+
+    def discard(self, handle: KDNode[T]):
+        handle.deleted = True
+        self.size -= 1
+        self.tombstones += 1
+
+        if self.tombstones > self.size:
+            self.rebuild()
+
+    def move(self, handle: KDNode[T]):
+        """
+        Updates the node of an item after the item moved.
+        """
+        point = self._point(handle.data)
+
+        if handle.contains(point):
+            handle.point = point
+            return
+
+        # The root's region is unbounded, so the item is placed again below its nearest
+        # ancestor that still contains it, usually only a level or two up.
+        anchor = handle.parent
+
+        while anchor is not None and not anchor.contains(point):
+            anchor = anchor.parent
+
+        if handle.left is None and handle.right is None:
+            self._unlink(handle, anchor)
+        else:
+            self._vacate(handle, anchor)
+
+        handle.point = point
+        self._place(handle, anchor)
+
+        if self.tombstones > self.size:
+            self.rebuild()
+
+    def rebuild(self):
+        lower, upper = self._unbounded
+        self.root = self._build(self._live_nodes(self.root), 0, None, lower, upper)
+        self.tombstones = 0
 
     def search(self, item: T) -> T | None:
-        needle = self._search(item, self.root, 0)
+        needle = self._find(item, self._point(item))
 
         if needle is None:
             return None
@@ -45,7 +134,31 @@ class KDTree(Generic[T]):
 
     def search_radius(self, query: T, radius: float) -> list[T]:
         results: list[T] = []
-        self._search_radius(self.root, query, radius, 0, results)
+        point = self._point(query)
+        radius_squared = radius * radius
+        stack = [(self.root, 0)]
+
+        while stack:
+            node, depth = stack.pop()
+
+            if node is None:
+                continue
+
+            if not node.deleted:
+                distance = sum((node.point[i] - point[i]) ** 2 for i in range(self.dimensions))
+
+                if distance <= radius_squared:
+                    results.append(node.data)
+
+            axis = depth % self.dimensions
+            difference = point[axis] - node.split
+
+            if difference < radius:
+                stack.append((node.left, depth + 1))
+
+            if difference >= -radius:
+                stack.append((node.right, depth + 1))
+
         return results
 
     def display(self, node: KDNode[T] | None = None, depth: int = 0):
@@ -58,7 +171,8 @@ class KDTree(Generic[T]):
 
         axis = depth % self.dimensions
         indent = "  " * depth
-        print(f"{indent}|- {node.data} (axis={axis})")
+        marker = " (deleted)" if node.deleted else ""
+        print(f"{indent}|- {node.data} (axis={axis}){marker}")
 
         if node.left:
             self.display(node.left, depth + 1)
@@ -66,122 +180,357 @@ class KDTree(Generic[T]):
         if node.right:
             self.display(node.right, depth + 1)
 
-    def _traverse(self, node: KDNode[T] | None):
-        if node is None:
-            return
-
-        yield from self._traverse(node.left)
-        yield node.data
-        yield from self._traverse(node.right)
+    def _point(self, item: T) -> tuple[float, ...]:
+        match self.dimensions:
+            case 2:
+                return (item[0], item[1])
+            case _:
+                return tuple(item[dimension] for dimension in range(self.dimensions))
 
-    def _search(self, item: T, node: KDNode[T] | None, depth: int) -> KDNode[T] | None:
-        if node is None:
-            return None
+    def _depth_limit(self) -> int:
+        return math.floor(math.log(self.size + self.tombstones, 1 / SCAPEGOAT_ALPHA))
 
-        if item == node.data:
-            return node
+    def _find(self, item: T, point: tuple[float, ...]) -> KDNode[T] | None:
+        node = self.root
+        depth = 0
 
-        axis = depth % self.dimensions
-
-        if item[axis] < node.data[axis]:
-            return self._search(item, node.left, depth + 1)
-        else:
-            return self._search(item, node.right, depth + 1)
-
-    def _find_min(self, node: KDNode[T] | None, axis: int, depth: int = 0):
-        if node is None:
-            return None
-
-        current_axis = depth % self.dimensions
-
-        if current_axis == axis:
-            if node.left is None:
+        while node is not None:
+            if not node.deleted and node.point == point and item == node.data:
                 return node
 
-            return self._find_min(node.left, axis, depth + 1)
-        else:
-            left_min = self._find_min(node.left, axis, depth + 1)
-            right_min = self._find_min(node.right, axis, depth + 1)
-
-            return min([n for n in [node, left_min, right_min] if n is not None], key=lambda n: n.data[axis])
-
-    def _remove(self, node: KDNode[T] | None, item: T, depth: int) -> KDNode[T] | None:
-        if node is None:
-            return None
-
-        axis = depth % self.dimensions
-
-        if item == node.data:
-            if node.right:
-                min_node = self._find_min(node.right, axis, depth + 1)
+            axis = depth % self.dimensions
+            node = node.left if point[axis] < node.split else node.right
+            depth += 1
+
+        return None
+
+    def _place(self, node: KDNode[T], start: KDNode[T] | None = None):
+        """
+        Hangs a detached node under the leaf its point descends to from `start`, the root
+        by default, counting it in the sizes of `start` and the nodes below.
+        """
+        node.left = node.right = None
+        node.size = 1
+        self.size += 1
+        current = self.root if start is None else start
+
+        if current is None:
+            node.split = node.point[0]
+            node.parent = None
+            node.depth = 0
+            node.lower, node.upper = self._unbounded
+            self.root = node
+            return
 
-                if min_node is None:
-                    return node.left
+        point = node.point
+        depth = current.depth
 
-                node.data = min_node.data
-                node.right = self._remove(node.right, min_node.data, depth + 1)
-            elif node.left:
-                min_node = self._find_min(node.left, axis, depth + 1)
+        while True:
+            current.size += 1
+            child = current.left if point[depth % self.dimensions] < current.split else current.right
 
-                if min_node is None:
-                    return node.right
+            if child is None:
+                break
 
-                node.data = min_node.data
-                node.left = self._remove(node.left, min_node.data, depth + 1)
-            else:
-                return None
-        elif item[axis] < node.data[axis]:
-            node.left = self._remove(node.left, item, depth + 1)
-        else:
-            node.right = self._remove(node.right, item, depth + 1)
+            current = child
+            depth += 1
 
-        return node
+        axis = depth % self.dimensions
+        lower, upper = list(current.lower), list(current.upper)
 
-    def _insert(self, item: T, node: KDNode[T] | None, dimension: int) -> KDNode[T]:
-        if node is None:
-            node = KDNode[T](data=item)
-        elif item[dimension] < node.data[dimension]:
-            node.left = self._insert(item, node.left, (dimension + 1) % self.dimensions)
+        if point[axis] < current.split:
+            current.left = node
+            upper[axis] = current.split
         else:
-            node.right = self._insert(item, node.right, (dimension + 1) % self.dimensions)
-
-        return node
-
-    def _search_radius(self, node: KDNode[T] | None, query: T, radius: float, depth: int, results: list[T]):
-        if node is None:
+            current.right = node
+            lower[axis] = current.split
+
+        node.parent = current
+        node.depth = depth + 1
+        node.lower, node.upper = tuple(lower), tuple(upper)
+        node.split = point[node.depth % self.dimensions]
+
+        if node.depth > self._depth_limit():
+            self._rebuild_scapegoat(self._path(node))
+
+    def _path(self, node: KDNode[T]) -> list[KDNode[T]]:
+        """
+        The nodes from the root down to `node`.
+        """
+        path = []
+        current: KDNode[T] | None = node
+
+        while current is not None:
+            path.append(current)
+            current = current.parent
+
+        return path[::-1]
+
+    def _unlink(self, leaf: KDNode[T], anchor: KDNode[T] | None = None):
+        """
+        Takes a leaf out of the tree, uncounting it from the sizes of its ancestors up to
+        and including `anchor`, all of them by default.
+        """
+        self.size -= 1
+        parent = leaf.parent
+
+        if parent is None:
+            self.root = None
             return
 
-        data = node.data
-        distance = sum((data[i] - query[i]) ** 2 for i in range(self.dimensions))
-
-        if distance <= radius * radius:
-            results.append(data)
+        if parent.left is leaf:
+            parent.left = None
+        else:
+            parent.right = None
+
+        while parent is not None:
+            parent.size -= 1
+
+            if parent is anchor:
+                break
+
+            parent = parent.parent
+
+    def _vacate(self, node: KDNode[T], anchor: KDNode[T] | None = None):
+        """
+        Takes an inner node out of the tree, leaving a tombstone in its place that keeps
+        the sizes of its ancestors. The ancestors of `anchor` count the node once more,
+        since it will be placed again below `anchor`.
+        """
+        tombstone = KDNode[T](
+            data=node.data,
+            point=node.point,
+            split=node.split,
+            lower=node.lower,
+            upper=node.upper,
+            parent=node.parent,
+            depth=node.depth,
+            left=node.left,
+            right=node.right,
+            size=node.size,
+            deleted=True,
+        )
+        self._replace(node.parent, node, tombstone)
+
+        for child in (node.left, node.right):
+            if child is not None:
+                child.parent = tombstone
+
+        self.size -= 1
+        self.tombstones += 1
+        ancestor = anchor.parent if anchor is not None else None
+
+        while ancestor is not None:
+            ancestor.size += 1
+            ancestor = ancestor.parent
+
+    def _replace(self, parent: KDNode[T] | None, node: KDNode[T], replacement: KDNode[T] | None):
+        """
+        Points `parent`, or the root if there is none, at `replacement` instead of `node`.
+        """
+        if parent is None:
+            self.root = replacement
+        elif parent.left is node:
+            parent.left = replacement
+        else:
+            parent.right = replacement
+
+    def _rebuild_scapegoat(self, path: list[KDNode[T]]):
+        scapegoat = 0
+
+        for depth in range(len(path) - 2, -1, -1):
+            if path[depth + 1].size > SCAPEGOAT_ALPHA * path[depth].size:
+                scapegoat = depth
+                break
+
+        subtree = path[scapegoat]
+        parent = subtree.parent
+        nodes = self._live_nodes(subtree)
+        removed = subtree.size - len(nodes)
+        rebuilt = self._build(nodes, scapegoat, parent, subtree.lower, subtree.upper)
+        self.tombstones -= removed
+
+        for ancestor in path[:scapegoat]:
+            ancestor.size -= removed
+
+        self._replace(parent, subtree, rebuilt)
+
+    def _live_nodes(self, root: KDNode[T] | None) -> list[KDNode[T]]:
+        nodes = []
+        stack = [root]
+
+        while stack:
+            node = stack.pop()
+
+            if node is None:
+                continue
+
+            if not node.deleted:
+                nodes.append(node)
+
+            stack.append(node.left)
+            stack.append(node.right)
+
+        return nodes
+
+    def _build(
+        self,
+        nodes: list[KDNode[T]],
+        depth: int,
+        parent: KDNode[T] | None,
+        lower: tuple[float, ...],
+        upper: tuple[float, ...],
+    ) -> KDNode[T] | None:
+        """
+        Builds a balanced subtree from `nodes` by median splits, filling the region from
+        `lower` to `upper`. Nodes equal to the median on the split axis go right, as they
+        would on insertion.
+        """
+        if not nodes:
+            return None
 
         axis = depth % self.dimensions
-        diff = query[axis] - data[axis]
-        args = [query, radius, depth + 1, results]
-
-        if abs(diff) <= radius:
-            self._search_radius(node.left, *args)
-            self._search_radius(node.right, *args)
-        elif diff < 0:
-            self._search_radius(node.left, *args)
-        else:
-            self._search_radius(node.right, *args)
+        nodes.sort(key=lambda node: node.point[axis])
+        middle = len(nodes) // 2
+
+        while middle > 0 and nodes[middle - 1].point[axis] == nodes[middle].point[axis]:
+            middle -= 1
+
+        root = nodes[middle]
+        split = root.point[axis]
+        root.split = split
+        root.parent = parent
+        root.depth = depth
+        root.lower = lower
+        root.upper = upper
+        left_upper = (*upper[:axis], split, *upper[axis + 1 :])
+        right_lower = (*lower[:axis], split, *lower[axis + 1 :])
+        root.left = self._build(nodes[:middle], depth + 1, root, lower, left_upper)
+        root.right = self._build(nodes[middle + 1 :], depth + 1, root, right_lower, upper)
+        root.size = len(nodes)
+        return root
 
     def __iter__(self):
-        yield from self._traverse(self.root)
+        stack = [self.root]
 
-    def __len__(self):
-        if not self.is_dirty:
-            return self.size
+        while stack:
+            node = stack.pop()
 
-        size = 0
+            if node is None:
+                continue
 
-        for _ in self:
-            size += 1
+            stack.append(node.right)
 
-        self.size = size
-        self.is_dirty = False
+            if not node.deleted:
+                yield node.data
 
-        return size
+            stack.append(node.left)
+
+    def __len__(self):
+        return self.size
+
+
+class FlatKDTree:
+    """
+    Static KD tree over an (n, dimensions) array of points, stored in flat arrays.
+
+    The tree is complete and implicit: node `k` has children `2k + 1` and `2k + 2`, and
+    only the split axis and value of each inner node are stored. Every leaf is a bucket
+    of up to about `leaf_size` points, kept contiguous in `points` through the `order`
+    permutation. Queries return indices into the original array.
+    """
+
+    def __init__(self, points: np.ndarray, leaf_size: int = DEFAULT_LEAF_SIZE):
+        count, self.dimensions = points.shape
+        leaves = 1 << max(math.ceil(count / leaf_size) - 1, 0).bit_length()
+        self.first_leaf = leaves - 1
+        self.leaf_starts = np.linspace(0, count, leaves + 1).astype(np.intp)
+        self.split_axes = np.zeros(self.first_leaf, dtype=np.int8)
+        self.split_values = np.zeros(self.first_leaf, dtype=points.dtype)
+        self.order = np.arange(count, dtype=np.intp)
+
+        for node in range(self.first_leaf):
+            depth = (node + 1).bit_length() - 1
+            span = leaves >> depth
+            first = (node + 1 - (1 << depth)) * span
+            start, middle, end = self.leaf_starts[[first, first + span // 2, first + span]]
+            segment = self.order[start:end]
+            values = points[segment]
+            axis = int(np.argmax(values.max(axis=0) - values.min(axis=0))) if end > start else 0
+            partition = np.argpartition(values[:, axis], middle - start) if middle < end else None
+
+            if partition is not None:
+                self.order[start:end] = segment[partition]
+                self.split_values[node] = points[self.order[middle], axis]
+
+            self.split_axes[node] = axis
+
+        self.points = points[self.order]
+
+    @property
+    def nbytes(self) -> int:
+        arrays = [self.points, self.order, self.leaf_starts, self.split_axes, self.split_values]
+        return sum(array.nbytes for array in arrays)
+
+    def search_radius(self, point: Sequence[float], radius: float) -> np.ndarray:
+        """
+        Indices of the points within `radius` of `point`.
+        """
+        query = np.asarray(point, dtype=self.points.dtype)
+        radius_squared = radius * radius
+        found: list[np.ndarray] = []
+        stack = [0]
+
+        while stack:
+            node = stack.pop()
+
+            if node >= self.first_leaf:
+                leaf = node - self.first_leaf
+                start, end = self.leaf_starts[leaf], self.leaf_starts[leaf + 1]
+                offsets = self.points[start:end] - query
+                found.append(self.order[start:end][np.einsum("ij,ij->i", offsets, offsets) <= radius_squared])
+                continue
+
+            difference = query[self.split_axes[node]] - self.split_values[node]
+
+            if difference <= radius:
+                stack.append(2 * node + 1)
+
+            if difference >= -radius:
+                stack.append(2 * node + 2)
+
+        return np.concatenate(found) if found else np.zeros(0, dtype=np.intp)
+
+    def search_radius_batch(self, points: np.ndarray, radius: float) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Radius queries for many points in one pass. Returns CSR-style results:
+        `indices[starts[i]:starts[i + 1]]` are the points within `radius` of `points[i]`.
+        All queries descend the tree together, one level at a time.
+        """
+        queries = np.arange(len(points))
+        nodes = np.zeros(len(points), dtype=np.intp)
+
+        while len(nodes) and nodes[0] < self.first_leaf:
+            differences = points[queries, self.split_axes[nodes]] - self.split_values[nodes]
+            left = differences <= radius
+            right = differences >= -radius
+            queries = np.concatenate([queries[left], queries[right]])
+            nodes = np.concatenate([2 * nodes[left] + 1, 2 * nodes[right] + 2])
+
+        leaves = nodes - self.first_leaf
+        starts = self.leaf_starts[leaves]
+        lengths = self.leaf_starts[leaves + 1] - starts
+        within = np.arange(int(lengths.sum())) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        candidates = np.repeat(starts, lengths) + within
+        queries = np.repeat(queries, lengths)
+        offsets = self.points[candidates] - points[queries]
+        close = np.einsum("ij,ij->i", offsets, offsets) <= radius * radius
+        queries, candidates = queries[close], candidates[close]
+
+        order = np.argsort(queries, kind="stable")
+        result_starts = np.zeros(len(points) + 1, dtype=np.intp)
+        np.cumsum(np.bincount(queries, minlength=len(points)), out=result_starts[1:])
+        return result_starts, self.order[candidates[order]]
+
+    def __len__(self):
+        return len(self.points)
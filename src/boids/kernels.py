@@ -0,0 +1,282 @@
+"""
+Compiled kernels for the flocking step.
+
+When Numba is installed, the kernels are compiled to machine code on first use,
+run in parallel across cores and cached on disk next to this module. Numba itself
+is only imported at that point, so importing this module stays cheap. Without
+Numba they are plain Python functions over the same arrays, which is only
+practical for tests and small flocks; callers should check `HAS_NUMBA` and use
+the per-boid rule path otherwise.
+"""
+
+from __future__ import annotations
+
+import functools
+import importlib.util
+import math
+import os
+from dataclasses import dataclass
+
+import numpy as np
+
+HAS_NUMBA = importlib.util.find_spec("numba") is not None
+prange = range
+
+
+def jit(**options):
+    def decorator(function):
+        compiled = None
+
+        @functools.wraps(function)
+        def wrapper(*args):
+            nonlocal compiled
+
+            if compiled is None:
+                compiled = _compile(function, options)
+
+            return compiled(*args)
+
+        return wrapper
+
+    return decorator
+
+
+def _compile(function, options: dict):
+    if not HAS_NUMBA:
+        return function
+
+    import numba
+
+    # Numba resolves globals when compiling, so kernels see its parallel range from here on.
+    global prange
+    prange = numba.prange
+
+    return numba.njit(cache=True, fastmath=True, **options)(function)
+
+
+@dataclass(frozen=True)
+class CellLayout:
+    """
+    Boids bucketed by `SpatialGrid` cell coordinates into a dense block of cells
+    spanning the occupied area, stored CSR-style: `order[cell_starts[c]:cell_starts[c + 1]]`
+    are the indices of the boids in cell `c`, numbered row by row from `origin`.
+    """
+
+    cell_size: float
+    origin: tuple[int, int]
+    columns: int
+    rows: int
+    order: np.ndarray
+    cell_starts: np.ndarray
+
+
+def build_cell_layout(positions: np.ndarray, cell_size: float) -> CellLayout:
+    if not len(positions):
+        return CellLayout(cell_size, (0, 0), 1, 1, np.zeros(0, dtype=np.int64), np.zeros(2, dtype=np.int64))
+
+    cells = np.floor(positions / cell_size).astype(np.int64)
+    origin = cells.min(axis=0)
+    columns, rows = (cells.max(axis=0) - origin + 1).tolist()
+    keys = (cells[:, 1] - origin[1]) * columns + (cells[:, 0] - origin[0])
+
+    cell_starts = np.zeros(columns * rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=columns * rows), out=cell_starts[1:])
+
+    return CellLayout(
+        cell_size=cell_size,
+        origin=(int(origin[0]), int(origin[1])),
+        columns=columns,
+        rows=rows,
+        order=np.argsort(keys, kind="stable"),
+        cell_starts=cell_starts,
+    )
+
+
+@dataclass(frozen=True)
+class NeighborBuffer:
+    """
+    Where the flocking kernel records the neighbor graph. Every pair is found once, from
+    one of its two boids: row `i` of `slots` receives the neighbors found from boid `i`,
+    and `counts[i]` how many there were, which exceeds the row length when the row
+    overflowed. `nearest_distances[i]` is the distance to the nearest neighbor, or
+    infinity where there is none.
+    """
+
+    slots: np.ndarray
+    counts: np.ndarray
+    nearest_distances: np.ndarray
+
+    @classmethod
+    def create(cls, count: int, capacity: int) -> NeighborBuffer:
+        return cls(
+            slots=np.empty((count, capacity), dtype=np.int32),
+            counts=np.zeros(count, dtype=np.int32),
+            nearest_distances=np.full(count, np.inf, dtype=np.float32),
+        )
+
+    @property
+    def required_capacity(self) -> int:
+        return int(self.counts.max(initial=0))
+
+    @property
+    def overflowed(self) -> bool:
+        return self.required_capacity > self.slots.shape[1]
+
+    def pairs(self) -> np.ndarray:
+        """
+        Recorded neighbor pairs as an (m, 2) array, lower index first.
+        """
+        filled = np.arange(self.slots.shape[1]) < self.counts[:, np.newaxis]
+        rows, columns = np.nonzero(filled)
+        pairs = np.stack([rows, self.slots[rows, columns]], axis=-1).astype(np.intp)
+        pairs.sort(axis=1)
+        return pairs
+
+
+@jit(parallel=True)
+def _pair_sums(
+    positions,
+    velocities,
+    order,
+    cell_starts,
+    columns,
+    rows,
+    reach,
+    bands,
+    band_rows,
+    parity,
+    locality,
+    separation_distance,
+    sums,
+    nearest_squared,
+    neighbor_slots,
+    neighbor_slot_counts,
+):
+    locality_squared = locality * locality
+    separation_squared = separation_distance * separation_distance
+    slot_capacity = neighbor_slots.shape[1]
+
+    for half in prange((bands - parity + 1) // 2):
+        band = 2 * half + parity
+
+        for cell in range(band * band_rows * columns, min((band + 1) * band_rows, rows) * columns):
+            row = cell // columns
+            column = cell % columns
+
+            for a_k in range(cell_starts[cell], cell_starts[cell + 1]):
+                a = order[a_k]
+                recorded = 0
+
+                # Half stencil: the rest of this cell, the rest of this row and the rows below.
+                for other_row in range(row, min(row + reach, rows - 1) + 1):
+                    first_column = column if other_row == row else max(column - reach, 0)
+
+                    for other_column in range(first_column, min(column + reach, columns - 1) + 1):
+                        other = other_row * columns + other_column
+                        first = a_k + 1 if other == cell else cell_starts[other]
+
+                        for b_k in range(first, cell_starts[other + 1]):
+                            b = order[b_k]
+                            dx = positions[a, 0] - positions[b, 0]
+                            dy = positions[a, 1] - positions[b, 1]
+                            distance_squared = dx * dx + dy * dy
+
+                            if distance_squared > locality_squared:
+                                continue
+
+                            density = 1.0 - distance_squared / locality_squared
+                            sums[a, 0] += 1.0
+                            sums[b, 0] += 1.0
+                            sums[a, 1] += density
+                            sums[b, 1] += density
+                            sums[a, 2] += positions[b, 0]
+                            sums[a, 3] += positions[b, 1]
+                            sums[b, 2] += positions[a, 0]
+                            sums[b, 3] += positions[a, 1]
+                            sums[a, 4] += velocities[b, 0]
+                            sums[a, 5] += velocities[b, 1]
+                            sums[b, 4] += velocities[a, 0]
+                            sums[b, 5] += velocities[a, 1]
+                            nearest_squared[a] = min(nearest_squared[a], distance_squared)
+                            nearest_squared[b] = min(nearest_squared[b], distance_squared)
+
+                            if 0.0 < distance_squared < separation_squared:
+                                distance = math.sqrt(distance_squared)
+                                weight = (separation_distance - distance) / (separation_distance * distance)
+                                sums[a, 6] += dx * weight
+                                sums[a, 7] += dy * weight
+                                sums[b, 6] -= dx * weight
+                                sums[b, 7] -= dy * weight
+
+                            if recorded < slot_capacity:
+                                neighbor_slots[a, recorded] = b
+
+                            recorded += 1
+
+                neighbor_slot_counts[a] = recorded
+
+
+def flocking_forces(
+    positions: np.ndarray,
+    velocities: np.ndarray,
+    layout: CellLayout,
+    locality: float,
+    separation_distance: float,
+    separation_strength: float,
+    cohesion: float,
+    alignment: float,
+    neighbor_counts: np.ndarray,
+    densities: np.ndarray,
+    neighbors: NeighborBuffer | None = None,
+) -> np.ndarray:
+    """
+    Fused neighbor search and cohesion, separation and alignment rules for every boid.
+    Cohesion and alignment are fractions (the settings percentage divided by 100).
+    Neighbor counts and densities, excluding the boid itself, are written to the given arrays,
+    and the neighbor graph to `neighbors` when given.
+
+    Every pair of neighbors is visited once, through a half stencil of cells, and adds to
+    the sums of both boids. Bands of cell rows run in parallel, at least as tall as a pair
+    reaches, so that bands two apart never touch the same boids: the even bands run first
+    and then the odd ones, all adding to one set of sums.
+    """
+    count = len(positions)
+    neighbors = neighbors if neighbors is not None else NeighborBuffer.create(count, 0)
+    reach = math.ceil(locality / layout.cell_size)
+    bands = max(1, min(layout.rows // max(reach, 1), 2 * (os.cpu_count() or 1)))
+    sums = np.zeros((count, 8), dtype=np.float64)
+    nearest_squared = np.full(count, np.inf, dtype=np.float64)
+
+    # A band writes to its own rows and the `reach` rows below, which fit in the next band,
+    # so the even bands and then the odd bands can each run at once on the same sums.
+    for parity in range(2):
+        _pair_sums(
+            positions,
+            velocities,
+            layout.order,
+            layout.cell_starts,
+            layout.columns,
+            layout.rows,
+            reach,
+            bands,
+            -(-layout.rows // bands),
+            parity,
+            locality,
+            separation_distance,
+            sums,
+            nearest_squared,
+            neighbors.slots,
+            neighbors.counts,
+        )
+
+    neighbor_counts[:] = sums[:, 0]
+    densities[:] = sums[:, 1]
+    np.sqrt(nearest_squared, out=neighbors.nearest_distances, casting="same_kind")
+
+    # Every boid is its own neighbor in the averages, as in the rules.
+    neighborhood = sums[:, :1] + 1.0
+    forces = (sums[:, 2:4] + positions) / neighborhood - positions
+    forces *= cohesion
+    forces += ((sums[:, 4:6] + velocities) / neighborhood - velocities) * alignment
+    forces += sums[:, 6:8] * separation_strength
+    return forces.astype(positions.dtype)
@@ -0,0 +1,358 @@
+"""
+Opt-in telemetry for long runs.
+
+Observations are aggregated into fixed-bucket histograms, so recording a value
+costs a binary search and an increment. Every `interval` seconds the current
+window is handed to a sink - a JSON lines file or a Prometheus text endpoint -
+and a p50/p95/p99 summary of the whole run is printed when metrics are closed.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from dataclasses import dataclass
+from typing import Protocol, Sequence
+
+import numpy as np
+
+from boids.utils import parse_address
+
+if sys.platform != "win32":
+    import resource
+
+TIME_BUCKETS = tuple(1e-5 * 2**i for i in range(21))
+COUNT_BUCKETS = tuple(float(2**i) for i in range(13))
+BYTE_BUCKETS = tuple(1024.0 * 2**i for i in range(17))
+DISTANCE_BUCKETS = tuple(2.0 ** (i / 2) for i in range(21))
+
+METRIC_PREFIX = "boids_"
+
+
+class Histogram:
+    """
+    Counts of observations per bucket, where bucket `i` holds values in
+    (bounds[i - 1], bounds[i]] and the last bucket everything above the last bound.
+    """
+
+    __slots__ = ("bounds", "count", "counts", "maximum", "total")
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.total = 0.0
+        self.count = 0
+        self.maximum = -math.inf
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.count += 1
+        self.maximum = max(self.maximum, value)
+
+    def observe_many(self, values: np.ndarray):
+        if not len(values):
+            return
+
+        buckets = np.bincount(np.searchsorted(self.bounds, values, side="left"), minlength=len(self.counts))
+
+        for index, count in enumerate(buckets.tolist()):
+            self.counts[index] += count
+
+        self.total += float(values.sum())
+        self.count += len(values)
+        self.maximum = max(self.maximum, float(values.max()))
+
+    def merge(self, other: Histogram):
+        for index, count in enumerate(other.counts):
+            self.counts[index] += count
+
+        self.total += other.total
+        self.count += other.count
+        self.maximum = max(self.maximum, other.maximum)
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimates a quantile by interpolating linearly inside the bucket it falls into.
+        """
+        if not self.count:
+            return math.nan
+
+        rank = q * self.count
+        seen = 0
+
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.bounds[index - 1] if index > 0 else 0.0
+                upper = self.bounds[index] if index < len(self.bounds) else self.maximum
+                return min(lower + (upper - lower) * (rank - seen) / count, self.maximum)
+
+            seen += count
+
+        return self.maximum
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "max": self.maximum if self.count else None,
+            "p50": self.quantile(0.5) if self.count else None,
+            "p95": self.quantile(0.95) if self.count else None,
+            "p99": self.quantile(0.99) if self.count else None,
+            "bounds": list(self.bounds),
+            "counts": self.counts,
+        }
+
+
+@dataclass(frozen=True)
+class MetricsSnapshot:
+    time: float
+    frames: int
+    window: dict[str, Histogram]
+    totals: dict[str, Histogram]
+    gauges: dict[str, float]
+
+
+class MetricsSink(Protocol):
+    def emit(self, snapshot: MetricsSnapshot):
+        raise NotImplementedError
+
+    def close(self):
+        raise NotImplementedError
+
+
+class JsonLinesSink:
+    """
+    Appends one JSON object per interval with the histograms of that interval only.
+    The file is opened for each record, so nothing is left open between intervals.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+        # Fail early on a path that cannot be written.
+        with open(path, "a"):
+            pass
+
+    def emit(self, snapshot: MetricsSnapshot):
+        record = {
+            "time": snapshot.time,
+            "frames": snapshot.frames,
+            "histograms": {name: histogram.to_dict() for name, histogram in snapshot.window.items()},
+            "gauges": snapshot.gauges,
+        }
+
+        with open(self.path, "a") as file:
+            file.write(json.dumps(record) + "\n")
+
+    def close(self):
+        pass
+
+
+class PrometheusSink:
+    """
+    Serves the cumulative histograms and gauges of the latest snapshot at
+    `http://host:port/metrics` in the Prometheus text exposition format.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        # Deferred: http.server and the email package it loads add ~50 ms to importing the core.
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer  # noqa: PLC0415
+
+        sink = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+
+                body = sink.text.encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.text = ""
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, name="boids-metrics-http", daemon=True)
+        self._thread.start()
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def emit(self, snapshot: MetricsSnapshot):
+        self.text = to_prometheus_text(snapshot)
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+
+def to_prometheus_text(snapshot: MetricsSnapshot) -> str:
+    lines = []
+
+    for name, histogram in snapshot.totals.items():
+        metric = METRIC_PREFIX + name
+        lines.append(f"# TYPE {metric} histogram")
+        cumulative = 0
+
+        for bound, count in zip(histogram.bounds, histogram.counts):
+            cumulative += count
+            lines.append(f'{metric}_bucket{{le="{bound:g}"}} {cumulative}')
+
+        lines.append(f'{metric}_bucket{{le="+Inf"}} {histogram.count}')
+        lines.append(f"{metric}_sum {histogram.total:g}")
+        lines.append(f"{metric}_count {histogram.count}")
+
+    for name, value in snapshot.gauges.items():
+        metric = METRIC_PREFIX + name
+        lines.append(f"# TYPE {metric} gauge")
+        lines.append(f"{metric} {value:g}")
+
+    return "\n".join(lines) + "\n"
+
+
+class Metrics:
+    """
+    Collects observations from the simulation and the renderer. Frontends call
+    `end_frame` once per frame and `close` on exit.
+    """
+
+    def __init__(self, sinks: Sequence[MetricsSink] = (), interval: float = 10.0):
+        self.sinks = list(sinks)
+        self.interval = interval
+        self.frames = 0
+        self.gauges: dict[str, float] = {}
+        self._window: dict[str, Histogram] = {}
+        self._totals: dict[str, Histogram] = {}
+        self._next_flush = time.monotonic() + interval
+
+    def observe(self, name: str, value: float, buckets: Sequence[float] = TIME_BUCKETS):
+        self._histogram(name, buckets).observe(value)
+
+    def observe_many(self, name: str, values: np.ndarray, buckets: Sequence[float] = COUNT_BUCKETS):
+        self._histogram(name, buckets).observe_many(values)
+
+    def set_gauge(self, name: str, value: float):
+        self.gauges[name] = value
+
+    def end_frame(self):
+        self.frames += 1
+
+        if time.monotonic() >= self._next_flush:
+            self.flush()
+
+    def flush(self):
+        resident = resident_bytes()
+
+        if resident is not None:
+            self.gauges["process_resident_bytes"] = resident
+
+        for name, histogram in self._window.items():
+            if name not in self._totals:
+                self._totals[name] = Histogram(histogram.bounds)
+
+            self._totals[name].merge(histogram)
+
+        snapshot = MetricsSnapshot(time.time(), self.frames, self._window, self._totals, dict(self.gauges))
+
+        for sink in self.sinks:
+            sink.emit(snapshot)
+
+        self._window = {}
+        self._next_flush = time.monotonic() + self.interval
+
+    def summary(self) -> str:
+        totals: dict[str, Histogram] = {}
+
+        for histograms in (self._totals, self._window):
+            for name, histogram in histograms.items():
+                totals.setdefault(name, Histogram(histogram.bounds)).merge(histogram)
+
+        lines = [f"{'metric':<28}{'count':>10}{'p50':>12}{'p95':>12}{'p99':>12}"]
+
+        for name, histogram in sorted(totals.items()):
+            scale, unit = (1000.0, "ms") if name.endswith("_seconds") else (1.0, "")
+            quantiles = [f"{histogram.quantile(q) * scale:.3g}{unit}" for q in (0.5, 0.95, 0.99)]
+            lines.append(f"{name:<28}{histogram.count:>10}" + "".join(f"{value:>12}" for value in quantiles))
+
+        for name, value in sorted(self.gauges.items()):
+            lines.append(f"{name:<28}{value:>46g}")
+
+        return "\n".join(lines)
+
+    def close(self):
+        self.flush()
+
+        for sink in self.sinks:
+            sink.close()
+
+        print(self.summary(), file=sys.stderr)
+
+    def _histogram(self, name: str, buckets: Sequence[float]) -> Histogram:
+        histogram = self._window.get(name)
+
+        if histogram is None:
+            histogram = self._window[name] = Histogram(buckets)
+
+        return histogram
+
+
+def resident_bytes() -> int | None:
+    """
+    Current resident set size of this process, or its peak where the current one is unavailable.
+    """
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+
+    if sys.platform == "win32":
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def add_metrics_arguments(parser: argparse.ArgumentParser):
+    group = parser.add_argument_group("metrics")
+    group.add_argument("--metrics-jsonl", metavar="PATH", help="Append aggregated metrics to a JSON lines file.")
+    group.add_argument(
+        "--metrics-http",
+        type=parse_address,
+        metavar="HOST:PORT",
+        help="Serve metrics in Prometheus format at /metrics.",
+    )
+    group.add_argument("--metrics-interval", type=float, default=10.0, help="Seconds per metrics aggregation window.")
+
+
+def create_metrics(args: argparse.Namespace) -> Metrics | None:
+    sinks: list[MetricsSink] = []
+
+    if args.metrics_jsonl:
+        sinks.append(JsonLinesSink(args.metrics_jsonl))
+
+    if args.metrics_http:
+        host, port = args.metrics_http
+        sink = PrometheusSink(host, port)
+        print(f"Serving metrics on http://{host}:{sink.port}/metrics.")
+        sinks.append(sink)
+
+    if not sinks:
+        return None
+
+    return Metrics(sinks, interval=args.metrics_interval)
@@ -0,0 +1,291 @@
+from __future__ import annotations
+
+import json
+import math
+import os
+from dataclasses import dataclass, field
+from typing import Union
+
+import numpy as np
+
+from boids.fields import GridField, grid_nodes
+
+
+@dataclass(frozen=True)
+class Circle:
+    center: tuple[float, float]
+    radius: float
+
+    def signed_distance(self, points: np.ndarray) -> np.ndarray:
+        offsets = points - np.asarray(self.center, dtype=np.float32)
+        return np.hypot(offsets[..., 0], offsets[..., 1]) - self.radius
+
+    def triangles(self, segments: int = 32) -> np.ndarray:
+        angles = np.linspace(0, 2 * math.pi, segments + 1, dtype=np.float32)
+        rim = np.stack([np.cos(angles), np.sin(angles)], axis=-1) * self.radius + self.center
+        center = np.broadcast_to(np.asarray(self.center, dtype=np.float32), (segments, 2))
+        return np.stack([center, rim[:-1], rim[1:]], axis=1).astype(np.float32)
+
+
+@dataclass(frozen=True)
+class Polygon:
+    vertices: tuple[tuple[float, float], ...]
+
+    def signed_distance(self, points: np.ndarray) -> np.ndarray:
+        vertices = np.asarray(self.vertices, dtype=np.float32)
+        starts = vertices
+        ends = np.roll(vertices, -1, axis=0)
+        edges = ends - starts
+
+        offsets = points[..., np.newaxis, :] - starts
+        t = np.clip((offsets * edges).sum(axis=-1) / (edges * edges).sum(axis=-1), 0.0, 1.0)
+        closest = offsets - t[..., np.newaxis] * edges
+        distances = np.sqrt((closest * closest).sum(axis=-1)).min(axis=-1)
+
+        px = points[..., np.newaxis, 0]
+        py = points[..., np.newaxis, 1]
+        straddles = (starts[:, 1] > py) != (ends[:, 1] > py)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            crossing_x = starts[:, 0] + (py - starts[:, 1]) * edges[:, 0] / edges[:, 1]
+
+        inside = (straddles & (px < crossing_x)).sum(axis=-1) % 2 == 1
+
+        return np.where(inside, -distances, distances)
+
+    def triangles(self) -> np.ndarray:
+        return _triangulate(list(self.vertices))
+
+
+@dataclass(frozen=True, eq=False)
+class Mask:
+    """
+    Boolean occupancy image stretched over the whole world rectangle,
+    where True marks an obstacle.
+    """
+
+    pixels: np.ndarray
+
+    @classmethod
+    def from_image(cls, path: str, threshold: float = 0.5) -> Mask:
+        import pygame
+
+        surface = pygame.image.load(path)
+        rgb = pygame.surfarray.array3d(surface).swapaxes(0, 1)
+        return cls(pixels=rgb.mean(axis=-1) < threshold * 255)
+
+    def contains(self, points: np.ndarray, world_size: tuple[float, float]) -> np.ndarray:
+        rows, columns = self.pixels.shape
+        x = np.clip((points[..., 0] / world_size[0] * columns).astype(np.intp), 0, columns - 1)
+        y = np.clip((points[..., 1] / world_size[1] * rows).astype(np.intp), 0, rows - 1)
+        return self.pixels[y, x]
+
+
+Obstacle = Union[Circle, Polygon, Mask]
+
+
+@dataclass(eq=False)
+class ObstacleField:
+    """
+    Signed distance field of a set of static obstacles, negative inside them,
+    together with its gradient. Both are rasterized once, so avoidance queries
+    cost a bilinear lookup per boid however many obstacles there are.
+    """
+
+    obstacles: list[Obstacle]
+    world_size: tuple[float, float]
+    resolution: float
+    grid: GridField = field(init=False, repr=False)
+    triangles: np.ndarray = field(init=False, repr=False)
+
+    def __post_init__(self):
+        nodes = grid_nodes(self.world_size, self.resolution)
+        distances = np.full(nodes.shape[:2], np.inf, dtype=np.float32)
+        mask_distances = self._rasterize_masks(nodes)
+
+        for obstacle in self.obstacles:
+            if not isinstance(obstacle, Mask):
+                np.minimum(distances, obstacle.signed_distance(nodes), out=distances)
+
+        if mask_distances is not None:
+            np.minimum(distances, mask_distances, out=distances)
+
+        distances = np.minimum(distances, np.hypot(*self.world_size))
+        gradient_y, gradient_x = np.gradient(distances, self.resolution)
+        values = np.stack([distances, gradient_x, gradient_y], axis=-1)
+
+        self.grid = GridField(values, spacing=self.resolution)
+        self.triangles = self._triangulate(nodes)
+
+    def sample(self, points: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns signed distances and distance gradients at an (n, 2) array of points.
+        """
+        samples = self.grid.sample(points)
+        return samples[:, 0], samples[:, 1:]
+
+    def steering(self, points: np.ndarray, distance: float, strength: float) -> np.ndarray:
+        """
+        Computes an avoidance velocity for every point, pointing down the distance
+        field's gradient and growing linearly from zero at `distance` away from
+        an obstacle to `strength` at its surface (and further inside it).
+        """
+        distances, gradients = self.sample(points)
+        lengths = np.hypot(gradients[:, 0], gradients[:, 1])
+        weights = np.clip(1.0 - distances / distance, 0.0, None) * strength
+        weights = np.divide(weights, lengths, out=np.zeros_like(weights), where=lengths > 0)
+
+        return gradients * weights[:, np.newaxis]
+
+    def _rasterize_masks(self, nodes: np.ndarray) -> np.ndarray | None:
+        masks = [obstacle for obstacle in self.obstacles if isinstance(obstacle, Mask)]
+
+        if not masks:
+            return None
+
+        inside = np.zeros(nodes.shape[:2], dtype=bool)
+
+        for mask in masks:
+            inside |= mask.contains(nodes, self.world_size)
+
+        if not inside.any():
+            return np.full(inside.shape, np.inf, dtype=np.float32)
+
+        to_inside = _distance_to_nearest(inside)
+        to_outside = _distance_to_nearest(~inside) if not inside.all() else np.full(inside.shape, np.inf)
+
+        return (np.where(inside, -to_outside, to_inside) * self.resolution).astype(np.float32)
+
+    def _triangulate(self, nodes: np.ndarray) -> np.ndarray:
+        triangles = [obstacle.triangles() for obstacle in self.obstacles if not isinstance(obstacle, Mask)]
+
+        if any(isinstance(obstacle, Mask) for obstacle in self.obstacles):
+            inside = np.zeros(nodes.shape[:2], dtype=bool)
+
+            for obstacle in self.obstacles:
+                if isinstance(obstacle, Mask):
+                    inside |= obstacle.contains(nodes + self.resolution / 2, self.world_size)
+
+            corners = nodes[inside]
+            quad = np.array([[0, 0], [1, 0], [1, 1], [0, 0], [1, 1], [0, 1]], dtype=np.float32) * self.resolution
+            triangles.append((corners[:, np.newaxis] + quad).reshape(-1, 3, 2))
+
+        if not triangles:
+            return np.empty((0, 3, 2), dtype=np.float32)
+
+        return np.concatenate(triangles).astype(np.float32)
+
+
+def _distance_to_nearest(seeds: np.ndarray) -> np.ndarray:
+    """
+    Approximate Euclidean distance transform by jump flooding: distance, in cells,
+    from every cell to the nearest True cell of `seeds`.
+    """
+    rows, columns = seeds.shape
+    coordinates = np.stack(np.indices(seeds.shape), axis=-1)
+    nearest = np.where(seeds[..., np.newaxis], coordinates, -1)
+    step = 1 << max(0, math.ceil(math.log2(max(rows, columns))) - 1)
+
+    def squared_distances(candidates: np.ndarray) -> np.ndarray:
+        offsets = candidates - coordinates
+        distances = (offsets * offsets).sum(axis=-1).astype(np.float64)
+        distances[candidates[..., 0] < 0] = np.inf
+        return distances
+
+    while step >= 1:
+        best = squared_distances(nearest)
+
+        for dy in (-step, 0, step):
+            for dx in (-step, 0, step):
+                if dy == dx == 0 or abs(dy) >= rows or abs(dx) >= columns:
+                    continue
+
+                shifted = np.full_like(nearest, -1)
+                shifted[max(dy, 0) : rows + min(dy, 0), max(dx, 0) : columns + min(dx, 0)] = nearest[
+                    max(-dy, 0) : rows + min(-dy, 0), max(-dx, 0) : columns + min(-dx, 0)
+                ]
+                distances = squared_distances(shifted)
+                better = distances < best
+                nearest[better] = shifted[better]
+                best[better] = distances[better]
+
+        step //= 2
+
+    return np.sqrt(squared_distances(nearest))
+
+
+def _triangulate(vertices: list[tuple[float, float]]) -> np.ndarray:
+    """
+    Ear-clipping triangulation of a simple polygon.
+    """
+    points = [tuple(vertex) for vertex in vertices]
+    signed_area = sum(x0 * y1 - x1 * y0 for (x0, y0), (x1, y1) in zip(points, points[1:] + points[:1]))
+
+    if signed_area < 0:
+        points.reverse()
+
+    def cross(o, a, b) -> float:
+        return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+    def contains(a, b, c, p) -> bool:
+        return cross(a, b, p) >= 0 and cross(b, c, p) >= 0 and cross(c, a, p) >= 0
+
+    triangles = []
+
+    while len(points) > 3:
+        for i in range(len(points)):
+            a, b, c = points[i - 1], points[i], points[(i + 1) % len(points)]
+
+            if cross(a, b, c) <= 0:
+                continue
+
+            if any(contains(a, b, c, p) for p in points if p not in (a, b, c)):
+                continue
+
+            triangles.append((a, b, c))
+            del points[i]
+            break
+        else:
+            break
+
+    if len(points) == 3:
+        triangles.append(tuple(points))
+
+    return np.array(triangles, dtype=np.float32).reshape(-1, 3, 2)
+
+
+DEFAULT_OBSTACLES: list[Obstacle] = [
+    Circle(center=(560.0, 380.0), radius=90.0),
+    Circle(center=(1380.0, 700.0), radius=120.0),
+    Polygon(vertices=((860.0, 820.0), (1060.0, 820.0), (960.0, 640.0))),
+]
+
+
+def load_obstacles(path: str = "obstacles.json") -> list[Obstacle]:
+    """
+    Reads obstacles from a JSON file of the form
+    {"circles": [{"center": [x, y], "radius": r}], "polygons": [[[x, y], ...]],
+    "masks": [{"path": ..., "threshold": t}]}.
+    Falls back to `DEFAULT_OBSTACLES` when the file does not exist or is invalid.
+    """
+    if not os.path.exists(path):
+        return list(DEFAULT_OBSTACLES)
+
+    try:
+        with open(path) as file:
+            data = json.load(file)
+
+        obstacles: list[Obstacle] = [
+            Circle(center=(circle["center"][0], circle["center"][1]), radius=circle["radius"])
+            for circle in data.get("circles", [])
+        ]
+        obstacles.extend(
+            Polygon(vertices=tuple((vertex[0], vertex[1]) for vertex in polygon))
+            for polygon in data.get("polygons", [])
+        )
+        obstacles.extend(Mask.from_image(mask["path"], mask.get("threshold", 0.5)) for mask in data.get("masks", []))
+    except (OSError, RuntimeError, ValueError, KeyError, TypeError):
+        print("Could not load obstacles from a file - file is invalid.")
+        return list(DEFAULT_OBSTACLES)
+
+    return obstacles
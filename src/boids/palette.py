@@ -0,0 +1,80 @@
+from functools import cache
+
+import numpy as np
+
+from boids.constants import BOID_COLOR, COLOR_MODES, PALETTE_SIZE
+
+
+def hsl_to_rgb(hue: float, saturation: float, lightness: float) -> tuple[float, float, float, float]:
+    """
+    Converts a color from HSL (Hue, Saturation, Lightness) color space to RGBA (Red, Green, Blue, Alpha).
+
+    Args:
+        hue (float): The hue component of the color, in the range [0.0, 1.0].
+        saturation (float): The saturation component of the color, in the range [0.0, 1.0].
+        lightness (float): The lightness component of the color, in the range [0.0, 1.0].
+
+    Returns:
+        (tuple[float, float, float, float]): A tuple representing the RGBA components, each in the range [0.0, 1.0].
+    """
+
+    def hue_to_rgb(p, q, t):
+        if t < 0:
+            t += 1
+
+        if t > 1:
+            t -= 1
+
+        if t < 1 / 6:
+            return p + (q - p) * 6 * t
+
+        if t < 1 / 2:
+            return q
+
+        if t < 2 / 3:
+            return p + (q - p) * (2 / 3 - t) * 6
+
+        return p
+
+    if saturation == 0:
+        r = g = b = lightness
+    else:
+        q = lightness * (1 + saturation) if lightness < 0.5 else lightness + saturation - lightness * saturation
+        p = 2 * lightness - q
+        r = hue_to_rgb(p, q, hue + 1 / 3)
+        g = hue_to_rgb(p, q, hue)
+        b = hue_to_rgb(p, q, hue - 1 / 3)
+
+    return (r, g, b, 1.0)
+
+
+@cache
+def get_palette(mode: str) -> np.ndarray:
+    """
+    Returns a lookup table of `PALETTE_SIZE` RGBA colors for the given color mode.
+
+    Heading uses a cyclic hue wheel, scalar modes use a blue-to-red ramp and
+    "none" maps every index to the default boid color. The table is built once
+    per mode; colorization then only has to compute an index per boid.
+    """
+
+    if mode not in COLOR_MODES:
+        raise ValueError(f"Unknown color mode '{mode}'.")
+
+    if mode == "none":
+        return np.tile(np.array(BOID_COLOR, dtype=np.float32), (PALETTE_SIZE, 1))
+
+    steps = np.arange(PALETTE_SIZE) / PALETTE_SIZE
+    hues = steps if mode == "heading" else (1 - steps) * 2 / 3
+
+    return np.array([hsl_to_rgb(hue, 0.8, 0.5) for hue in hues], dtype=np.float32)
+
+
+def to_palette_indices(values: np.ndarray, out: np.ndarray):
+    """
+    Quantizes values in the range [0.0, 1.0] into palette indices, written to `out`.
+    """
+
+    np.multiply(values, PALETTE_SIZE - 1, out=values)
+    np.clip(values, 0, PALETTE_SIZE - 1, out=values)
+    out[:] = values
@@ -0,0 +1,518 @@
+"""
+Adaptive quadtree (an octree in 3D, a tree of 2^d children per node in general).
+
+Leaves hold up to `capacity` items and split into equal children when they
+overflow, so densely packed regions get small leaves and empty space stays
+coarse. A subtree whose items have dropped to half the capacity collapses back
+into a single leaf. The root grows outward by doubling whenever an item lands
+outside of it.
+
+Like `SpatialGrid`, `insert` returns a handle, and items are removed or moved
+through it: an item that is still inside its leaf after moving costs only a
+bounds check, and `displaced` finds the items that left their leaves in one
+vectorized pass. `items` and `handles` keep the same order as in `SpatialGrid`,
+which the simulation relies on to match them to the flock by index.
+"""
+
+from __future__ import annotations
+
+import heapq
+import math
+from dataclasses import dataclass, field
+from typing import Generic, Iterator, Sequence, TypeVar
+
+import numpy as np
+
+from boids.spatialgrid import PointLike
+
+T = TypeVar("T", bound=PointLike)
+
+DEFAULT_CAPACITY = 16
+
+# Leaves are not split below this size, so coincident items cannot split forever.
+DEFAULT_MIN_SIZE = 1.0
+
+# Side of the initial root. A power of two keeps every node boundary exact.
+DEFAULT_ROOT_SIZE = 64.0
+
+
+@dataclass(eq=False)
+class QuadNode(Generic[T]):
+    lower: tuple[float, ...]
+    size: float
+    parent: QuadNode[T] | None = field(default=None)
+    children: list[QuadNode[T]] | None = field(default=None)
+    items: list[T] = field(default_factory=list)
+    handles: list[QuadHandle[T]] = field(default_factory=list)
+    count: int = field(default=0)
+
+    def contains(self, point: Sequence[float]) -> bool:
+        return all(low <= value < low + self.size for low, value in zip(self.lower, point))
+
+    def child_index(self, point: Sequence[float]) -> int:
+        half = self.size / 2
+        return sum(1 << axis for axis, (low, value) in enumerate(zip(self.lower, point)) if value >= low + half)
+
+    def gap_squared(self, point: Sequence[float]) -> float:
+        """
+        Squared distance from `point` to the nearest point of the node.
+        """
+        total = 0.0
+
+        for low, value in zip(self.lower, point):
+            gap = max(low - value, value - low - self.size, 0.0)
+            total += gap * gap
+
+        return total
+
+
+@dataclass(eq=False, slots=True)
+class QuadHandle(Generic[T]):
+    """
+    Where an item is stored in a `QuadTree`: its leaf and its slots in the leaf's list
+    and in the list of all items.
+    """
+
+    item: T
+    leaf: QuadNode[T]
+    slot: int
+    position: int
+
+
+class QuadTree(Generic[T]):
+    def __init__(
+        self,
+        dimensions: int,
+        capacity: int = DEFAULT_CAPACITY,
+        min_size: float = DEFAULT_MIN_SIZE,
+        root_size: float = DEFAULT_ROOT_SIZE,
+    ):
+        self.dimensions = dimensions
+        self.capacity = capacity
+        self.min_size = min_size
+        self.root = QuadNode[T](lower=(0.0,) * dimensions, size=root_size)
+        self.items: list[T] = []
+        self.handles: list[QuadHandle[T]] = []
+        self._bounds = np.zeros((0, 2, dimensions))
+
+    def insert(self, item: T) -> QuadHandle[T]:
+        point = self._point(item)
+        self._enclose(point)
+        handle = QuadHandle(item=item, leaf=self.root, slot=0, position=len(self.items))
+        self.items.append(item)
+        self.handles.append(handle)
+
+        if len(self._bounds) < len(self.handles):
+            grown = np.zeros((max(2 * len(self._bounds), 1), 2, self.dimensions))
+            grown[: len(self._bounds)] = self._bounds
+            self._bounds = grown
+
+        self.root.count += 1
+        self._file(handle, point, self.root)
+        return handle
+
+    def remove(self, item: T):
+        """
+        Removes `item`, looking it up in the leaf of its current coordinates. Items that
+        moved since they were inserted have to be removed through their handle instead.
+        """
+        leaf = self._leaf(self._point(item))
+
+        if leaf is None:
+            return
+
+        for handle in leaf.handles:
+            if handle.item == item:
+                self.discard(handle)
+                return
+
+    def discard(self, handle: QuadHandle[T]):
+        leaf = handle.leaf
+        self._detach(handle)
+        node: QuadNode[T] | None = leaf
+
+        while node is not None:
+            node.count -= 1
+            node = node.parent
+
+        self._collapse(leaf.parent)
+        last = self.handles.pop()
+        self.items.pop()
+
+        if last is not handle:
+            last.position = handle.position
+            self.handles[handle.position] = last
+            self.items[handle.position] = last.item
+            self._bounds[handle.position] = self._bounds[len(self.handles)]
+
+    def move(self, handle: QuadHandle[T]):
+        """
+        Refiles the item of `handle` after its coordinates changed. Only the part of the
+        tree between its old leaf and the smallest node containing both positions is touched.
+        """
+        point = self._point(handle.item)
+        leaf = handle.leaf
+
+        if leaf.contains(point):
+            return
+
+        self._detach(handle)
+        node: QuadNode[T] | None = leaf
+
+        while node is not None and not node.contains(point):
+            node.count -= 1
+            node = node.parent
+
+        if node is None:
+            self._enclose(point)
+            node = self.root
+            node.count += 1
+
+        self._file(handle, point, node)
+        self._collapse(leaf.parent)
+
+    def displaced(self, positions: np.ndarray) -> np.ndarray:
+        """
+        Indices of the items that lie outside their leaf, given the items' current
+        coordinates as an array aligned with `handles`.
+        """
+        bounds = self._bounds[: len(self.handles)]
+        outside = (positions < bounds[:, 0]) | (positions >= bounds[:, 1])
+        return np.flatnonzero(outside.any(axis=1))
+
+    def search(self, item: T) -> T | None:
+        leaf = self._leaf(self._point(item))
+
+        if leaf is not None:
+            for i in leaf.items:
+                if i == item:
+                    return i
+
+        return None
+
+    def search_radius(self, query: T, radius: float, distances: list[float] | None = None) -> list[T]:
+        """
+        Returns all items within `radius` of `query`. When `distances` is given,
+        the squared distance of every returned item is appended to it in the same order.
+        """
+        match self.dimensions:
+            case 2:
+                return self._search_radius_2d(query, radius, distances)
+            case _:
+                return self._search_radius_nd(query, radius, distances)
+
+    def _search_radius_nd(self, query: T, radius: float, distances: list[float] | None) -> list[T]:
+        point = self._point(query)
+        radius_squared = radius * radius
+        results: list[T] = []
+        stack = [self.root]
+
+        while stack:
+            node = stack.pop()
+
+            if not node.count or node.gap_squared(point) > radius_squared:
+                continue
+
+            if node.children is not None:
+                stack.extend(node.children)
+                continue
+
+            for item in node.items:
+                distance_squared = self._distance_squared(item, point)
+
+                if distance_squared <= radius_squared:
+                    results.append(item)
+
+                    if distances is not None:
+                        distances.append(distance_squared)
+
+        return results
+
+    def _search_radius_2d(self, query: T, radius: float, distances: list[float] | None) -> list[T]:
+        x, y = query[0], query[1]
+        radius_squared = radius * radius
+        results: list[T] = []
+        stack = [self.root]
+
+        while stack:
+            node = stack.pop()
+            left, top = node.lower
+            size = node.size
+            gap_x = left - x if x < left else max(x - left - size, 0.0)
+            gap_y = top - y if y < top else max(y - top - size, 0.0)
+
+            if not node.count or gap_x * gap_x + gap_y * gap_y > radius_squared:
+                continue
+
+            if node.children is not None:
+                stack.extend(node.children)
+                continue
+
+            for item in node.items:
+                dx = item[0] - x
+                dy = item[1] - y
+                distance_squared = dx * dx + dy * dy
+
+                if distance_squared <= radius_squared:
+                    results.append(item)
+
+                    if distances is not None:
+                        distances.append(distance_squared)
+
+        return results
+
+    def nearest(self, query: T, k: int, distances: list[float] | None = None) -> list[T]:
+        """
+        Returns the `k` items closest to `query`, nearest first, including `query` itself
+        if it is in the tree. Nodes are visited in order of their distance to `query`,
+        and the search stops once no unvisited node can hold a closer item.
+        """
+        point = self._point(query)
+        best: list[tuple[float, int, T]] = []
+        queue: list[tuple[float, int, QuadNode[T]]] = [(0.0, 0, self.root)]
+        tiebreak = 1
+
+        while queue and k > 0:
+            gap, _, node = heapq.heappop(queue)
+
+            if len(best) == k and gap > -best[0][0]:
+                break
+
+            if node.children is not None:
+                for child in node.children:
+                    if child.count:
+                        heapq.heappush(queue, (child.gap_squared(point), tiebreak, child))
+                        tiebreak += 1
+
+                continue
+
+            for item in node.items:
+                distance_squared = self._distance_squared(item, point)
+
+                if len(best) < k:
+                    heapq.heappush(best, (-distance_squared, tiebreak, item))
+                elif distance_squared < -best[0][0]:
+                    heapq.heapreplace(best, (-distance_squared, tiebreak, item))
+
+                tiebreak += 1
+
+        ordered = sorted(best, key=lambda entry: (-entry[0], entry[1]))
+
+        if distances is not None:
+            distances.extend(-distance for distance, _, _ in ordered)
+
+        return [item for _, _, item in ordered]
+
+    def search_pairs(self, radius: float) -> Iterator[tuple[T, T, float]]:
+        """
+        Yields every unordered pair of items at most `radius` apart once, with its squared
+        distance. Each leaf is paired with itself and with the leaves after it in depth-first
+        order whose bounds come within `radius` of its own.
+        """
+        radius_squared = radius * radius
+        leaves = [leaf for leaf in self.leaves() if leaf.items]
+        order = {id(leaf): number for number, leaf in enumerate(leaves)}
+
+        for number, leaf in enumerate(leaves):
+            items = leaf.items
+            points = [self._point(item) for item in items]
+
+            for position, (item, point) in enumerate(zip(items, points)):
+                for other in items[position + 1 :]:
+                    distance_squared = self._distance_squared(other, point)
+
+                    if distance_squared <= radius_squared:
+                        yield item, other, distance_squared
+
+            for other_leaf in self._leaves_near(leaf, radius_squared):
+                if order[id(other_leaf)] <= number:
+                    continue
+
+                for item, point in zip(items, points):
+                    for other in other_leaf.items:
+                        distance_squared = self._distance_squared(other, point)
+
+                        if distance_squared <= radius_squared:
+                            yield item, other, distance_squared
+
+    def leaves(self) -> Iterator[QuadNode[T]]:
+        """
+        Yields the leaves in depth-first order.
+        """
+        stack = [self.root]
+
+        while stack:
+            node = stack.pop()
+
+            if node.children is None:
+                yield node
+            else:
+                stack.extend(reversed(node.children))
+
+    def depth(self) -> int:
+        depth = 0
+        stack = [(self.root, 0)]
+
+        while stack:
+            node, level = stack.pop()
+            depth = max(depth, level)
+
+            if node.children is not None:
+                stack.extend((child, level + 1) for child in node.children)
+
+        return depth
+
+    def _leaves_near(self, leaf: QuadNode[T], radius_squared: float) -> Iterator[QuadNode[T]]:
+        stack = [self.root]
+
+        while stack:
+            node = stack.pop()
+
+            if not node.count or node is leaf or _box_gap_squared(node, leaf) > radius_squared:
+                continue
+
+            if node.children is None:
+                yield node
+            else:
+                stack.extend(node.children)
+
+    def _enclose(self, point: tuple[float, ...]):
+        """
+        Doubles the root outward until it contains `point`.
+        """
+        if not all(math.isfinite(value) for value in point):
+            raise ValueError(f"Cannot index an item at {point}.")
+
+        while not self.root.contains(point):
+            old = self.root
+            lower = tuple(low - old.size if value < low else low for low, value in zip(old.lower, point))
+            root = QuadNode[T](lower=lower, size=old.size * 2, count=old.count)
+            root.children = self._children(root)
+            root.children[root.child_index(old.lower)] = old
+            old.parent = root
+            self.root = root
+
+    def _children(self, node: QuadNode[T]) -> list[QuadNode[T]]:
+        half = node.size / 2
+        return [
+            QuadNode[T](
+                lower=tuple(low + half * ((index >> axis) & 1) for axis, low in enumerate(node.lower)),
+                size=half,
+                parent=node,
+            )
+            for index in range(1 << self.dimensions)
+        ]
+
+    def _file(self, handle: QuadHandle[T], point: tuple[float, ...], node: QuadNode[T]):
+        """
+        Stores the item of `handle` in the leaf under `node` that contains `point`. The
+        counts of `node` and its ancestors must already include the item.
+        """
+        while node.children is not None:
+            node = node.children[node.child_index(point)]
+            node.count += 1
+
+        self._attach(handle, node)
+        self._split(node)
+
+    def _split(self, leaf: QuadNode[T]):
+        pending = [leaf]
+
+        while pending:
+            node = pending.pop()
+
+            if len(node.items) <= self.capacity or node.size / 2 < self.min_size:
+                continue
+
+            handles = node.handles
+            node.items, node.handles = [], []
+            node.children = self._children(node)
+
+            for handle in handles:
+                child = node.children[node.child_index(self._point(handle.item))]
+                child.count += 1
+                self._attach(handle, child)
+
+            pending.extend(node.children)
+
+    def _collapse(self, node: QuadNode[T] | None):
+        """
+        Merges the largest subtree above `node`, inclusive, that holds at most half the
+        capacity, into a single leaf.
+        """
+        target = None
+
+        while node is not None and node.count <= self.capacity // 2:
+            target = node
+            node = node.parent
+
+        if target is None or target.children is None:
+            return
+
+        handles: list[QuadHandle[T]] = []
+        stack = list(target.children)
+
+        while stack:
+            child = stack.pop()
+            handles.extend(child.handles)
+
+            if child.children is not None:
+                stack.extend(child.children)
+
+        target.children = None
+
+        for handle in handles:
+            self._attach(handle, target)
+
+    def _attach(self, handle: QuadHandle[T], leaf: QuadNode[T]):
+        handle.leaf = leaf
+        handle.slot = len(leaf.items)
+        leaf.items.append(handle.item)
+        leaf.handles.append(handle)
+        bounds = self._bounds[handle.position]
+        bounds[0] = leaf.lower
+        bounds[1] = leaf.lower
+        bounds[1] += leaf.size
+
+    def _detach(self, handle: QuadHandle[T]):
+        leaf = handle.leaf
+        last = leaf.handles.pop()
+        leaf.items.pop()
+
+        if last is not handle:
+            last.slot = handle.slot
+            leaf.handles[handle.slot] = last
+            leaf.items[handle.slot] = last.item
+
+    def _leaf(self, point: tuple[float, ...]) -> QuadNode[T] | None:
+        node = self.root
+
+        if not node.contains(point):
+            return None
+
+        while node.children is not None:
+            node = node.children[node.child_index(point)]
+
+        return node
+
+    def _point(self, item: T) -> tuple[float, ...]:
+        return tuple(float(item[dimension]) for dimension in range(self.dimensions))
+
+    def _distance_squared(self, item: T, point: tuple[float, ...]) -> float:
+        return sum((item[dimension] - point[dimension]) ** 2 for dimension in range(self.dimensions))
+
+    def __iter__(self) -> Iterator[T]:
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def _box_gap_squared(first: QuadNode, second: QuadNode) -> float:
+    total = 0.0
+
+    for low, other_low in zip(first.lower, second.lower):
+        gap = max(other_low - low - first.size, low - other_low - second.size, 0.0)
+        total += gap * gap
+
+    return total
@@ -0,0 +1,56 @@
+"""
+Offscreen rendering of simulated frames for video export.
+
+Frames are drawn into a framebuffer object of any size through a hidden window's
+OpenGL context, read back through pixel buffer objects and handed to a
+`FrameExporter`. Without a display, run with `SDL_VIDEODRIVER=offscreen` (and
+`LIBGL_ALWAYS_SOFTWARE=1` for Mesa's software renderer).
+"""
+
+import pygame
+from OpenGL import GL
+
+from boids import graphics
+from boids.capture import FrameExporter
+from boids.constants import SCREEN_COLOR, SCREEN_SIZE
+from boids.entities import State
+from boids.settings.settings import Settings
+
+
+class OffscreenRecorder:
+    def __init__(self, size: tuple[int, int], settings: Settings, exporter: FrameExporter):
+        self.settings = settings
+        self.exporter = exporter
+        pygame.display.init()
+        pygame.display.set_mode((1, 1), pygame.OPENGL | pygame.HIDDEN)
+        GL.glEnable(GL.GL_BLEND)
+        GL.glBlendFunc(GL.GL_SRC_ALPHA, GL.GL_ONE_MINUS_SRC_ALPHA)
+        self.framebuffer = graphics.OffscreenFramebuffer(size)
+        self.batch_renderer = graphics.BatchRenderer()
+        self.obstacle_mesh = graphics.StaticMesh()
+
+    def publish_state(self, state: State, number: int):
+        """
+        Renders the current frame and submits the frames whose pixels have arrived.
+        """
+        self.framebuffer.bind()
+        graphics.clear_screen(SCREEN_COLOR)
+        graphics.set_orthographic_projection(SCREEN_SIZE)
+        graphics.draw_scene(state, self.settings, self.batch_renderer, self.obstacle_mesh)
+
+        for frame_number, pixels in self.framebuffer.read(number):
+            self.exporter.submit(frame_number, pixels)
+
+    def close(self):
+        """
+        Submits the frames still being read back, waits for the exporter and releases the context.
+        """
+        try:
+            for frame_number, pixels in self.framebuffer.drain():
+                self.exporter.submit(frame_number, pixels)
+        finally:
+            self.framebuffer.cleanup()
+            self.batch_renderer.cleanup()
+            self.obstacle_mesh.cleanup()
+            pygame.display.quit()
+            self.exporter.close()
@@ -0,0 +1,227 @@
+"""
+Publishes flock state to other processes through shared memory.
+
+The writer copies every completed frame into the next of N slots of a
+`multiprocessing.shared_memory` block. Readers in any process attach to the
+block by name and map the slots as NumPy arrays, without copying.
+
+Each slot starts with a sequence number that is odd while the slot is being
+written and even once it is complete. A reader takes the newest slot, notes its
+sequence and checks it again after using the data: if it changed, the writer
+reused the slot in the meantime and the data may be torn. The writer never waits
+for readers, so a reader that holds on to a slot for more than N - 1 frames has
+to copy it.
+
+Layout, all little-endian: a header of four uint64 values (magic, slots,
+capacity, frames written), then per slot a header of four int64 values
+(sequence, frame number, boid count, padding) followed by positions and
+velocities as float32 arrays of `capacity` rows.
+"""
+
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from boids.constants import BOID_DIMENSIONS
+from boids.entities import State
+
+MAGIC = 0x424F494452494E47
+HEADER_FIELDS = 4
+SLOT_HEADER_FIELDS = 4
+DEFAULT_SLOTS = 4
+
+# With fewer slots, the writer would always be overwriting the frame readers are on.
+MIN_SLOTS = 2
+
+# Attempts at a consistent copy before `read` gives up on the current frame.
+READ_ATTEMPTS = 8
+
+# Blocks created by writers in this process, which the resource tracker has to keep tracking.
+_created: set[str] = set()
+
+
+def slot_bytes(capacity: int) -> int:
+    return SLOT_HEADER_FIELDS * 8 + 2 * capacity * BOID_DIMENSIONS * 4
+
+
+def block_bytes(slots: int, capacity: int) -> int:
+    return HEADER_FIELDS * 8 + slots * slot_bytes(capacity)
+
+
+class _Slots:
+    """
+    NumPy views of the header and slots of a mapped block.
+    """
+
+    def __init__(self, buffer: memoryview, slots: int, capacity: int):
+        self.header = np.ndarray(HEADER_FIELDS, dtype="<u8", buffer=buffer)
+        self.slot_headers: list[np.ndarray] = []
+        self.positions: list[np.ndarray] = []
+        self.velocities: list[np.ndarray] = []
+        rows = (capacity, BOID_DIMENSIONS)
+        array_bytes = capacity * BOID_DIMENSIONS * 4
+
+        for slot in range(slots):
+            offset = HEADER_FIELDS * 8 + slot * slot_bytes(capacity)
+            data = offset + SLOT_HEADER_FIELDS * 8
+            self.slot_headers.append(np.ndarray(SLOT_HEADER_FIELDS, dtype="<i8", buffer=buffer, offset=offset))
+            self.positions.append(np.ndarray(rows, dtype="<f4", buffer=buffer, offset=data))
+            self.velocities.append(np.ndarray(rows, dtype="<f4", buffer=buffer, offset=data + array_bytes))
+
+
+class RingWriter:
+    """
+    Owns the shared memory block. Without a `name`, the system picks one, available as `name`.
+    """
+
+    def __init__(self, capacity: int, slots: int = DEFAULT_SLOTS, name: str | None = None):
+        if slots < MIN_SLOTS:
+            raise ValueError(f"A ring buffer needs at least {MIN_SLOTS} slots")
+
+        self.capacity = capacity
+        self.slots = slots
+        self.memory = shared_memory.SharedMemory(name=name, create=True, size=block_bytes(slots, capacity))
+        self._views = _Slots(self.memory.buf, slots, capacity)
+        self._views.header[:] = (MAGIC, slots, capacity, 0)
+        _created.add(self.memory.name)
+
+    @property
+    def name(self) -> str:
+        return self.memory.name
+
+    @property
+    def frames_written(self) -> int:
+        return int(self._views.header[3])
+
+    def publish_state(self, state: State, _number: int):
+        self.write(state.frame, state.flock.positions, state.flock.velocities)
+
+    def write(self, frame: int, positions: np.ndarray, velocities: np.ndarray):
+        count = len(positions)
+
+        if count > self.capacity:
+            raise ValueError(f"Cannot publish {count} boids, the ring buffer holds {self.capacity}")
+
+        written = self.frames_written
+        slot = written % self.slots
+        slot_header = self._views.slot_headers[slot]
+        slot_header[0] += 1
+        self._views.positions[slot][:count] = positions
+        self._views.velocities[slot][:count] = velocities
+        slot_header[1] = frame
+        slot_header[2] = count
+        slot_header[0] += 1
+        self._views.header[3] = written + 1
+
+    def close(self):
+        """
+        Unmaps and removes the block. Readers that are still attached keep their mapping.
+        """
+        self._views = None
+        self.memory.close()
+        self.memory.unlink()
+        _created.discard(self.memory.name)
+
+
+@dataclass(frozen=True)
+class SharedFrame:
+    """
+    Views of one slot of the ring buffer. They stay valid only as long as `RingReader.is_current`
+    says so; `copy` detaches them.
+    """
+
+    slot: int
+    sequence: int
+    frame: int
+    positions: np.ndarray
+    velocities: np.ndarray
+
+    def copy(self) -> SharedFrame:
+        return SharedFrame(self.slot, self.sequence, self.frame, self.positions.copy(), self.velocities.copy())
+
+
+class RingReader:
+    def __init__(self, name: str):
+        self.memory = _attach(name)
+        header = np.ndarray(HEADER_FIELDS, dtype="<u8", buffer=self.memory.buf)
+
+        if header[0] != MAGIC:
+            header = None
+            self.memory.close()
+            raise ValueError(f"Shared memory block '{name}' is not a boids ring buffer")
+
+        self.slots = int(header[1])
+        self.capacity = int(header[2])
+        self._views = _Slots(self.memory.buf, self.slots, self.capacity)
+
+    def latest(self) -> SharedFrame | None:
+        """
+        The newest complete frame as views into shared memory, or None if nothing has been
+        written yet or the writer is on the newest slot right now.
+        """
+        written = int(self._views.header[3])
+
+        if not written:
+            return None
+
+        slot = (written - 1) % self.slots
+        sequence, frame, count, _ = self._views.slot_headers[slot].tolist()
+
+        if sequence % 2:
+            return None
+
+        return SharedFrame(
+            slot=slot,
+            sequence=sequence,
+            frame=frame,
+            positions=self._views.positions[slot][:count],
+            velocities=self._views.velocities[slot][:count],
+        )
+
+    def is_current(self, frame: SharedFrame) -> bool:
+        """
+        Whether the slot of `frame` still holds that frame, so data read from its views so far is consistent.
+        """
+        return int(self._views.slot_headers[frame.slot][0]) == frame.sequence
+
+    def read(self) -> SharedFrame | None:
+        """
+        A consistent copy of the newest complete frame, or None if none could be taken.
+        """
+        for _ in range(READ_ATTEMPTS):
+            frame = self.latest()
+
+            if frame is None:
+                continue
+
+            copied = frame.copy()
+
+            if self.is_current(frame):
+                return copied
+
+        return None
+
+    def close(self):
+        """
+        Unmaps the block. Views handed out by `latest` must have been released first.
+        """
+        self._views = None
+        self.memory.close()
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13, attaching registers the block with this process's resource
+        # tracker, which would remove it when the reader exits.
+        memory = shared_memory.SharedMemory(name=name)
+
+        if os.name == "posix" and memory.name not in _created:
+            resource_tracker.unregister(name if name.startswith("/") else f"/{name}", "shared_memory")
+
+        return memory
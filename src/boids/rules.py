@@ -1,11 +1,37 @@
 from dataclasses import dataclass
 from typing import cast
 
-from pygame.math import Vector2
+import numpy as np
 
 from boids.constants import SCREEN_HEIGHT, SCREEN_WIDTH
 from boids.entities import Boid, State
 from boids.settings.settings import Settings
+from boids.vector import Vector2
+
+
+@dataclass(frozen=True)
+class NeighborSums:
+    """
+    Sums over the neighbors of every boid, the boid itself included, for the cohesion,
+    separation and alignment rules. Built once per frame from the neighbor pairs.
+    """
+
+    counts: np.ndarray
+    densities: np.ndarray
+    position_sums: np.ndarray
+    velocity_sums: np.ndarray
+    separations: np.ndarray
+
+    def mean_position(self, index: int) -> Vector2:
+        count = self.counts.item(index)
+        return Vector2(self.position_sums.item(index, 0) / count, self.position_sums.item(index, 1) / count)
+
+    def mean_velocity(self, index: int) -> Vector2:
+        count = self.counts.item(index)
+        return Vector2(self.velocity_sums.item(index, 0) / count, self.velocity_sums.item(index, 1) / count)
+
+    def separation(self, index: int) -> Vector2:
+        return Vector2(self.separations.item(index, 0), self.separations.item(index, 1))
 
 
 @dataclass(frozen=True)
@@ -14,6 +40,7 @@ class RuleContext:
     neighbors: list[Boid]
     state: State
     settings: Settings
+    sums: NeighborSums | None = None
 
 
 def cohesion(context: RuleContext):
@@ -26,6 +53,9 @@ def cohesion(context: RuleContext):
     center = Vector2(0, 0)
     cohesion_strength = cast(int, context.settings.get("boids", "cohesion"))
 
+    if context.sums is not None:
+        return (context.sums.mean_position(context.boid.index) - context.boid.position) * (cohesion_strength / 100)
+
     if not context.neighbors:
         return center
 
@@ -47,6 +77,9 @@ def separation(context: RuleContext):
     radius = cast(int, context.settings.get("boids", "separation_distance"))
     strength = cast(int, context.settings.get("boids", "separation_strength"))
 
+    if context.sums is not None:
+        return context.sums.separation(context.boid.index) * strength
+
     for other in context.neighbors:
         offset = context.boid.position - other.position
         distance = offset.length()
@@ -63,12 +96,14 @@ def alignment(context: RuleContext):
     and add a fraction of it to the boid's current velocity.
     """
     center = Vector2(0, 0)
+    alignment_strength = cast(int, context.settings.get("boids", "alignment"))
+
+    if context.sums is not None:
+        return (context.sums.mean_velocity(context.boid.index) - context.boid.velocity) * (alignment_strength / 100)
 
     if not context.neighbors:
         return center
 
-    alignment_strength = cast(int, context.settings.get("boids", "alignment"))
-
     for boid in context.neighbors:
         center += boid.velocity
 
@@ -78,22 +113,33 @@ def alignment(context: RuleContext):
 
 
 def apply_wind(context: RuleContext):
+    """
+    Global wind plus the environment flow field, sampled for the whole flock
+    once per frame, at the boid's position.
+    """
     wind_direction_raw = cast(tuple, context.settings.get("environment", "wind_direction"))
     wind_direction = Vector2(wind_direction_raw[0], wind_direction_raw[1])
     wind_strength = cast(float, context.settings.get("environment", "wind_strength"))
+    flow = context.state.flow_velocities
+    wind = Vector2(0, 0)
 
     if wind_direction.length() > 0:
-        return wind_direction.normalize() * wind_strength
+        wind = wind_direction.normalize() * wind_strength
 
-    return wind_direction
+    if context.boid.index < len(flow):
+        wind += Vector2(flow.item(context.boid.index, 0), flow.item(context.boid.index, 1))
+
+    return wind
 
 
 def limit_position(context: RuleContext):
+    """
+    Turn back from the margins of the boundary when it is enabled. Without a boundary,
+    the caller wraps positions around the screen edges after moving the flock.
+    """
     velocity = Vector2(0, 0)
 
     if not context.settings.get("boundary", "enabled"):
-        context.boid.position.x %= SCREEN_WIDTH
-        context.boid.position.y %= SCREEN_HEIGHT
         return velocity
 
     top_left = cast(tuple, context.settings.get("boundary", "top_left"))
@@ -117,6 +163,19 @@ def limit_position(context: RuleContext):
     return velocity
 
 
+def avoid_obstacles(context: RuleContext):
+    """
+    Steer away from obstacles using the avoidance velocity computed
+    for the whole flock from the obstacle distance field this frame.
+    """
+    steering = context.state.obstacle_steering
+
+    if context.boid.index >= len(steering):
+        return Vector2(0, 0)
+
+    return Vector2(steering.item(context.boid.index, 0), steering.item(context.boid.index, 1))
+
+
 def chase_goal(context: RuleContext):
     if not context.state.goal_alive:
         return Vector2(0, 0)
@@ -125,12 +184,56 @@ def chase_goal(context: RuleContext):
     return (context.state.goal_position - context.boid.position) * (goal_strength / 100)
 
 
+def accumulate_neighbor_sums(
+    positions: np.ndarray,
+    velocities: np.ndarray,
+    pairs: np.ndarray,
+    distances: np.ndarray,
+    radius: float,
+    separation_distance: float,
+) -> NeighborSums:
+    """
+    Builds the neighbor sums from an (m, 2) array of unordered neighbor pairs and their
+    squared distances. Each pair is evaluated once and adds to both of its boids, with
+    equal and opposite separation offsets.
+    """
+    count = len(positions)
+    first, second = pairs[:, 0], pairs[:, 1]
+
+    def scatter(to_first: np.ndarray | None = None, to_second: np.ndarray | None = None) -> np.ndarray:
+        return np.bincount(first, to_first, minlength=count) + np.bincount(second, to_second, minlength=count)
+
+    density = 1.0 - distances / (radius * radius)
+    position_sums = positions.astype(np.float64)
+    velocity_sums = velocities.astype(np.float64)
+    separations = np.zeros((count, 2), dtype=np.float64)
+    offsets = positions[first] - positions[second]
+    distance = np.sqrt(distances)
+    weights = np.zeros(len(pairs), dtype=np.float64)
+    close = (distance > 0) & (distance < separation_distance)
+    weights[close] = (separation_distance - distance[close]) / (separation_distance * distance[close])
+
+    for axis in range(2):
+        position_sums[:, axis] += scatter(positions[second, axis], positions[first, axis])
+        velocity_sums[:, axis] += scatter(velocities[second, axis], velocities[first, axis])
+        separations[:, axis] = scatter(offsets[:, axis] * weights, -offsets[:, axis] * weights)
+
+    return NeighborSums(
+        counts=scatter().astype(np.int64) + 1,
+        densities=scatter(density, density),
+        position_sums=position_sums,
+        velocity_sums=velocity_sums,
+        separations=separations,
+    )
+
+
 rules = [
     cohesion,
     separation,
     alignment,
     apply_wind,
     chase_goal,
+    avoid_obstacles,
     limit_position,
 ]
 
@@ -142,3 +245,70 @@ def evaluate_rules(context: RuleContext) -> Vector2:
         velocity += rule(context)
 
     return velocity
+
+
+def evaluate_environment(state: State, settings: Settings) -> np.ndarray:
+    """
+    Batched counterpart of the rules that do not depend on neighbors (wind, flow field,
+    goal, obstacles and boundary turning), evaluated for the whole flock at once.
+    Wrapping around the screen edges is left to the caller.
+    """
+    positions = state.flock.positions
+    velocities = evaluate_wind_and_boundary(positions, settings)
+
+    if len(state.flow_velocities) == len(positions):
+        velocities += state.flow_velocities
+
+    if state.goal_alive:
+        goal_strength = cast(int, settings.get("goal", "strength"))
+        velocities += (np.array(state.goal_position, dtype=np.float32) - positions) * (goal_strength / 100)
+
+    if len(state.obstacle_steering) == len(positions):
+        velocities += state.obstacle_steering
+
+    return velocities
+
+
+def evaluate_wind_and_boundary(positions: np.ndarray, settings: Settings) -> np.ndarray:
+    """
+    The part of `evaluate_environment` that depends only on positions and settings:
+    global wind and turning back from the boundary margins.
+    """
+    velocities = np.zeros(positions.shape, dtype=np.float32)
+    wind_direction = np.asarray(settings.get("environment", "wind_direction"), dtype=np.float32)
+    wind_length = float(np.hypot(*wind_direction))
+
+    if wind_length > 0:
+        velocities += wind_direction / wind_length * cast(float, settings.get("environment", "wind_strength"))
+
+    if settings.get("boundary", "enabled"):
+        top_left = cast(tuple, settings.get("boundary", "top_left"))
+        bottom_right = cast(tuple, settings.get("boundary", "bottom_right"))
+        turn_factor = cast(float, settings.get("boids", "turn_factor"))
+
+        for axis in range(2):
+            velocities[positions[:, axis] < top_left[axis], axis] += turn_factor
+            velocities[positions[:, axis] > bottom_right[axis], axis] -= turn_factor
+
+    return velocities
+
+
+def evaluate_flocking(
+    sums: NeighborSums,
+    positions: np.ndarray,
+    velocities: np.ndarray,
+    settings: Settings,
+) -> np.ndarray:
+    """
+    Batched counterpart of the cohesion, separation and alignment rules over neighbor sums.
+    """
+    counts = sums.counts[:, np.newaxis]
+    cohesion = cast(int, settings.get("boids", "cohesion")) / 100
+    alignment = cast(int, settings.get("boids", "alignment")) / 100
+    separation_strength = cast(int, settings.get("boids", "separation_strength"))
+
+    return (
+        (sums.position_sums / counts - positions) * cohesion
+        + sums.separations * separation_strength
+        + (sums.velocity_sums / counts - velocities) * alignment
+    )
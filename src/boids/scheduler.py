@@ -0,0 +1,87 @@
+"""
+Frame-budgeted scheduling of boid updates.
+
+When the flock is too large to update within the frame budget, only a batch of
+boids gets the full rule evaluation each frame and the rest keep flying along
+their current velocity. Batches are consecutive runs of a sweep order that sorts
+the boids by grid cell, so each batch covers a compact region whose neighbors
+were searched together, and the sweep rotates through the whole flock before a
+new order is taken. The batch size follows the measured cost per boid update.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+
+# Boids updated on the first scheduled frame, before any cost has been measured.
+INITIAL_BATCH = 256
+
+# Weight of the latest frame in the smoothed cost per boid update.
+COST_SMOOTHING = 0.2
+
+
+def sweep_order(positions: np.ndarray, cell_size: float) -> np.ndarray:
+    """
+    Boid indices ordered row by row of grid cells, and by column within a row.
+    """
+    cells = np.floor(positions / cell_size).astype(np.int64)
+    return np.lexsort((cells[:, 0], cells[:, 1]))
+
+
+class UpdateScheduler:
+    def __init__(self):
+        self.cost = 0.0
+        self.frame = 0
+        self.cursor = 0
+        self.order = np.zeros(0, dtype=np.intp)
+        self.last_updates = np.zeros(0, dtype=np.int64)
+        self.intervals = np.zeros(0, dtype=np.int64)
+
+    def batch(self, positions: np.ndarray, cell_size: float, budget: float) -> np.ndarray:
+        """
+        Indices of the boids to update this frame, as many as `budget` seconds allow at the
+        measured cost, continuing the current sweep or starting a new one.
+        """
+        count = len(positions)
+
+        if len(self.intervals) != count:
+            self.order = self.order[:0]
+            self.last_updates = np.full(count, self.frame - 1, dtype=np.int64)
+            self.intervals = np.ones(count, dtype=np.int64)
+
+        if self.cursor >= len(self.order):
+            self.order = sweep_order(positions, cell_size)
+            self.cursor = 0
+
+        size = INITIAL_BATCH if self.cost <= 0 else int(budget / self.cost)
+        batch = self.order[self.cursor : self.cursor + max(size, 1)]
+        self.cursor += len(batch)
+        self.intervals[batch] = self.frame - self.last_updates[batch]
+        self.last_updates[batch] = self.frame
+        self.frame += 1
+        return batch
+
+    def record(self, seconds: float, updated: int):
+        """
+        Folds the time it took to update `updated` boids into the cost estimate.
+        """
+        if not updated:
+            return
+
+        cost = seconds / updated
+        self.cost = cost if self.cost <= 0 else self.cost + COST_SMOOTHING * (cost - self.cost)
+
+    @property
+    def update_intervals(self) -> np.ndarray:
+        """
+        Frames between each boid's latest two updates, or since its latest update when that
+        has been longer.
+        """
+        return np.maximum(self.intervals, self.frame - self.last_updates)
+
+    @property
+    def update_rates(self) -> np.ndarray:
+        """
+        Updates per frame each boid gets, from its update interval.
+        """
+        return 1.0 / self.update_intervals
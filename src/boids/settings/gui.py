@@ -0,0 +1,106 @@
+import sys
+from typing import Literal
+
+import imgui
+
+from boids.constants import TOP_MENU_HEIGHT
+from boids.settings.schema import schema
+from boids.settings.settings import Settings, SettingsWriter
+
+
+def get_slider(value_type: Literal["int", "float"]):
+    match value_type:
+        case "int":
+            return imgui.slider_int
+        case "float":
+            return imgui.slider_float
+        case _:
+            raise ValueError("Unknown type.")
+
+
+def render_settings(settings: Settings, writer: SettingsWriter) -> Settings:
+    if imgui.begin_main_menu_bar():
+        if imgui.begin_menu("File", True):
+            clicked_quit, _ = imgui.menu_item("Quit", "Cmd+Q", False, True)
+
+            if clicked_quit:
+                sys.exit(0)
+
+            imgui.end_menu()
+
+        imgui.end_main_menu_bar()
+
+    imgui.set_next_window_position(10, 12 + TOP_MENU_HEIGHT)
+    imgui.set_next_window_size(0, 0)
+    imgui.begin("Settings", flags=imgui.WINDOW_ALWAYS_AUTO_RESIZE)
+    tree_node_flags = imgui.TREE_NODE_DEFAULT_OPEN | imgui.TREE_NODE_FRAME_PADDING
+    is_dirty = False
+
+    for section, section_data in schema.items():
+        if section.startswith("_"):
+            continue
+
+        if imgui.tree_node(section_data["title"], flags=tree_node_flags):
+            imgui.separator()
+
+            for field, value in section_data["fields"].items():
+                is_enabled = settings.is_setting_enabled(section, field)
+
+                if not is_enabled:
+                    continue
+
+                field_data = settings.get_field(section, field)
+
+                match value["type"]:
+                    case "Vector2":
+                        axes = []
+
+                        for axis in ["x", "y"]:
+                            dirty, axis_value = imgui.slider_float(
+                                value[axis]["title"],
+                                field_data[axis]["value"],
+                                field_data[axis]["min"],
+                                field_data[axis]["max"],
+                            )
+
+                            axes.append(axis_value)
+                            is_dirty |= dirty
+
+                        settings.set(section, field, (axes[0], axes[1]))
+                    case "int" | "float":
+                        dirty, setting_value = get_slider(value["type"])(
+                            value["title"],
+                            field_data["value"],
+                            field_data["min"],
+                            field_data["max"],
+                        )
+
+                        is_dirty |= dirty
+                        settings.set(section, field, setting_value)
+                    case "bool":
+                        dirty, setting_value = imgui.checkbox(value["title"], field_data["value"])
+                        is_dirty |= dirty
+                        settings.set(section, field, setting_value)
+                    case "choice":
+                        options = value["options"]
+                        dirty, selected = imgui.combo(value["title"], options.index(field_data["value"]), options)
+                        is_dirty |= dirty
+                        settings.set(section, field, options[selected])
+                    case _:
+                        raise ValueError("Unknown setting type.")
+
+            imgui.tree_pop()
+            imgui.spacing()
+
+    clicked_reset = imgui.button("Reset Settings")
+
+    if clicked_reset:
+        settings = Settings()
+        is_dirty = True
+
+    if is_dirty:
+        writer.request(settings)
+
+    imgui.end()
+
+    return settings
@@ -1,8 +1,8 @@
-from boids.constants import SCREEN_HEIGHT, SCREEN_WIDTH
+from boids.constants import COLOR_MODES, FLOW_FIELD_KINDS, SCREEN_HEIGHT, SCREEN_WIDTH, SPATIAL_INDEXES
 
 schema = {
     "_meta": {
-        "version": "1.2.5",
+        "version": "1.13.0",
     },
     "boundary": {
         "title": "Boundary",
@@ -130,11 +130,12 @@ schema = {
                 "default": 75.0,
                 "value": 75.0,
             },
-            "colorize_velocity": {
-                "title": "Colorize velocity",
-                "type": "bool",
-                "default": False,
-                "value": False,
+            "color_by": {
+                "title": "Color by",
+                "type": "choice",
+                "options": COLOR_MODES,
+                "default": "none",
+                "value": "none",
             },
         },
     },
@@ -168,6 +169,75 @@ schema = {
                 "default": 0.0,
                 "value": 0.0,
             },
+            "flow_field": {
+                "title": "Flow field",
+                "type": "choice",
+                "options": FLOW_FIELD_KINDS,
+                "default": "none",
+                "value": "none",
+            },
+            "flow_strength": {
+                "title": "Flow strength",
+                "type": "float",
+                "min": 0.0,
+                "max": 100.0,
+                "default": 5.0,
+                "value": 5.0,
+            },
+            "flow_speed": {
+                "title": "Flow change speed",
+                "type": "float",
+                "min": 0.0,
+                "max": 5.0,
+                "default": 0.5,
+                "value": 0.5,
+            },
+            "flow_resolution": {
+                "title": "Flow field cell size",
+                "type": "int",
+                "min": 4,
+                "max": 128,
+                "default": 32,
+                "value": 32,
+            },
+        },
+    },
+    "obstacles": {
+        "title": "Obstacles",
+        "fields": {
+            "enabled": {
+                "title": "Is enabled",
+                "type": "bool",
+                "default": False,
+                "value": False,
+            },
+            "avoidance_distance": {
+                "title": "Avoidance distance",
+                "type": "float",
+                "min": 1.0,
+                "max": 200.0,
+                "default": 40.0,
+                "value": 40.0,
+                "condition": "obstacles.fields.enabled.value",
+            },
+            "avoidance_strength": {
+                "title": "Avoidance strength",
+                "type": "float",
+                "min": 0.0,
+                "max": 100.0,
+                "default": 20.0,
+                "value": 20.0,
+                "condition": "obstacles.fields.enabled.value",
+            },
+            "field_resolution": {
+                "title": "Distance field cell size",
+                "type": "int",
+                "min": 2,
+                "max": 32,
+                "default": 8,
+                "value": 8,
+                "condition": "obstacles.fields.enabled.value",
+            },
         },
     },
     "goal": {
@@ -202,6 +272,13 @@ schema = {
     "performance": {
         "title": "Performance",
         "fields": {
+            "spatial_index": {
+                "title": "Spatial index",
+                "type": "choice",
+                "options": SPATIAL_INDEXES,
+                "default": "grid",
+                "value": "grid",
+            },
             "spatial_grid_cell_size": {
                 "title": "Spatial grid cell size",
                 "type": "int",
@@ -210,6 +287,76 @@ schema = {
                 "default": 50,
                 "value": 50,
             },
+            "quadtree_capacity": {
+                "title": "Quadtree leaf capacity",
+                "type": "int",
+                "min": 4,
+                "max": 256,
+                "default": 16,
+                "value": 16,
+            },
+            "verlet_skin": {
+                "title": "Verlet list skin (0 - off)",
+                "type": "int",
+                "min": 0,
+                "max": 50,
+                "default": 0,
+                "value": 0,
+            },
+            "pairwise_rules": {
+                "title": "Evaluate each neighbor pair once",
+                "type": "bool",
+                "default": False,
+                "value": False,
+            },
+            "double_buffered": {
+                "title": "Update from the previous frame only",
+                "type": "bool",
+                "default": False,
+                "value": False,
+            },
+            "far_field": {
+                "title": "Aggregate distant neighbors",
+                "type": "bool",
+                "default": False,
+                "value": False,
+            },
+            "far_field_threshold": {
+                "title": "Far field accuracy threshold",
+                "type": "float",
+                "min": 0.0,
+                "max": 1.0,
+                "default": 0.0,
+                "value": 0.0,
+                "condition": "performance.fields.far_field.value",
+            },
+            "frame_budget_ms": {
+                "title": "Frame budget, ms (0 - off)",
+                "type": "float",
+                "min": 0.0,
+                "max": 100.0,
+                "default": 0.0,
+                "value": 0.0,
+            },
+            "compiled_kernels": {
+                "title": "Use compiled kernels (Numba)",
+                "type": "bool",
+                "default": False,
+                "value": False,
+            },
+        },
+    },
+    "analytics": {
+        "title": "Analytics",
+        "fields": {
+            "interval": {
+                "title": "Every N frames (0 - off)",
+                "type": "int",
+                "min": 0,
+                "max": 600,
+                "default": 0,
+                "value": 0,
+            },
         },
     },
 }
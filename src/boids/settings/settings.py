@@ -1,13 +1,11 @@
 import json
 import os
-import sys
+import tempfile
+import threading
+import time
 from copy import deepcopy
 from json import JSONDecodeError
-from typing import Literal
 
-import imgui
-
-from boids.constants import TOP_MENU_HEIGHT
 from boids.settings.schema import schema
 
 
@@ -15,7 +13,7 @@ class Settings:
     def __init__(self):
         self._settings: dict = deepcopy(schema)
 
-    def get(self, section: str, field: str) -> int | float | bool | tuple[float, float]:
+    def get(self, section: str, field: str) -> int | float | bool | str | tuple[float, float]:
         field_data: dict | None = self._settings.get(section, {}).get("fields", {}).get(field, None)
 
         if field_data is None:
@@ -40,7 +38,7 @@ class Settings:
 
         return field_data
 
-    def set(self, section: str, field: str, value: float | int | bool | tuple[float, float]):
+    def set(self, section: str, field: str, value: float | int | bool | str | tuple[float, float]):
         if isinstance(value, (tuple, list)):
             self._settings[section]["fields"][field]["x"]["value"] = value[0]
             self._settings[section]["fields"][field]["y"]["value"] = value[1]
@@ -92,16 +90,6 @@ class Settings:
             for field, field_data in section_data.items():
                 self.set(section, field, field_data)
 
-    @staticmethod
-    def get_slider(value_type: Literal["int", "float"]):
-        match value_type:
-            case "int":
-                return imgui.slider_int
-            case "float":
-                return imgui.slider_float
-            case _:
-                raise ValueError("Unknown type.")
-
 
 def load_settings() -> Settings:
     if os.path.exists("settings.json"):
@@ -124,89 +112,80 @@ def load_settings() -> Settings:
     return Settings()
 
 
-def save_settings(settings: Settings):
-    with open("settings.json", "w") as file:
-        json.dump(settings.dump_dict(), file, indent=4)
-
-
-def render_settings(settings: Settings) -> Settings:
-    if imgui.begin_main_menu_bar():
-        if imgui.begin_menu("File", True):
-            clicked_quit, _ = imgui.menu_item("Quit", "Cmd+Q", False, True)
-
-            if clicked_quit:
-                sys.exit(0)
-
-            imgui.end_menu()
-
-        imgui.end_main_menu_bar()
-
-    imgui.set_next_window_position(10, 12 + TOP_MENU_HEIGHT)
-    imgui.set_next_window_size(0, 0)
-    imgui.begin("Settings", flags=imgui.WINDOW_ALWAYS_AUTO_RESIZE)
-    tree_node_flags = imgui.TREE_NODE_DEFAULT_OPEN | imgui.TREE_NODE_FRAME_PADDING
-    is_dirty = False
-
-    for section, section_data in schema.items():
-        if section.startswith("_"):
-            continue
-
-        if imgui.tree_node(section_data["title"], flags=tree_node_flags):
-            imgui.separator()
-
-            for field, value in section_data["fields"].items():
-                is_enabled = settings.is_setting_enabled(section, field)
-
-                if not is_enabled:
-                    continue
-
-                field_data = settings.get_field(section, field)
-
-                match value["type"]:
-                    case "Vector2":
-                        axes = []
-
-                        for axis in ["x", "y"]:
-                            dirty, axis_value = imgui.slider_float(
-                                value[axis]["title"],
-                                field_data[axis]["value"],
-                                field_data[axis]["min"],
-                                field_data[axis]["max"],
-                            )
-
-                            axes.append(axis_value)
-                            is_dirty |= dirty
-
-                        settings.set(section, field, (axes[0], axes[1]))
-                    case "int" | "float":
-                        dirty, setting_value = Settings.get_slider(value["type"])(
-                            value["title"],
-                            field_data["value"],
-                            field_data["min"],
-                            field_data["max"],
-                        )
-
-                        is_dirty |= dirty
-                        settings.set(section, field, setting_value)
-                    case "bool":
-                        dirty, setting_value = imgui.checkbox(value["title"], field_data["value"])
-                        is_dirty |= dirty
-                        settings.set(section, field, setting_value)
-                    case _:
-                        raise ValueError("Unknown setting type.")
-
-            imgui.tree_pop()
-            imgui.spacing()
-
-    clicked_reset = imgui.button("Reset Settings")
-
-    if clicked_reset:
-        settings = Settings()
-        is_dirty = True
-
-    if is_dirty:
-        save_settings(settings)
-
-    imgui.end()
-
-    return settings
+def save_settings(settings: Settings, path: str = "settings.json"):
+    _write_settings(settings.dump_dict(), path)
+
+
+def _write_settings(data: dict, path: str):
+    """
+    Writes settings to a temporary file next to `path` and renames it over `path`,
+    so readers never see a partially written file.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    descriptor, temporary_path = tempfile.mkstemp(prefix=".settings-", suffix=".tmp", dir=directory)
+
+    try:
+        with os.fdopen(descriptor, "w") as file:
+            json.dump(data, file, indent=4)
+            file.flush()
+            os.fsync(file.fileno())
+
+        os.replace(temporary_path, path)
+    except BaseException:
+        os.unlink(temporary_path)
+        raise
+
+
+class SettingsWriter:
+    """
+    Saves settings on a background thread. Saves are debounced: a snapshot is
+    written once no newer one has been requested for `delay` seconds, so dragging
+    a slider results in a single write after it settles. Call `close` on exit to
+    flush anything still pending.
+    """
+
+    def __init__(self, path: str = "settings.json", delay: float = 0.5):
+        self.path = path
+        self.delay = delay
+        self._pending: dict | None = None
+        self._deadline = 0.0
+        self._closed = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="boids-settings-writer", daemon=True)
+        self._thread.start()
+
+    def request(self, settings: Settings):
+        with self._condition:
+            self._pending = settings.dump_dict()
+            self._deadline = time.monotonic() + self.delay
+            self._condition.notify()
+
+    def flush(self):
+        with self._condition:
+            data, self._pending = self._pending, None
+
+        if data is not None:
+            _write_settings(data, self.path)
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+
+        self._thread.join()
+        self.flush()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._closed and (self._pending is None or time.monotonic() < self._deadline):
+                    timeout = None if self._pending is None else self._deadline - time.monotonic()
+                    self._condition.wait(timeout)
+
+                if self._closed:
+                    return
+
+                data, self._pending = self._pending, None
+
+            if data is not None:
+                _write_settings(data, self.path)
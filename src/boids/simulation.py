@@ -0,0 +1,755 @@
+import functools
+import math
+import time
+from typing import Callable, Iterable, cast
+
+import numpy as np
+
+from boids.analytics import NeighborGraph, analyze
+from boids.constants import (
+    BOID_DIMENSIONS,
+    BOID_MAX_INIT_SPEED,
+    BOID_MIN_INIT_SPEED,
+    PERTURBATION_MAX,
+    PERTURBATION_MIN,
+    SCREEN_HEIGHT,
+    SCREEN_WIDTH,
+)
+from boids.entities import Boid, Flock, State
+from boids.farfield import AggregatePyramid
+from boids.flowfield import create_flow_field
+from boids.kernels import HAS_NUMBA, NeighborBuffer, build_cell_layout, flocking_forces
+from boids.metrics import COUNT_BUCKETS, DISTANCE_BUCKETS
+from boids.obstacles import ObstacleField, load_obstacles
+from boids.palette import get_palette, to_palette_indices
+from boids.quadtree import QuadTree
+from boids.rules import NeighborSums, RuleContext, accumulate_neighbor_sums, evaluate_environment, evaluate_rules
+from boids.scheduler import UpdateScheduler
+from boids.settings.settings import Settings
+from boids.spatialgrid import SpatialGrid
+from boids.vector import Vector2
+from boids.verlet import VerletList
+
+# Neighbor slots per boid beyond the previous frame's largest neighbor count.
+NEIGHBOR_SLOT_SLACK = 8
+
+NeighborSearch = Callable[[Boid, list[float] | None], list[Boid]]
+SpatialIndex = SpatialGrid[Boid] | QuadTree[Boid]
+
+
+def create_boids(count: int, rng: np.random.Generator) -> Flock:
+    flock = Flock(capacity=count)
+    spawn_boids(flock, count, rng)
+    return flock
+
+
+def spawn_boids(flock: Flock, count: int, rng: np.random.Generator) -> range:
+    """
+    Adds `count` boids at random positions on the screen, flying in random directions.
+    Returns the range of their indices.
+    """
+    angles = rng.uniform(0, 2 * np.pi, count)
+    speeds = rng.uniform(BOID_MIN_INIT_SPEED, BOID_MAX_INIT_SPEED, count)
+    xs = rng.integers(0, SCREEN_WIDTH, count, endpoint=True)
+    ys = rng.integers(0, SCREEN_HEIGHT, count, endpoint=True)
+    positions = np.column_stack([xs, ys])
+    velocities = np.column_stack([speeds * np.cos(angles), speeds * np.sin(angles)])
+    return flock.add_many(positions, velocities)
+
+
+def random_position(rng: np.random.Generator) -> Vector2:
+    x, y = rng.integers(0, (SCREEN_WIDTH, SCREEN_HEIGHT), endpoint=True).tolist()
+    return Vector2(x, y)
+
+
+def create_index(flock: Flock, settings: Settings) -> SpatialIndex:
+    index: SpatialIndex
+
+    if settings.get("performance", "spatial_index") == "quadtree":
+        capacity = cast(int, settings.get("performance", "quadtree_capacity"))
+        index = QuadTree[Boid](BOID_DIMENSIONS, capacity=capacity)
+    else:
+        cell_size = cast(float, settings.get("performance", "spatial_grid_cell_size"))
+        index = SpatialGrid[Boid](BOID_DIMENSIONS, cell_size=cell_size)
+
+    for boid in flock:
+        index.insert(boid)
+
+    return index
+
+
+def index_matches(state: State, settings: Settings) -> bool:
+    """
+    Whether the spatial index holds the current flock and is of the configured kind.
+    """
+    index = state.boids
+    flock = state.flock
+
+    if len(index) != len(flock) or (len(index) and index.items[0].flock is not flock):
+        return False
+
+    if isinstance(index, QuadTree):
+        return settings.get("performance", "spatial_index") == "quadtree" and index.capacity == settings.get(
+            "performance", "quadtree_capacity"
+        )
+
+    return (
+        settings.get("performance", "spatial_index") == "grid"
+        and index.cell_size == settings.get("performance", "spatial_grid_cell_size")
+        and len(state.index_cells) == len(flock)
+    )
+
+
+def grid_cells(positions: np.ndarray, cell_size: float) -> np.ndarray:
+    return np.floor(positions.astype(np.float64) / cell_size).astype(np.int64)
+
+
+def rebuild_index(state: State, settings: Settings):
+    """
+    Brings the spatial index up to date with the flock. Only the boids that crossed into
+    another grid cell or quadtree leaf since the last frame are refiled, through their
+    handles. The index is built anew when the flock or the index settings changed.
+    """
+    start = time.perf_counter()
+    flock = state.flock
+    index = state.boids
+
+    if not index_matches(state, settings):
+        index = state.boids = create_index(flock, settings)
+        state.index_cells = (
+            grid_cells(flock.positions, index.cell_size)
+            if isinstance(index, SpatialGrid)
+            else np.zeros((0, BOID_DIMENSIONS), dtype=np.int64)
+        )
+    elif isinstance(index, QuadTree):
+        handles = index.handles
+
+        for boid_index in index.displaced(flock.positions).tolist():
+            index.move(handles[boid_index])
+    else:
+        cells = grid_cells(flock.positions, index.cell_size)
+        moved = np.flatnonzero((cells != state.index_cells).any(axis=1))
+        handles = index.handles
+
+        for boid_index, cell in zip(moved.tolist(), cells[moved].tolist()):
+            index.move(handles[boid_index], tuple(cell))
+
+        state.index_cells = cells
+
+    if state.metrics is not None:
+        state.metrics.observe("index_rebuild_seconds", time.perf_counter() - start)
+
+
+def update_goal(state: State, settings: Settings):
+    if settings.get("goal", "enabled"):
+        goal_duration = cast(int, settings.get("goal", "duration_sec"))
+        now = int(state.elapsed * 1000)
+
+        if not state.goal_alive:
+            state.goal_position = random_position(state.rng)
+            state.goal_next_rotation = now + goal_duration * 1000
+            state.goal_alive = True
+
+        if now - state.goal_next_rotation >= 0:
+            state.goal_position = random_position(state.rng)
+            state.goal_next_rotation = now + goal_duration * 1000
+    elif state.goal_alive:
+        state.goal_alive = False
+
+
+def update_obstacles(state: State, settings: Settings):
+    if not settings.get("obstacles", "enabled"):
+        state.obstacle_field = None
+        state.obstacle_steering = state.obstacle_steering[:0]
+        return
+
+    resolution = cast(int, settings.get("obstacles", "field_resolution"))
+    field = state.obstacle_field
+
+    if field is None or field.obstacles is not state.obstacles or field.resolution != resolution:
+        field = ObstacleField(state.obstacles, (SCREEN_WIDTH, SCREEN_HEIGHT), resolution)
+        state.obstacle_field = field
+
+    distance = cast(float, settings.get("obstacles", "avoidance_distance"))
+    strength = cast(float, settings.get("obstacles", "avoidance_strength"))
+    state.obstacle_steering = field.steering(state.flock.positions, distance, strength)
+
+
+def update_flow_field(state: State, settings: Settings):
+    kind = cast(str, settings.get("environment", "flow_field"))
+    resolution = cast(int, settings.get("environment", "flow_resolution"))
+    flow_field = state.flow_field
+
+    if kind != state.flow_field_kind or (
+        flow_field is not None and flow_field.source is not None and flow_field.spacing != resolution
+    ):
+        flow_field = create_flow_field(kind, (SCREEN_WIDTH, SCREEN_HEIGHT), resolution)
+        state.flow_field = flow_field
+        state.flow_field_kind = kind
+
+    if flow_field is None:
+        state.flow_velocities = state.flow_velocities[:0]
+        return
+
+    flow_speed = cast(float, settings.get("environment", "flow_speed"))
+    flow_strength = cast(float, settings.get("environment", "flow_strength"))
+
+    if flow_speed > 0:
+        flow_field.advance(state.elapsed * flow_speed)
+
+    state.flow_velocities = flow_field.sample(state.flock.positions)
+    state.flow_velocities *= flow_strength
+
+
+def limit_velocity(velocity: Vector2, settings: Settings) -> Vector2:
+    max_speed = cast(float, settings.get("boids", "max_speed"))
+
+    if velocity.length() > max_speed:
+        return velocity.normalize() * max_speed
+
+    return velocity
+
+
+def wrap_positions(positions: np.ndarray, settings: Settings):
+    """
+    Wraps positions around the screen edges in place, unless the boundary is enabled.
+    """
+    if not settings.get("boundary", "enabled"):
+        positions %= np.array([SCREEN_WIDTH, SCREEN_HEIGHT], dtype=np.float32)
+
+
+def colorize(flock: Flock, settings: Settings):
+    """
+    Assigns a palette index to every boid in one batched pass over the flock arrays.
+    Neighbor counts and densities are the ones recorded by the latest `update_boids`.
+    """
+    mode = cast(str, settings.get("boids", "color_by"))
+    flock.palette = get_palette(mode)
+
+    if mode == "none" or not flock.count:
+        return
+
+    velocities = flock.velocities
+
+    match mode:
+        case "heading":
+            values = np.arctan2(velocities[:, 1], velocities[:, 0])
+            values /= 2 * math.pi
+            values %= 1.0
+        case "speed":
+            max_speed = cast(float, settings.get("boids", "max_speed"))
+            values = np.hypot(velocities[:, 0], velocities[:, 1])
+            values /= max_speed
+        case "neighbors":
+            values = flock.neighbor_counts.astype(np.float32)
+            values /= max(values.max(), 1.0)
+        case "density":
+            values = flock.densities.copy()
+            values /= max(values.max(), 1.0)
+        case _:
+            raise ValueError(f"Unknown color mode '{mode}'.")
+
+    to_palette_indices(values, flock.color_indices)
+
+
+def add_perturbation(boid: Boid, perturbations: np.ndarray) -> Vector2:
+    return Vector2(perturbations.item(boid.index, 0), perturbations.item(boid.index, 1))
+
+
+def record_neighbors(
+    boid: Boid,
+    neighbors: list[Boid],
+    distances: list[float],
+    pairs: list[tuple[int, int]],
+    nearest_distances: np.ndarray,
+):
+    nearest_squared = math.inf
+
+    for neighbor, distance_squared in zip(neighbors, distances):
+        if neighbor.index != boid.index:
+            pairs.append((min(boid.index, neighbor.index), max(boid.index, neighbor.index)))
+            nearest_squared = min(nearest_squared, distance_squared)
+
+    nearest_distances[boid.index] = math.sqrt(nearest_squared)
+
+
+def neighbor_search(state: State, settings: Settings, radius: float) -> NeighborSearch:
+    """
+    Returns the neighbor query for this frame: the spatial index, or with a Verlet skin set,
+    the Verlet lists filtered by the start-of-frame positions.
+    """
+    skin = cast(int, settings.get("performance", "verlet_skin"))
+
+    if skin <= 0:
+        state.verlet = None
+        return lambda boid, distances: state.boids.search_radius(boid, radius, distances)
+
+    if state.verlet is None or state.verlet.skin != skin:
+        state.verlet = VerletList(skin)
+
+    lists = state.verlet.neighbors(state.flock.positions, radius)
+    views = list(state.flock)
+    starts = lists.starts.tolist()
+    indices = lists.indices.tolist()
+    listed_distances = lists.distances.tolist()
+
+    def search(boid: Boid, distances: list[float] | None) -> list[Boid]:
+        start, end = starts[boid.index], starts[boid.index + 1]
+
+        if distances is not None:
+            distances.extend(listed_distances[start:end])
+
+        return [views[index] for index in indices[start:end]]
+
+    return search
+
+
+def next_state(context: RuleContext, perturbations: np.ndarray, distance_scale: float) -> tuple[Vector2, Vector2]:
+    """
+    Velocity and position of the boid after this frame. Neither the boid nor the flock is modified.
+    """
+    boid = context.boid
+    velocity = boid.velocity + evaluate_rules(context) + add_perturbation(boid, perturbations)
+    velocity = limit_velocity(velocity, context.settings)
+    return velocity, boid.position + velocity * distance_scale
+
+
+def move_boid(
+    context: RuleContext,
+    perturbations: np.ndarray,
+    distance_scale: float,
+    buffers: tuple[np.ndarray, np.ndarray] | None = None,
+):
+    """
+    Moves the boid in place, or with `buffers` from `Flock.back_buffers`, writes its next
+    position and velocity there and leaves the current frame untouched.
+    """
+    boid = context.boid
+    velocity, position = next_state(context, perturbations, distance_scale)
+
+    if buffers is None:
+        boid.velocity = velocity
+        boid.position = position
+    else:
+        buffers[0][boid.index] = (position.x, position.y)
+        buffers[1][boid.index] = (velocity.x, velocity.y)
+
+
+def back_buffers(flock: Flock, settings: Settings) -> tuple[np.ndarray, np.ndarray] | None:
+    return flock.back_buffers() if settings.get("performance", "double_buffered") else None
+
+
+def schedule_updates(state: State, settings: Settings, record_graph: bool) -> np.ndarray | None:
+    """
+    Indices of the boids to update this frame under `performance.frame_budget_ms`, or None
+    to update the whole flock. Frames that record the neighbor graph update every boid,
+    so the graph is complete.
+    """
+    budget = cast(float, settings.get("performance", "frame_budget_ms"))
+
+    if budget <= 0:
+        state.scheduler = None
+        return None
+
+    if state.scheduler is None:
+        state.scheduler = UpdateScheduler()
+
+    if record_graph:
+        return None
+
+    cell_size = cast(float, settings.get("performance", "spatial_grid_cell_size"))
+    return state.scheduler.batch(state.flock.positions, cell_size, budget / 1000)
+
+
+def scheduled_boids(state: State, batch: np.ndarray | None) -> Iterable[Boid]:
+    if batch is None:
+        return state.boids
+
+    return (Boid(state.flock, index) for index in batch.tolist())
+
+
+def coast(
+    flock: Flock,
+    batch: np.ndarray | None,
+    distance_scale: float,
+    buffers: tuple[np.ndarray, np.ndarray] | None,
+):
+    """
+    Moves the boids left out of this frame's batch along their current velocity.
+    """
+    if batch is None:
+        return
+
+    idle = np.ones(len(flock), dtype=bool)
+    idle[batch] = False
+    positions, velocities = buffers if buffers is not None else (flock.positions, flock.velocities)
+    velocities[idle] = flock.velocities[idle]
+    positions[idle] = flock.positions[idle] + flock.velocities[idle] * distance_scale
+
+
+def record_schedule(state: State, batch: np.ndarray | None, start: float):
+    if batch is not None and state.scheduler is not None:
+        state.scheduler.record(time.perf_counter() - start, len(batch))
+
+
+def finish_moves(flock: Flock, settings: Settings, buffers: tuple[np.ndarray, np.ndarray] | None):
+    if buffers is not None:
+        flock.swap_buffers()
+
+    wrap_positions(flock.positions, settings)
+
+
+def neighbor_pairs(state: State, settings: Settings, radius: float) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Every unordered pair of boids within `radius` as an (m, 2) array, with their squared
+    distances, from the Verlet lists when a skin is set and from the spatial index otherwise.
+    """
+    skin = cast(int, settings.get("performance", "verlet_skin"))
+
+    if skin > 0:
+        if state.verlet is None or state.verlet.skin != skin:
+            state.verlet = VerletList(skin)
+
+        lists = state.verlet.neighbors(state.flock.positions, radius)
+        rows = np.repeat(np.arange(len(state.flock)), np.diff(lists.starts))
+        upper = rows < lists.indices
+        return np.stack([rows[upper], lists.indices[upper]], axis=-1), lists.distances[upper]
+
+    state.verlet = None
+    return grid_pairs(state.boids, radius)
+
+
+def grid_pairs(index: SpatialIndex, radius: float) -> tuple[np.ndarray, np.ndarray]:
+    found = [(a.index, b.index, distance) for a, b, distance in index.search_pairs(radius)]
+    pairs = np.array([(a, b) for a, b, _ in found], dtype=np.intp).reshape(-1, 2)
+    return pairs, np.array([distance for _, _, distance in found], dtype=np.float64)
+
+
+def far_field_sums(state: State, settings: Settings, radius: float, separation_distance: float) -> NeighborSums:
+    """
+    Neighbor sums for cohesion and alignment from an aggregate pyramid, which visits
+    individual boids only near the edge of each neighborhood. Separation only reaches
+    `separation_distance`, so it is still summed over exact pairs.
+    """
+    flock = state.flock
+    cell_size = cast(float, settings.get("performance", "spatial_grid_cell_size"))
+    threshold = cast(float, settings.get("performance", "far_field_threshold"))
+    pyramid = AggregatePyramid(flock.positions, flock.velocities, cell_size)
+    totals, densities = pyramid.totals(flock.positions, radius, threshold)
+    pairs, distances = grid_pairs(state.boids, separation_distance)
+    close = accumulate_neighbor_sums(
+        flock.positions, flock.velocities, pairs, distances, separation_distance, separation_distance
+    )
+
+    return NeighborSums(
+        counts=np.rint(totals[:, 0]).astype(np.int64),
+        densities=densities - 1,
+        position_sums=totals[:, 1:3],
+        velocity_sums=totals[:, 3:5],
+        separations=close.separations,
+    )
+
+
+def update_boids_pairwise(
+    state: State,
+    settings: Settings,
+    delta_time: float,
+    record_graph: bool = False,
+) -> NeighborGraph | None:
+    """
+    Variant of `update_boids` that visits every neighbor pair once, before any boid moves,
+    and accumulates it into the sums of both boids. The cohesion, separation and
+    alignment rules then read those sums, so every boid sees its neighbors as they were
+    at the start of the frame. With `performance.far_field`, the sums come from an
+    aggregate pyramid instead, except on analytics frames, which need the exact pairs.
+    """
+    flock = state.flock
+    speed = cast(float, settings.get("boids", "speed"))
+    locality = cast(float, settings.get("boids", "locality_radius"))
+    separation_distance = cast(int, settings.get("boids", "separation_distance"))
+    batch = schedule_updates(state, settings, record_graph)
+
+    search_start = time.perf_counter()
+
+    if settings.get("performance", "far_field") and not record_graph:
+        sums = far_field_sums(state, settings, locality, separation_distance)
+    else:
+        pairs, distances = neighbor_pairs(state, settings, locality)
+        sums = accumulate_neighbor_sums(
+            flock.positions, flock.velocities, pairs, distances, locality, separation_distance
+        )
+
+    if state.metrics is not None:
+        state.metrics.observe("neighbor_search_seconds", time.perf_counter() - search_start)
+
+    flock.neighbor_counts[:] = sums.counts - 1
+    flock.densities[:] = sums.densities
+    perturbations = state.rng.uniform(PERTURBATION_MIN, PERTURBATION_MAX, size=flock.positions.shape)
+    buffers = back_buffers(flock, settings)
+
+    for boid in scheduled_boids(state, batch):
+        context = RuleContext(boid=boid, state=state, settings=settings, neighbors=[], sums=sums)
+        move_boid(context, perturbations, speed * delta_time, buffers)
+
+    coast(flock, batch, speed * delta_time, buffers)
+    finish_moves(flock, settings, buffers)
+    colorize(flock, settings)
+    rebuild_index(state, settings)
+    record_schedule(state, batch, search_start)
+
+    if not record_graph:
+        return None
+
+    nearest_squared = np.full(len(flock), np.inf)
+    np.minimum.at(nearest_squared, pairs[:, 0], distances)
+    np.minimum.at(nearest_squared, pairs[:, 1], distances)
+    return NeighborGraph(pairs=np.sort(pairs, axis=1), nearest_distances=np.sqrt(nearest_squared).astype(np.float32))
+
+
+def update_boids(
+    state: State,
+    settings: Settings,
+    delta_time: float,
+    record_graph: bool = False,
+) -> NeighborGraph | None:
+    """
+    Applies the rules to every boid and moves it. With `record_graph`, the neighbor
+    relations found along the way are returned for analytics.
+
+    By default each boid moves as soon as its rules are evaluated, so boids visited later
+    see it at its new position. With `performance.double_buffered`, every boid reads the
+    flock as it was at the start of the frame and writes to the flock's back buffers,
+    which become current once all boids are done, so the result does not depend on the
+    order boids are visited in.
+
+    With `performance.frame_budget_ms`, only the batch of boids that fits the budget is
+    updated and the rest move along their current velocity.
+    """
+    if HAS_NUMBA and settings.get("performance", "compiled_kernels"):
+        return update_boids_compiled(state, settings, delta_time, record_graph)
+
+    if settings.get("performance", "pairwise_rules") or settings.get("performance", "far_field"):
+        return update_boids_pairwise(state, settings, delta_time, record_graph)
+
+    speed = cast(float, settings.get("boids", "speed"))
+    locality = cast(float, settings.get("boids", "locality_radius"))
+    locality_squared = locality * locality
+    neighbor_counts = state.flock.neighbor_counts
+    densities = state.flock.densities
+    pairs: list[tuple[int, int]] | None = [] if record_graph else None
+    nearest_distances = np.full(len(state.flock), np.inf, dtype=np.float32)
+    distances: list[float] | None = [] if record_graph or settings.get("boids", "color_by") == "density" else None
+    perturbations = state.rng.uniform(PERTURBATION_MIN, PERTURBATION_MAX, size=state.flock.positions.shape)
+    batch = schedule_updates(state, settings, record_graph)
+    start = search_start = time.perf_counter()
+    search = neighbor_search(state, settings, locality)
+    search_time = time.perf_counter() - search_start
+    buffers = back_buffers(state.flock, settings)
+
+    for boid in scheduled_boids(state, batch):
+        search_start = time.perf_counter()
+        neighbors = search(boid, distances)
+        search_time += time.perf_counter() - search_start
+        neighbor_counts[boid.index] = len(neighbors) - 1
+
+        if distances is not None:
+            densities[boid.index] = len(distances) - 1 - sum(distances) / locality_squared
+
+            if pairs is not None:
+                record_neighbors(boid, neighbors, distances, pairs, nearest_distances)
+
+            distances.clear()
+
+        context = RuleContext(boid=boid, state=state, settings=settings, neighbors=neighbors)
+        move_boid(context, perturbations, speed * delta_time, buffers)
+
+    if state.metrics is not None:
+        state.metrics.observe("neighbor_search_seconds", search_time)
+
+    coast(state.flock, batch, speed * delta_time, buffers)
+    finish_moves(state.flock, settings, buffers)
+    colorize(state.flock, settings)
+    rebuild_index(state, settings)
+    record_schedule(state, batch, start)
+
+    if pairs is None:
+        return None
+
+    # Unless double-buffered, boids move during the loop, so a pair may be found from both ends or from one only.
+    edges = np.unique(np.array(pairs, dtype=np.intp).reshape(-1, 2), axis=0)
+    return NeighborGraph(pairs=edges, nearest_distances=nearest_distances)
+
+
+def update_boids_compiled(
+    state: State,
+    settings: Settings,
+    delta_time: float,
+    record_graph: bool = False,
+) -> NeighborGraph | None:
+    """
+    Array counterpart of `update_boids` built on the compiled flocking kernel.
+    Every boid reads the flock as it was at the start of the frame.
+    """
+    flock = state.flock
+    positions = flock.positions
+    velocities = flock.velocities
+    speed = cast(float, settings.get("boids", "speed"))
+    max_speed = cast(float, settings.get("boids", "max_speed"))
+    cell_size = cast(float, settings.get("performance", "spatial_grid_cell_size"))
+
+    # Neighbor search is fused with the flocking rules, so its time covers both.
+    search_start = time.perf_counter()
+    compute_forces = functools.partial(
+        flocking_forces,
+        positions,
+        velocities,
+        build_cell_layout(positions, cell_size),
+        locality=cast(float, settings.get("boids", "locality_radius")),
+        separation_distance=cast(int, settings.get("boids", "separation_distance")),
+        separation_strength=cast(int, settings.get("boids", "separation_strength")),
+        cohesion=cast(int, settings.get("boids", "cohesion")) / 100,
+        alignment=cast(int, settings.get("boids", "alignment")) / 100,
+        neighbor_counts=flock.neighbor_counts,
+        densities=flock.densities,
+    )
+    neighbors = None
+
+    if record_graph:
+        capacity = int(flock.neighbor_counts.max(initial=0)) + NEIGHBOR_SLOT_SLACK
+        neighbors = NeighborBuffer.create(len(flock), capacity)
+
+    forces = compute_forces(neighbors=neighbors)
+
+    if neighbors is not None and neighbors.overflowed:
+        # Slots are sized from the previous frame's neighbor counts. In the rare frame
+        # where a boid gained more neighbors than that, the kernel runs again with exact sizes.
+        neighbors = NeighborBuffer.create(len(flock), neighbors.required_capacity)
+        forces = compute_forces(neighbors=neighbors)
+
+    if state.metrics is not None:
+        state.metrics.observe("neighbor_search_seconds", time.perf_counter() - search_start)
+
+    forces += evaluate_environment(state, settings)
+    forces += state.rng.uniform(PERTURBATION_MIN, PERTURBATION_MAX, size=forces.shape)
+    velocities += forces
+
+    speeds = np.hypot(velocities[:, 0], velocities[:, 1])
+    too_fast = speeds > max_speed
+    velocities[too_fast] *= (max_speed / speeds[too_fast])[:, np.newaxis]
+    positions += velocities * (speed * delta_time)
+    wrap_positions(positions, settings)
+
+    colorize(flock, settings)
+    rebuild_index(state, settings)
+
+    if neighbors is None:
+        return None
+
+    return NeighborGraph(pairs=neighbors.pairs(), nearest_distances=neighbors.nearest_distances)
+
+
+def update_boid_count(state: State, settings: Settings):
+    """
+    Spawns or removes boids to match `boids.count`, leaving the other boids as they are.
+    Missing boids are spawned in one batch and added to the index. Surplus boids are the
+    most recently added ones, removed through their index handles from the end of the
+    index, so shrinking costs time in proportion to the boids removed.
+    """
+    count = cast(int, settings.get("boids", "count"))
+    flock = state.flock
+    index = state.boids
+
+    if len(flock) == count:
+        return
+
+    if not index_matches(state, settings):
+        rebuild_index(state, settings)
+        index = state.boids
+
+    if count > len(flock):
+        spawned = spawn_boids(flock, count - len(flock), state.rng)
+
+        for boid_index in spawned:
+            index.insert(Boid(flock, boid_index))
+
+        if isinstance(index, SpatialGrid):
+            cells = grid_cells(flock.positions[spawned.start :], index.cell_size)
+            state.index_cells = np.concatenate([state.index_cells, cells])
+    else:
+        for handle in reversed(index.handles[count:]):
+            index.discard(handle)
+
+        flock.truncate(count)
+        state.index_cells = state.index_cells[:count]
+
+
+def setup_state(settings: Settings, seed: int | None = None) -> State:
+    """
+    Creates the initial simulation state. All randomness in the simulation is drawn from
+    `state.rng`, so runs with the same seed and settings are reproducible.
+    """
+    rng = np.random.default_rng(seed)
+    count = cast(int, settings.get("boids", "count"))
+    flock = create_boids(count, rng)
+    state = State(flock=flock, boids=SpatialGrid[Boid](BOID_DIMENSIONS), obstacles=load_obstacles(), rng=rng)
+    rebuild_index(state, settings)
+    return state
+
+
+def record_metrics(state: State):
+    metrics = state.metrics
+
+    if metrics is None or not len(state.flock):
+        return
+
+    neighbor_counts = state.flock.neighbor_counts
+    metrics.observe("neighbors_mean", float(neighbor_counts.mean()), COUNT_BUCKETS)
+    metrics.observe("neighbors_max", float(neighbor_counts.max()), COUNT_BUCKETS)
+    cells = state.boids.grid.values() if isinstance(state.boids, SpatialGrid) else state.boids.leaves()
+    occupancy = np.fromiter((len(cell.items) for cell in cells if cell.items), dtype=np.float64)
+    metrics.observe_many("cell_occupancy", occupancy)
+    metrics.set_gauge("boid_count", len(state.flock))
+    metrics.set_gauge("flock_bytes", state.flock.nbytes)
+
+    if state.verlet is not None:
+        metrics.set_gauge("verlet_rebuilds", state.verlet.rebuilds)
+
+    if state.scheduler is not None and len(state.scheduler.intervals):
+        metrics.set_gauge("update_rate", float(state.scheduler.update_rates.mean()))
+
+    analytics = state.analytics
+
+    if analytics is not None and analytics.frame == state.frame:
+        metrics.set_gauge("polarization", analytics.polarization)
+        metrics.set_gauge("angular_momentum", analytics.angular_momentum)
+        metrics.set_gauge("clusters", analytics.clusters)
+        metrics.observe_many("cluster_size", analytics.cluster_sizes.astype(np.float64))
+        metrics.observe_many("nearest_neighbor_distance", analytics.nearest_distances, DISTANCE_BUCKETS)
+
+
+def analytics_due(state: State, settings: Settings) -> bool:
+    """
+    Whether this frame is one of every `analytics.interval` frames.
+    """
+    interval = cast(int, settings.get("analytics", "interval"))
+    return interval > 0 and (state.frame + 1) % interval == 0
+
+
+def step(state: State, settings: Settings, delta_time: float):
+    start = time.perf_counter()
+    update_boid_count(state, settings)
+    update_goal(state, settings)
+    update_obstacles(state, settings)
+    update_flow_field(state, settings)
+    graph = update_boids(state, settings, delta_time, record_graph=analytics_due(state, settings))
+
+    if graph is not None:
+        state.analytics = analyze(state.flock.positions, state.flock.velocities, graph, state.frame)
+
+    state.elapsed += delta_time
+
+    if state.metrics is not None:
+        state.metrics.observe("step_seconds", time.perf_counter() - start)
+        record_metrics(state)
+
+    state.frame += 1
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
-import contextlib
+import itertools
+import math
 from dataclasses import dataclass, field
 from typing import Generic, Iterator, Protocol, TypeVar, runtime_checkable
 
@@ -17,39 +18,99 @@ class PointLike(Protocol):
 T = TypeVar("T", bound=PointLike)
 
 
+@dataclass(slots=True)
+class GridHandle(Generic[T]):
+    """
+    Where an item is stored in a `SpatialGrid`: its cell and its slots in the cell's
+    list and in the list of all items. The grid keeps these up to date as other items
+    are removed or moved.
+    """
+
+    item: T
+    cell: tuple[int, ...]
+    slot: int
+    position: int
+
+
 @dataclass
 class GridCell(Generic[T]):
     items: list[T] = field(default_factory=list)
+    handles: list[GridHandle[T]] = field(default_factory=list)
 
 
 class SpatialGrid(Generic[T]):
+    """
+    Uniform grid of cells of `cell_size` holding items by their coordinates.
+
+    `insert` returns a handle through which the item can later be removed, or moved
+    after its coordinates changed, in constant time: a removed item's slot is filled
+    with the last item of the same list.
+
+    `items` and `handles` hold every item in insertion order, except where `discard`
+    moved the last item into the slot of a removed one. Moving items never reorders
+    them. `simulation.rebuild_index` and `simulation.update_boid_count` rely on
+    `handles[i]` being the handle of flock boid `i`, which holds as long as boids are
+    only ever discarded from the end.
+    """
+
     def __init__(self, dimensions: int, cell_size: float = 50.0):
         self.dimensions = dimensions
         self.cell_size = cell_size
         self.grid: dict[tuple[int, ...], GridCell[T]] = {}
         self.items: list[T] = []
+        self.handles: list[GridHandle[T]] = []
+        self._stencils: dict[tuple[float, float], list[tuple[int, ...]]] = {}
 
     def _cell_coordinates(self, item: T) -> tuple[int, ...]:
         return tuple(int(item[dimension] // self.cell_size) for dimension in range(self.dimensions))
 
-    def insert(self, item: T):
-        coords = self._cell_coordinates(item)
-
-        if coords not in self.grid:
-            self.grid[coords] = GridCell()
-
-        self.grid[coords].items.append(item)
+    def insert(self, item: T) -> GridHandle[T]:
+        handle = GridHandle(item=item, cell=self._cell_coordinates(item), slot=0, position=len(self.items))
+        self._attach(handle)
         self.items.append(item)
+        self.handles.append(handle)
+        return handle
 
     def remove(self, item: T):
-        coords = self._cell_coordinates(item)
+        """
+        Removes `item`, looking it up in the cell of its current coordinates. Items that
+        moved since they were inserted have to be removed through their handle instead.
+        """
+        cell = self.grid.get(self._cell_coordinates(item))
 
-        if coords in self.grid:
-            with contextlib.suppress(ValueError):
-                self.grid[coords].items.remove(item)
+        if cell is None:
+            return
 
-        with contextlib.suppress(ValueError):
-            self.items.remove(item)
+        for handle in cell.handles:
+            if handle.item == item:
+                self.discard(handle)
+                return
+
+    def discard(self, handle: GridHandle[T]):
+        """
+        Removes the item of `handle` in constant time.
+        """
+        self._detach(handle)
+        last = self.handles.pop()
+        self.items.pop()
+
+        if last is not handle:
+            last.position = handle.position
+            self.handles[handle.position] = last
+            self.items[handle.position] = last.item
+
+    def move(self, handle: GridHandle[T], cell: tuple[int, ...] | None = None):
+        """
+        Files the item of `handle` under the cell of its current coordinates, or under
+        `cell` when the caller already knows it.
+        """
+        if cell is None:
+            cell = self._cell_coordinates(handle.item)
+
+        if cell != handle.cell:
+            self._detach(handle)
+            handle.cell = cell
+            self._attach(handle)
 
     def search(self, item: T) -> T | None:
         coordinates = self._cell_coordinates(item)
@@ -61,32 +122,209 @@ class SpatialGrid(Generic[T]):
 
         return None
 
-    def search_radius(self, query: T, radius: float) -> list[T]:
+    def _attach(self, handle: GridHandle[T]):
+        cell = self.grid.get(handle.cell)
+
+        if cell is None:
+            cell = self.grid[handle.cell] = GridCell()
+
+        handle.slot = len(cell.items)
+        cell.items.append(handle.item)
+        cell.handles.append(handle)
+
+    def _detach(self, handle: GridHandle[T]):
+        cell = self.grid[handle.cell]
+        last = cell.handles.pop()
+        cell.items.pop()
+
+        if last is not handle:
+            last.slot = handle.slot
+            cell.handles[handle.slot] = last
+            cell.items[handle.slot] = last.item
+        elif not cell.items:
+            del self.grid[handle.cell]
+
+    def search_radius(self, query: T, radius: float, distances: list[float] | None = None) -> list[T]:
+        """
+        Returns all items within `radius` of `query`. When `distances` is given,
+        the squared distance of every returned item is appended to it in the same order.
+
+        Only the cells of a stencil cached per radius are visited, and of those only the
+        ones whose nearest point to `query` is within `radius`.
+        """
+        match self.dimensions:
+            case 2:
+                return self._search_radius_2d(query, radius, distances)
+            case 3:
+                return self._search_radius_3d(query, radius, distances)
+            case _:
+                return self._search_radius_nd(query, radius, distances)
+
+    def stencil(self, radius: float) -> list[tuple[int, ...]]:
+        """
+        Offsets of the cells that a circle of `radius` centered anywhere in a cell can
+        reach, measured from that cell.
+        """
+        key = (radius, self.cell_size)
+        stencil = self._stencils.get(key)
+
+        if stencil is None:
+            reach = math.ceil(radius / self.cell_size)
+            radius_squared = radius * radius
+            stencil = [
+                offset
+                for offset in itertools.product(range(-reach, reach + 1), repeat=self.dimensions)
+                if sum((max(abs(delta) - 1, 0) * self.cell_size) ** 2 for delta in offset) <= radius_squared
+            ]
+            self._stencils[key] = stencil
+
+        return stencil
+
+    def _search_radius_2d(self, query: T, radius: float, distances: list[float] | None) -> list[T]:
+        x, y = query[0], query[1]
+        size = self.cell_size
+        column, row = int(x // size), int(y // size)
         radius_squared = radius * radius
-        min_coords = [int((query[d] - radius) // self.cell_size) for d in range(self.dimensions)]
-        max_coords = [int((query[d] + radius) // self.cell_size) for d in range(self.dimensions)]
+        grid = self.grid
+        results: list[T] = []
 
-        return [
-            item
-            for cell in self._iter_cells(min_coords, max_coords)
-            if cell in self.grid
-            for item in self.grid[cell].items
-            if self._distance_squared(item, query) <= radius_squared
-        ]
+        for offset_x, offset_y in self.stencil(radius):
+            cell = grid.get((column + offset_x, row + offset_y))
 
-    def _distance_squared(self, left: T, right: T) -> float:
-        return sum((left[d] - right[d]) ** 2 for d in range(self.dimensions))
+            if cell is None:
+                continue
 
-    def _iter_cells(self, min_coords, max_coords):
-        def recurse(dim, current_coords):
-            if dim == self.dimensions:
-                yield tuple(current_coords)
-                return
-            for coord in range(min_coords[dim], max_coords[dim] + 1):
-                current_coords[dim] = coord
-                yield from recurse(dim + 1, current_coords)
+            left = (column + offset_x) * size
+            top = (row + offset_y) * size
+            gap_x = left - x if x < left else max(x - left - size, 0.0)
+            gap_y = top - y if y < top else max(y - top - size, 0.0)
+
+            if gap_x * gap_x + gap_y * gap_y > radius_squared:
+                continue
+
+            for item in cell.items:
+                dx = item[0] - x
+                dy = item[1] - y
+                distance_squared = dx * dx + dy * dy
 
-        yield from recurse(0, [0] * self.dimensions)
+                if distance_squared <= radius_squared:
+                    results.append(item)
+
+                    if distances is not None:
+                        distances.append(distance_squared)
+
+        return results
+
+    def _search_radius_3d(self, query: T, radius: float, distances: list[float] | None) -> list[T]:
+        x, y, z = query[0], query[1], query[2]
+        size = self.cell_size
+        column, row, layer = int(x // size), int(y // size), int(z // size)
+        radius_squared = radius * radius
+        grid = self.grid
+        results: list[T] = []
+
+        for offset_x, offset_y, offset_z in self.stencil(radius):
+            cell = grid.get((column + offset_x, row + offset_y, layer + offset_z))
+
+            if cell is None:
+                continue
+
+            left = (column + offset_x) * size
+            top = (row + offset_y) * size
+            front = (layer + offset_z) * size
+            gap_x = left - x if x < left else max(x - left - size, 0.0)
+            gap_y = top - y if y < top else max(y - top - size, 0.0)
+            gap_z = front - z if z < front else max(z - front - size, 0.0)
+
+            if gap_x * gap_x + gap_y * gap_y + gap_z * gap_z > radius_squared:
+                continue
+
+            for item in cell.items:
+                dx = item[0] - x
+                dy = item[1] - y
+                dz = item[2] - z
+                distance_squared = dx * dx + dy * dy + dz * dz
+
+                if distance_squared <= radius_squared:
+                    results.append(item)
+
+                    if distances is not None:
+                        distances.append(distance_squared)
+
+        return results
+
+    def _search_radius_nd(self, query: T, radius: float, distances: list[float] | None) -> list[T]:
+        point = [query[dimension] for dimension in range(self.dimensions)]
+        home = [int(coordinate // self.cell_size) for coordinate in point]
+        radius_squared = radius * radius
+        results: list[T] = []
+
+        for offset in self.stencil(radius):
+            coords = tuple(cell + delta for cell, delta in zip(home, offset))
+            cell = self.grid.get(coords)
+
+            if cell is None or self._gap_squared(point, coords) > radius_squared:
+                continue
+
+            for item in cell.items:
+                distance_squared = self._distance_squared(item, query)
+
+                if distance_squared <= radius_squared:
+                    results.append(item)
+
+                    if distances is not None:
+                        distances.append(distance_squared)
+
+        return results
+
+    def _gap_squared(self, point: list[float], coords: tuple[int, ...]) -> float:
+        """
+        Squared distance from `point` to the nearest point of the cell at `coords`.
+        """
+        total = 0.0
+
+        for coordinate, cell in zip(point, coords):
+            low = cell * self.cell_size
+            gap = max(low - coordinate, coordinate - low - self.cell_size, 0.0)
+            total += gap * gap
+
+        return total
+
+    def search_pairs(self, radius: float) -> Iterator[tuple[T, T, float]]:
+        """
+        Yields every unordered pair of items at most `radius` apart once, with its squared
+        distance. Each cell is paired with itself and with the half of the surrounding
+        cells that come after it in coordinate order, so no pair is visited twice.
+        """
+        radius_squared = radius * radius
+        origin = (0,) * self.dimensions
+        stencil = [offset for offset in self.stencil(radius) if offset > origin]
+
+        for coords, cell in self.grid.items():
+            items = cell.items
+
+            for position, item in enumerate(items):
+                for other in items[position + 1 :]:
+                    distance_squared = self._distance_squared(item, other)
+
+                    if distance_squared <= radius_squared:
+                        yield item, other, distance_squared
+
+            for offset in stencil:
+                other_cell = self.grid.get(tuple(coord + delta for coord, delta in zip(coords, offset)))
+
+                if other_cell is None:
+                    continue
+
+                for item in items:
+                    for other in other_cell.items:
+                        distance_squared = self._distance_squared(item, other)
+
+                        if distance_squared <= radius_squared:
+                            yield item, other, distance_squared
+
+    def _distance_squared(self, left: T, right: T) -> float:
+        return sum((left[d] - right[d]) ** 2 for d in range(self.dimensions))
 
     def __iter__(self) -> Iterator[T]:
         return iter(self.items)
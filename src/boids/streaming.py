@@ -0,0 +1,295 @@
+"""
+Streams flock state to remote viewers over TCP.
+
+Every message is a 4-byte little-endian length followed by a frame. A frame is
+a fixed header (kind, frame number, boid count, world size) followed by a
+zlib-compressed payload of quantized 16-bit values: x, y and heading per boid.
+Keyframes carry absolute values, delta frames carry the difference (modulo 2**16)
+from the last frame that was sent to that particular client.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import math
+import struct
+import threading
+import zlib
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from boids.constants import SCREEN_SIZE
+from boids.entities import Flock, State
+
+KEYFRAME = 0
+DELTA = 1
+HEADER = struct.Struct("<BIIff")
+LENGTH = struct.Struct("<I")
+QUANTIZATION_LEVELS = 1 << 16
+WRITE_BUFFER_LIMIT = 64 * 1024
+
+
+def quantize(positions: np.ndarray, velocities: np.ndarray, world_size: tuple[float, float]) -> np.ndarray:
+    """
+    Packs positions and headings into an (n, 3) array of 16-bit values.
+    Positions are clamped to the world rectangle, headings wrap around the full circle.
+    """
+    values = np.empty((len(positions), 3), dtype=np.uint16)
+    scaled = positions / np.asarray(world_size, dtype=np.float32) * (QUANTIZATION_LEVELS - 1)
+    values[:, :2] = np.clip(np.rint(scaled), 0, QUANTIZATION_LEVELS - 1)
+
+    headings = np.arctan2(velocities[:, 1], velocities[:, 0]) / (2 * math.pi)
+    values[:, 2] = np.rint(headings % 1.0 * QUANTIZATION_LEVELS).astype(np.int64) % QUANTIZATION_LEVELS
+
+    return values
+
+
+def dequantize(values: np.ndarray, world_size: tuple[float, float]) -> tuple[np.ndarray, np.ndarray]:
+    positions = values[:, :2].astype(np.float32) / (QUANTIZATION_LEVELS - 1) * np.asarray(world_size, dtype=np.float32)
+    headings = values[:, 2].astype(np.float32) / QUANTIZATION_LEVELS * (2 * math.pi)
+    return positions, headings
+
+
+@dataclass
+class StreamFrame:
+    number: int
+    is_keyframe: bool
+    positions: np.ndarray
+    headings: np.ndarray
+
+
+class FrameEncoder:
+    """
+    Encodes quantized frames for a single client, tracking the last frame it was sent.
+    """
+
+    def __init__(self, keyframe_interval: int = 60):
+        self.keyframe_interval = keyframe_interval
+        self._previous: np.ndarray | None = None
+        self._frames_since_keyframe = 0
+
+    def encode(self, number: int, values: np.ndarray, world_size: tuple[float, float]) -> bytes:
+        is_keyframe = (
+            self._previous is None
+            or self._previous.shape != values.shape
+            or self._frames_since_keyframe >= self.keyframe_interval
+        )
+
+        if is_keyframe:
+            payload = values
+            self._frames_since_keyframe = 0
+        else:
+            payload = values - self._previous
+            self._frames_since_keyframe += 1
+
+        self._previous = values
+        header = HEADER.pack(KEYFRAME if is_keyframe else DELTA, number, len(values), *world_size)
+
+        return header + zlib.compress(payload.tobytes(), 1)
+
+
+class FrameDecoder:
+    """
+    Reconstructs frames on the receiving side. Delta frames received before
+    the first keyframe are rejected.
+    """
+
+    def __init__(self):
+        self._previous: np.ndarray | None = None
+
+    def decode(self, message: bytes) -> StreamFrame:
+        kind, number, count, width, height = HEADER.unpack_from(message)
+        payload = np.frombuffer(zlib.decompress(message[HEADER.size :]), dtype=np.uint16).reshape(count, 3)
+
+        if kind == KEYFRAME:
+            values = payload.copy()
+        elif kind == DELTA:
+            if self._previous is None or self._previous.shape != payload.shape:
+                raise ValueError("Received a delta frame without a matching keyframe.")
+
+            values = self._previous + payload
+        else:
+            raise ValueError(f"Unknown frame kind {kind}.")
+
+        self._previous = values
+        positions, headings = dequantize(values, (width, height))
+
+        return StreamFrame(number=number, is_keyframe=kind == KEYFRAME, positions=positions, headings=headings)
+
+
+@dataclass(eq=False)
+class ClientStats:
+    address: str
+    frames_sent: int = 0
+    frames_dropped: int = 0
+    bytes_sent: int = 0
+    pending: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+
+class StreamServer:
+    """
+    Asyncio TCP server running on its own thread. The simulation thread calls
+    `publish` once per frame; each client is sent the newest frame whenever its
+    socket is ready, and any frames published in the meantime are dropped for
+    that client rather than queued.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        keyframe_interval: int = 60,
+        world_size: tuple[float, float] = SCREEN_SIZE,
+    ):
+        self.host = host
+        self.port = port
+        self.keyframe_interval = keyframe_interval
+        self.world_size = world_size
+        self.clients: list[ClientStats] = []
+        self._latest: tuple[int, np.ndarray] | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._server: asyncio.Server | None = None
+        self._thread: threading.Thread | None = None
+        self._ready = threading.Event()
+        self._error: BaseException | None = None
+
+    def start(self):
+        """
+        Starts serving on a background thread. Raises the error that prevented the
+        server from starting, such as `OSError` for a port that is already in use.
+        """
+        self._ready.clear()
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="boids-stream-server", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+        if self._error is not None:
+            self._thread.join()
+            self._thread = None
+            raise self._error
+
+    def stop(self):
+        if self._loop is None or self._thread is None:
+            return
+
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop = None
+        self._thread = None
+
+    def publish(self, flock: Flock, number: int):
+        self.publish_arrays(flock.positions, flock.velocities, number)
+
+    def publish_arrays(self, positions: np.ndarray, velocities: np.ndarray, number: int):
+        if self._loop is None:
+            return
+
+        values = quantize(positions, velocities, self.world_size)
+        self._loop.call_soon_threadsafe(self._set_latest, number, values)
+
+    def publish_state(self, state: State, number: int):
+        self.publish(state.flock, number)
+
+    def _run(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+
+        try:
+            self._server = loop.run_until_complete(asyncio.start_server(self._serve_client, self.host, self.port))
+            self.port = self._server.sockets[0].getsockname()[1]
+            self._loop = loop
+        except BaseException as error:
+            self._error = error
+            loop.close()
+            return
+        finally:
+            self._ready.set()
+
+        try:
+            self._loop.run_forever()
+        finally:
+            self._server.close()
+            tasks = asyncio.all_tasks(self._loop)
+
+            for task in tasks:
+                task.cancel()
+
+            self._loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self._loop.close()
+
+    def _set_latest(self, number: int, values: np.ndarray):
+        self._latest = (number, values)
+
+        for client in self.clients:
+            if client.pending.is_set():
+                client.frames_dropped += 1
+
+            client.pending.set()
+
+    async def _serve_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        writer.transport.set_write_buffer_limits(high=WRITE_BUFFER_LIMIT)
+        client = ClientStats(address=str(writer.get_extra_info("peername")))
+        encoder = FrameEncoder(self.keyframe_interval)
+        self.clients.append(client)
+
+        if self._latest is not None:
+            client.pending.set()
+
+        try:
+            while True:
+                await client.pending.wait()
+                client.pending.clear()
+
+                if self._latest is None:
+                    continue
+
+                number, values = self._latest
+                message = encoder.encode(number, values, self.world_size)
+                writer.write(LENGTH.pack(len(message)) + message)
+                await writer.drain()
+                client.frames_sent += 1
+                client.bytes_sent += LENGTH.size + len(message)
+        except ConnectionError:
+            pass
+        finally:
+            self.clients.remove(client)
+            writer.close()
+
+            with contextlib.suppress(ConnectionError):
+                await writer.wait_closed()
+
+
+class StreamClient:
+    """
+    Minimal asyncio client for `StreamServer`.
+    """
+
+    def __init__(self):
+        self._reader: asyncio.StreamReader | None = None
+        self._writer: asyncio.StreamWriter | None = None
+        self._decoder = FrameDecoder()
+
+    async def connect(self, host: str, port: int):
+        self._reader, self._writer = await asyncio.open_connection(host, port)
+
+    async def receive(self) -> StreamFrame:
+        if self._reader is None:
+            raise RuntimeError("Client is not connected.")
+
+        (length,) = LENGTH.unpack(await self._reader.readexactly(LENGTH.size))
+        return self._decoder.decode(await self._reader.readexactly(length))
+
+    async def close(self):
+        if self._writer is None:
+            return
+
+        self._writer.close()
+
+        with contextlib.suppress(ConnectionError):
+            await self._writer.wait_closed()
+
+        self._reader = None
+        self._writer = None
@@ -0,0 +1,281 @@
+"""
+Parameter sweeps: many headless simulations over a grid or a random sample of
+settings, run across a pool of worker processes, summarized in one table.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import itertools
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import cast
+
+import numpy as np
+
+from boids.analytics import FlockAnalytics
+from boids.constants import FPS
+from boids.settings.settings import Settings, load_settings
+from boids.simulation import setup_state, step
+
+ORDER_COLUMNS = [
+    "polarization",
+    "angular_momentum",
+    "nearest_neighbor_distance",
+    "clusters",
+    "largest_cluster",
+]
+
+RESULT_COLUMNS = ["seed", "frames", "seconds", "frames_per_second", *ORDER_COLUMNS]
+
+SWEEPABLE_TYPES = ("int", "float", "bool", "choice")
+
+_worker_state: dict[str, dict] = {}
+
+
+@dataclass(frozen=True)
+class SweepRun:
+    parameters: dict[str, float | int | bool | str] = field(hash=False)
+    seed: int
+    frames: int
+    delta_time: float = 1 / FPS
+
+
+def grid_points(values: dict[str, list]) -> list[dict]:
+    """
+    Every combination of the given values, keyed by `section.field` setting names.
+    """
+    names = list(values)
+    return [dict(zip(names, combination)) for combination in itertools.product(*(values[name] for name in names))]
+
+
+def random_points(ranges: dict[str, tuple[float, float]], samples: int, rng: np.random.Generator) -> list[dict]:
+    """
+    Samples settings uniformly from the given inclusive ranges.
+    """
+    return [{name: float(rng.uniform(low, high)) for name, (low, high) in ranges.items()} for _ in range(samples)]
+
+
+def create_runs(points: list[dict], repeats: int, frames: int, seed: int | None = None) -> list[SweepRun]:
+    """
+    Creates `repeats` runs per point, each with its own seed derived from `seed`.
+    """
+    seeds = np.random.SeedSequence(seed).generate_state(len(points) * repeats).tolist()
+    return [
+        SweepRun(parameters=point, seed=seeds[i * repeats + repeat], frames=frames)
+        for i, point in enumerate(points)
+        for repeat in range(repeats)
+    ]
+
+
+def apply_parameters(settings: Settings, parameters: dict):
+    for name, raw_value in parameters.items():
+        section, _, setting = name.partition(".")
+        value = raw_value
+
+        match settings.get_field(section, setting)["type"]:
+            case "bool":
+                value = value if isinstance(value, bool) else str(value).lower() in ("1", "true", "yes")
+            case "int":
+                value = round(float(value))
+            case "float":
+                value = float(value)
+            case "choice":
+                options = settings.get_field(section, setting)["options"]
+
+                if value not in options:
+                    raise ValueError(f"Setting '{name}' must be one of {', '.join(options)}, got '{value}'.")
+            case setting_type:
+                raise ValueError(f"Setting '{name}' of type '{setting_type}' cannot be swept.")
+
+        settings.set(section, setting, value)
+
+
+def order_metrics(analytics: FlockAnalytics | None) -> dict[str, float]:
+    """
+    Order parameters of the final frame. Boids without a neighbor within the locality
+    radius do not contribute to the mean nearest-neighbor distance.
+    """
+    if analytics is None:
+        return dict.fromkeys(ORDER_COLUMNS, float("nan"))
+
+    distances = analytics.nearest_distances
+
+    return {
+        "polarization": analytics.polarization,
+        "angular_momentum": analytics.angular_momentum,
+        "nearest_neighbor_distance": float(distances.mean()) if len(distances) else float("nan"),
+        "clusters": analytics.clusters,
+        "largest_cluster": analytics.largest_cluster,
+    }
+
+
+def run_simulation(run: SweepRun, base_settings: dict | None = None) -> dict:
+    """
+    Runs one headless simulation and returns its parameters, throughput and the
+    order metrics of the final frame.
+    """
+    settings = Settings()
+    settings.load_dict(base_settings if base_settings is not None else _worker_state.get("settings", {}))
+    apply_parameters(settings, run.parameters)
+    # Analytics are only needed for the final frame.
+    settings.set("analytics", "interval", run.frames)
+    state = setup_state(settings, seed=run.seed)
+
+    start = time.perf_counter()
+
+    for _ in range(run.frames):
+        step(state, settings, run.delta_time)
+
+    seconds = time.perf_counter() - start
+    parameters = {name: settings.get(*name.split(".", 1)) for name in run.parameters}
+
+    return {
+        **parameters,
+        "seed": run.seed,
+        "frames": run.frames,
+        "seconds": seconds,
+        "frames_per_second": run.frames / seconds if seconds > 0 else float("inf"),
+        **order_metrics(state.analytics),
+    }
+
+
+def _initialize_worker(base_settings: dict):
+    _worker_state["settings"] = base_settings
+
+
+def run_sweep(runs: list[SweepRun], base_settings: dict, workers: int | None = None, on_result=None) -> list[dict]:
+    """
+    Runs the sweep on a process pool. Workers are started once and reused for all runs,
+    so imports and, with compiled kernels, compilation are paid once per worker.
+    Workers are spawned rather than forked, since forking a process that has run the
+    parallel kernel leaves its threading layer unusable in the child.
+    Results are returned in the order of `runs`.
+    """
+    results: list[dict | None] = [None] * len(runs)
+    context = multiprocessing.get_context("spawn")
+
+    with ProcessPoolExecutor(
+        workers,
+        mp_context=context,
+        initializer=_initialize_worker,
+        initargs=(base_settings,),
+    ) as executor:
+        futures = {executor.submit(run_simulation, run): index for index, run in enumerate(runs)}
+
+        for future in as_completed(futures):
+            results[futures[future]] = result = future.result()
+
+            if on_result is not None:
+                on_result(result)
+
+    return cast(list[dict], results)
+
+
+def format_table(results: list[dict]) -> str:
+    if not results:
+        return ""
+
+    columns = list(results[0])
+    rows = [[_format_value(result[column]) for column in columns] for result in results]
+    widths = [max(len(column), *(len(row[i]) for row in rows)) for i, column in enumerate(columns)]
+    lines = ["  ".join(column.rjust(width) for column, width in zip(columns, widths))]
+    lines.extend("  ".join(value.rjust(width) for value, width in zip(row, widths)) for row in rows)
+    return "\n".join(lines)
+
+
+def _format_value(value) -> str:
+    return f"{value:.4g}" if isinstance(value, float) else str(value)
+
+
+def _parse_values(text: str) -> tuple[str, list[str]]:
+    name, separator, values = text.partition("=")
+
+    if not separator or "." not in name or not values:
+        raise argparse.ArgumentTypeError(f"Expected SECTION.FIELD=VALUE[,VALUE...], got '{text}'.")
+
+    return name, values.split(",")
+
+
+def _parse_range(text: str) -> tuple[str, tuple[float, float]]:
+    name, separator, bounds = text.partition("=")
+    low, colon, high = bounds.partition(":")
+    message = f"Expected SECTION.FIELD=LOW:HIGH, got '{text}'."
+
+    if not separator or "." not in name or not colon:
+        raise argparse.ArgumentTypeError(message)
+
+    try:
+        return name, (float(low), float(high))
+    except ValueError:
+        raise argparse.ArgumentTypeError(message) from None
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(prog="boids-sweep", description="Run headless simulations over many settings.")
+    parser.add_argument("--grid", type=_parse_values, action="append", default=[], metavar="SECTION.FIELD=V1,V2,...")
+    parser.add_argument("--random", type=_parse_range, action="append", default=[], metavar="SECTION.FIELD=LOW:HIGH")
+    parser.add_argument("--samples", type=int, default=16, help="Random samples per grid point (with --random).")
+    parser.add_argument("--repeats", type=int, default=1, help="Runs per parameter set, each with its own seed.")
+    parser.add_argument("--frames", type=int, default=600, help="Frames per run.")
+    parser.add_argument("--seed", type=int, default=None, help="Seed from which run seeds are derived.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes.")
+    parser.add_argument("--output", metavar="PATH", help="Write the results table to a CSV file.")
+    args = parser.parse_args(argv)
+
+    settings = load_settings()
+    grid = dict(args.grid)
+    ranges = dict(args.random)
+
+    for name in [*grid, *ranges]:
+        section, _, setting = name.partition(".")
+
+        try:
+            setting_type = settings.get_field(section, setting)["type"]
+        except KeyError as error:
+            parser.error(str(error))
+
+        if setting_type not in SWEEPABLE_TYPES or (name in ranges and setting_type not in ("int", "float")):
+            parser.error(f"Setting '{name}' of type '{setting_type}' cannot be swept this way.")
+
+    try:
+        for name, values in grid.items():
+            for value in values:
+                apply_parameters(Settings(), {name: value})
+    except ValueError as error:
+        parser.error(str(error))
+
+    rng = np.random.default_rng(args.seed)
+    points = [
+        {**grid_point, **random_point}
+        for grid_point in grid_points(grid)
+        for random_point in (random_points(ranges, args.samples, rng) if ranges else [{}])
+    ]
+    runs = create_runs(points, args.repeats, args.frames, args.seed)
+    print(f"Running {len(runs)} simulations on {args.workers} workers.", file=sys.stderr)
+
+    completed = 0
+
+    def report(_result: dict):
+        nonlocal completed
+        completed += 1
+        print(f"\r{completed}/{len(runs)}", end="", file=sys.stderr, flush=True)
+
+    results = run_sweep(runs, settings.dump_dict(), args.workers, on_result=report)
+    print(file=sys.stderr)
+    print(format_table(results))
+
+    if args.output:
+        with open(args.output, "w", newline="") as file:
+            writer = csv.DictWriter(file, fieldnames=list(results[0]) if results else RESULT_COLUMNS)
+            writer.writeheader()
+            writer.writerows(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import numpy as np
+import pytest
+
+from boids.analytics import NeighborGraph, analyze, angular_momentum, cluster_labels, cluster_sizes, polarization
+from boids.kernels import NeighborBuffer, build_cell_layout, flocking_forces
+from boids.metrics import JsonLinesSink, Metrics
+from boids.settings.settings import Settings
+from boids.simulation import setup_state, step, update_boids
+
+
+def test_polarization_and_angular_momentum():
+    aligned = np.array([[1, 0], [2, 0], [0.5, 0]], dtype=np.float32)
+    opposed = np.array([[1, 0], [-1, 0]], dtype=np.float32)
+    ring = np.array([[1, 0], [0, 1], [-1, 0], [0, -1]], dtype=np.float32)
+    circling = np.array([[0, 1], [-1, 0], [0, -1], [1, 0]], dtype=np.float32)
+
+    assert polarization(aligned) == 1.0
+    assert polarization(opposed) == 0.0
+    assert angular_momentum(ring, circling) == pytest.approx(1.0)
+    assert angular_momentum(ring, -circling) == pytest.approx(-1.0)
+    assert angular_momentum(ring, np.ones_like(ring)) == pytest.approx(0.0)
+
+
+def test_clusters_follow_neighbor_chains():
+    pairs = np.array([[0, 1], [1, 2], [3, 4]])
+    labels = cluster_labels(6, pairs)
+
+    assert labels.tolist() == [0, 0, 0, 3, 3, 5]
+    assert cluster_sizes(labels).tolist() == [3, 2, 1]
+
+    graph = NeighborGraph(pairs=pairs, nearest_distances=np.array([8, 8, 8, 5, 5, np.inf], dtype=np.float32))
+    analytics = analyze(np.zeros((6, 2)), np.ones((6, 2)), graph, frame=4)
+
+    assert (analytics.clusters, analytics.largest_cluster) == (3, 3)
+    assert analytics.nearest_distances.tolist() == [8, 8, 8, 5, 5]
+
+
+def _edges(pairs: np.ndarray) -> set[tuple[int, int]]:
+    return {(a, b) for a, b in pairs.tolist()}
+
+
+def test_kernel_records_neighbor_graph():
+    rng = np.random.default_rng(5)
+    positions = rng.uniform(0, 300, (120, 2)).astype(np.float32)
+    velocities = rng.uniform(-5, 5, (120, 2)).astype(np.float32)
+    counts = np.zeros(120, dtype=np.int32)
+    densities = np.zeros(120, dtype=np.float32)
+    neighbors = NeighborBuffer.create(120, 120)
+
+    flocking_forces(
+        positions, velocities, build_cell_layout(positions, 50), 40.0, 25, 2, 0.05, 0.1, counts, densities, neighbors
+    )
+
+    offsets = positions[:, np.newaxis] - positions[np.newaxis]
+    distances = np.sqrt((offsets**2).sum(axis=-1))
+    np.fill_diagonal(distances, np.inf)
+    expected = np.argwhere(np.triu(distances <= 40.0, k=1))
+    nearest = distances.min(axis=1)
+    nearest[nearest > 40.0] = np.inf
+
+    assert not neighbors.overflowed
+    assert _edges(neighbors.pairs()) == _edges(expected)
+    assert np.allclose(neighbors.nearest_distances, nearest, rtol=1e-4)
+
+    small = NeighborBuffer.create(120, 1)
+    flocking_forces(
+        positions, velocities, build_cell_layout(positions, 50), 40.0, 25, 2, 0.05, 0.1, counts, densities, small
+    )
+
+    assert small.overflowed
+    assert small.required_capacity == neighbors.required_capacity
+
+
+@pytest.mark.parametrize("mode", ["rules", "pairwise_rules", "compiled_kernels"])
+def test_update_boids_records_graph_without_a_second_search(mode):
+    settings = Settings()
+    settings.set("boids", "count", 80)
+
+    if mode != "rules":
+        settings.set("performance", mode, True)
+
+    state = setup_state(settings, seed=2)
+    graph = update_boids(state, settings, 1 / 60, record_graph=True)
+
+    assert graph is not None
+    assert len(graph.nearest_distances) == 80
+    assert np.all(graph.pairs[:, 0] < graph.pairs[:, 1])
+    assert (np.bincount(graph.pairs.ravel(), minlength=80) >= state.flock.neighbor_counts).all()
+    assert update_boids(state, settings, 1 / 60) is None
+
+
+def test_analytics_run_every_n_frames_and_reach_metrics(tmp_path):
+    path = tmp_path / "metrics.jsonl"
+    settings = Settings()
+    settings.set("boids", "count", 60)
+    settings.set("analytics", "interval", 3)
+    state = setup_state(settings, seed=1)
+    state.metrics = Metrics([JsonLinesSink(str(path))], interval=3600)
+    frames = []
+
+    for _ in range(7):
+        step(state, settings, 1 / 60)
+        frames.append(state.analytics.frame if state.analytics is not None else None)
+
+    state.metrics.close()
+    record = path.read_text()
+
+    assert frames == [None, None, 2, 2, 2, 5, 5]
+    assert state.analytics is not None
+    assert state.analytics.cluster_sizes.sum() == 60
+    assert '"polarization"' in record
+    assert '"nearest_neighbor_distance"' in record
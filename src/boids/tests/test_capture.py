@@ -0,0 +1,89 @@
+import struct
+import threading
+import zlib
+
+import numpy as np
+import pytest
+
+from boids.capture import FrameExporter, PipeSink, PngSequenceSink, encode_png
+
+
+def _decode_png(data: bytes) -> np.ndarray:
+    width, height = struct.unpack(">II", data[16:24])
+    length = struct.unpack(">I", data[33:37])[0]
+    rows = np.frombuffer(zlib.decompress(data[41 : 41 + length]), dtype=np.uint8).reshape(height, -1)
+
+    assert not rows[:, 0].any()
+    return rows[:, 1:].reshape(height, width, 4)
+
+
+def test_png_roundtrip():
+    pixels = np.random.default_rng(1).integers(0, 256, (7, 5, 4), dtype=np.uint8)
+    data = encode_png(pixels)
+
+    assert data.startswith(b"\x89PNG")
+    assert np.array_equal(_decode_png(data), pixels)
+
+
+class _SlowSink:
+    def __init__(self, ordered: bool):
+        self.ordered = ordered
+        self.release = threading.Event()
+        self.written: list[int] = []
+        self.closed = False
+
+    def write(self, number: int, _pixels: np.ndarray):
+        self.release.wait()
+
+        if number < 0:
+            raise OSError("disk full")
+
+        self.written.append(number)
+
+    def close(self):
+        self.closed = True
+
+
+def test_exporter_waits_only_when_the_queue_is_full():
+    sink = _SlowSink(ordered=True)
+    exporter = FrameExporter(sink, queue_size=3)
+    pixels = np.zeros((2, 2, 4), dtype=np.uint8)
+
+    for number in range(3):
+        exporter.submit(number, pixels)
+
+    assert exporter.stall_seconds == 0
+    threading.Timer(0.05, sink.release.set).start()
+    exporter.submit(3, pixels)
+    exporter.close()
+
+    assert exporter.stall_seconds > 0
+    assert sink.written == [0, 1, 2, 3]
+    assert sink.closed
+
+
+def test_exporter_raises_encoder_errors():
+    sink = _SlowSink(ordered=False)
+    sink.release.set()
+    exporter = FrameExporter(sink, workers=2)
+    exporter.submit(-1, np.zeros((1, 1, 4), dtype=np.uint8))
+
+    with pytest.raises(OSError, match="disk full"):
+        exporter.close()
+
+
+def test_png_sequence_and_pipe_sinks(tmp_path):
+    frames = [np.full((3, 4, 4), number, dtype=np.uint8) for number in range(4)]
+    png = FrameExporter(PngSequenceSink(str(tmp_path / "png")), workers=2)
+    raw_path = tmp_path / "frames.raw"
+    pipe = FrameExporter(PipeSink(f"sh -c 'cat > {raw_path}' {{width}}x{{height}}@{{fps}}", (4, 3), 60))
+
+    for number, pixels in enumerate(frames):
+        png.submit(number, pixels)
+        pipe.submit(number, pixels)
+
+    png.close()
+    pipe.close()
+
+    assert np.array_equal(_decode_png((tmp_path / "png" / "frame_000002.png").read_bytes()), frames[2])
+    assert raw_path.read_bytes() == b"".join(pixels.tobytes() for pixels in frames)
@@ -0,0 +1,74 @@
+import socket
+
+import numpy as np
+import pytest
+
+from boids.distributed import Coordinator, LocalCluster, owners, receive_message, send_message, strip_bounds
+from boids.entities import Flock
+from boids.settings.settings import Settings
+from boids.simulation import create_boids
+
+
+def test_messages_roundtrip_arrays():
+    left, right = socket.socketpair()
+    positions = np.arange(12, dtype=np.float32).reshape(6, 2)
+
+    with left, right:
+        send_message(left, "boids", {"frame": 3}, {"positions": positions, "ids": np.arange(6)})
+        send_message(left, "stop")
+        kind, meta, arrays = receive_message(right)
+
+        assert (kind, meta) == ("boids", {"frame": 3})
+        assert np.array_equal(arrays["positions"], positions)
+        assert arrays["ids"].tolist() == list(range(6))
+        assert receive_message(right) == ("stop", {}, {})
+
+
+def test_strip_bounds_follow_positions_and_keep_a_minimum_width():
+    positions = np.column_stack([np.linspace(0, 100, 300), np.zeros(300)])
+    bounds = strip_bounds(positions, 3, 1000, 50)
+
+    assert bounds[0] == 0 and bounds[-1] == 1000
+    assert np.all(np.diff(bounds) >= 50)
+    assert np.bincount(owners(positions, bounds), minlength=3).max() < 300
+
+    with pytest.raises(ValueError):
+        strip_bounds(positions, 3, 100, 50)
+
+
+def _run(workers: int, flock: Flock, settings: Settings, frames: int):
+    cluster = LocalCluster(workers)
+    coordinator = Coordinator(cluster.addresses, settings, seed=4, flock=flock)
+
+    try:
+        for _ in range(frames):
+            frame = coordinator.step(1 / 60)
+    finally:
+        coordinator.close()
+        cluster.join()
+
+    return frame, coordinator
+
+
+def test_strips_match_a_single_worker():
+    settings = Settings()
+    flock = create_boids(300, np.random.default_rng(3))
+    single, _ = _run(1, flock, settings, 5)
+    split, _ = _run(3, flock, settings, 5)
+
+    assert single.ids.tolist() == list(range(300))
+    assert np.array_equal(split.ids, single.ids)
+    assert split.counts.sum() == 300
+    assert np.allclose(split.positions, single.positions, atol=1e-3)
+    assert np.allclose(split.velocities, single.velocities, atol=1e-3)
+
+
+def test_crowded_strip_is_rebalanced():
+    settings = Settings()
+    flock = create_boids(200, np.random.default_rng(1))
+    flock.positions[:150, 0] = np.linspace(100, 400, 150)
+    frame, coordinator = _run(2, flock, settings, 2)
+
+    assert coordinator.rebalances == 1
+    assert frame.counts.max() <= 110
+    assert np.diff(coordinator.bounds).min() >= settings.get("boids", "locality_radius")
@@ -0,0 +1,82 @@
+import sys
+
+import numpy as np
+
+from boids.entities import Boid, Flock
+from boids.vector import Vector2
+
+
+def test_add_and_views():
+    flock = Flock()
+    boid = flock.add(position=Vector2(10, 20), velocity=Vector2(1, -1))
+
+    assert len(flock) == 1
+    assert boid.position == Vector2(10, 20)
+    assert boid.velocity == Vector2(1, -1)
+    assert boid[0] == 10
+    assert boid[1] == 20
+    assert flock[0] == boid
+
+
+def test_view_writes_through():
+    flock = Flock()
+    boid = flock.add(position=Vector2(0, 0), velocity=Vector2(0, 0))
+
+    boid.velocity += Vector2(2, 3)
+    boid.position += boid.velocity
+    boid.color_index = 7
+
+    assert flock[0].position == Vector2(2, 3)
+    assert flock.velocities[0].tolist() == [2, 3]
+    assert flock.color_indices[0] == 7
+    assert flock[0].color == tuple(flock.palette[7].tolist())
+
+
+def test_growth_keeps_state():
+    flock = Flock(capacity=2)
+
+    for i in range(100):
+        flock.add(position=Vector2(i, -i), velocity=Vector2(-i, i))
+
+    assert len(flock) == 100
+    assert [boid.position for boid in flock] == [Vector2(i, -i) for i in range(100)]
+    assert flock.positions.shape == (100, 2)
+
+
+def test_memory_per_boid():
+    count = 1000
+    flock = Flock()
+
+    for i in range(count):
+        flock.add(position=Vector2(i, i), velocity=Vector2(1, 0))
+
+    assert not hasattr(Boid(flock, 0), "__dict__")
+    assert flock.nbytes / count <= 32
+    assert sys.getsizeof(Boid(flock, 0)) <= 64
+
+
+def test_boids_are_identified_by_id():
+    flock = Flock()
+    first = flock.add(position=Vector2(1, 1), velocity=Vector2(0, 0))
+    second = flock.add(position=Vector2(1, 1), velocity=Vector2(0, 0))
+
+    assert flock.ids.tolist() == [0, 1]
+    assert first != second
+    assert flock[1] == second
+    assert len({first, second, flock[0]}) == 2
+
+
+def test_add_many_and_truncate():
+    flock = Flock()
+    flock.add(position=Vector2(1, 2), velocity=Vector2(3, 4))
+    added = flock.add_many(np.arange(40).reshape(20, 2), np.ones((20, 2)))
+
+    assert added == range(1, 21)
+    assert flock.positions[:3].tolist() == [[1, 2], [0, 1], [2, 3]]
+    assert flock.ids.tolist() == list(range(21))
+
+    flock.truncate(5)
+    flock.add(position=Vector2(0, 0), velocity=Vector2(0, 0))
+
+    assert len(flock) == 6
+    assert flock.ids.tolist() == [0, 1, 2, 3, 4, 21]
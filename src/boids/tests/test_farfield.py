@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from boids.farfield import AggregatePyramid
+from boids.rules import accumulate_neighbor_sums
+from boids.settings.settings import Settings
+from boids.simulation import far_field_sums, neighbor_pairs, setup_state
+
+
+def _brute_force(positions: np.ndarray, velocities: np.ndarray, radius: float):
+    offsets = positions[:, np.newaxis].astype(np.float64) - positions[np.newaxis]
+    distances = (offsets**2).sum(axis=-1)
+    within = distances <= radius * radius
+    counts = within.sum(axis=1)
+    return counts, within @ positions, within @ velocities, (within * (1 - distances / radius**2)).sum(axis=1)
+
+
+@pytest.mark.parametrize("radius", [30.0, 250.0, 1000.0])
+def test_totals_are_exact_without_a_threshold(radius):
+    rng = np.random.default_rng(8)
+    positions = np.concatenate([rng.normal(300, 40, (300, 2)), rng.uniform(0, 800, (200, 2))]).astype(np.float32)
+    velocities = rng.uniform(-5, 5, positions.shape).astype(np.float32)
+    totals, densities = AggregatePyramid(positions, velocities, 50).totals(positions, radius)
+    counts, position_sums, velocity_sums, expected_densities = _brute_force(positions, velocities, radius)
+
+    assert totals[:, 0].tolist() == counts.tolist()
+    assert np.allclose(totals[:, 1:3], position_sums, rtol=1e-6)
+    assert np.allclose(totals[:, 3:5], velocity_sums, rtol=1e-5, atol=1e-3)
+    assert np.allclose(densities, expected_densities, rtol=1e-5, atol=1e-3)
+
+
+def test_threshold_trades_accuracy_for_fewer_boid_visits():
+    rng = np.random.default_rng(9)
+    positions = rng.uniform(0, 1000, (400, 2)).astype(np.float32)
+    velocities = rng.uniform(-5, 5, positions.shape).astype(np.float32)
+    totals, _ = AggregatePyramid(positions, velocities, 50).totals(positions, 600.0, threshold=0.2)
+    counts = _brute_force(positions, velocities, 600.0)[0]
+
+    assert np.abs(totals[:, 0] - counts).mean() < 0.05 * counts.mean()
+
+
+def test_far_field_sums_match_pairwise_sums():
+    settings = Settings()
+    settings.set("boids", "count", 150)
+    state = setup_state(settings, seed=4)
+    flock = state.flock
+    pairs, distances = neighbor_pairs(state, settings, 75.0)
+    exact = accumulate_neighbor_sums(flock.positions, flock.velocities, pairs, distances, 75.0, 25)
+    approximate = far_field_sums(state, settings, 75.0, 25)
+
+    assert approximate.counts.tolist() == exact.counts.tolist()
+    assert np.allclose(approximate.position_sums, exact.position_sums, rtol=1e-6)
+    assert np.allclose(approximate.densities, exact.densities, atol=1e-3)
+    assert np.allclose(approximate.separations, exact.separations)
@@ -0,0 +1,32 @@
+import numpy as np
+
+from boids.fields import GridField
+
+
+def _plane(rows: int, columns: int, spacing: float) -> np.ndarray:
+    ys, xs = np.mgrid[0:rows, 0:columns] * spacing
+    return np.stack([2 * xs + 3 * ys + 1, xs * ys], axis=-1)
+
+
+def test_bilinear_sample_is_exact_for_bilinear_functions():
+    field = GridField(_plane(5, 7, 10.0), spacing=10.0)
+    points = np.array([[0, 0], [15, 25], [59.5, 39.5], [33.3, 12.1]], dtype=np.float32)
+    samples = field.sample(points)
+
+    assert np.allclose(samples[:, 0], 2 * points[:, 0] + 3 * points[:, 1] + 1, atol=1e-3)
+    assert np.allclose(samples[:, 1], points[:, 0] * points[:, 1], rtol=1e-4)
+
+
+def test_sample_clamps_to_edges():
+    field = GridField(_plane(3, 3, 1.0)[:, :, 0], spacing=1.0)
+    samples = field.sample(np.array([[-5, -5], [10, 10]], dtype=np.float32))
+    assert samples[:, 0].tolist() == [1, 11]
+
+
+def test_update_rows_matches_rebuild():
+    values = _plane(6, 6, 1.0)
+    field = GridField(values, spacing=1.0)
+    values[2:4] *= -1
+    field.update_rows(2, values[2:4])
+
+    assert np.array_equal(field.coefficients, GridField(values, spacing=1.0).coefficients)
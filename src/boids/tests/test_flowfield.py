@@ -0,0 +1,47 @@
+import numpy as np
+
+from boids.fields import grid_nodes
+from boids.flowfield import FlowField, NoiseFlow, Vortex, VortexFlow
+
+WORLD_SIZE = (640.0, 480.0)
+
+
+def test_incremental_advance_matches_full_evaluation():
+    source = NoiseFlow(seed=3)
+    field = FlowField.from_source(source, WORLD_SIZE, resolution=16)
+    rows = field.grid.rows
+
+    for _ in range(rows):
+        field.advance(2.0, budget=field.grid.columns)
+
+    expected = source.evaluate(grid_nodes(WORLD_SIZE, 16), 2.0)
+    assert np.allclose(field.grid.values, expected, atol=1e-5)
+
+
+def test_noise_flow_is_divergence_free():
+    nodes = grid_nodes(WORLD_SIZE, 2.0)
+    flow = NoiseFlow(seed=1).evaluate(nodes, 0.0)
+    divergence = np.gradient(flow[..., 0], 2.0, axis=1) + np.gradient(flow[..., 1], 2.0, axis=0)
+
+    assert np.abs(divergence[2:-2, 2:-2]).max() < 1e-3
+
+
+def test_vortex_spins_around_center():
+    flow = VortexFlow((Vortex(center=(320, 240), radius=50),), WORLD_SIZE)
+    field = FlowField.from_source(flow, WORLD_SIZE, resolution=8)
+    samples = field.sample(np.array([[370, 240], [320, 290]], dtype=np.float32))
+
+    assert samples[0, 1] > 0.5
+    assert samples[1, 0] < -0.5
+
+
+def test_load_from_file(tmp_path):
+    values = np.zeros((7, 9, 2), dtype=np.float32)
+    values[..., 0] = 1.0
+    path = tmp_path / "flow.npy"
+    np.save(path, values)
+
+    field = FlowField.from_file(str(path), WORLD_SIZE)
+
+    assert field.spacing == WORLD_SIZE[0] / 8
+    assert np.allclose(field.sample(np.array([[100, 100]], dtype=np.float32)), [[1, 0]])
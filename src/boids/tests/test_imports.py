@@ -0,0 +1,44 @@
+import json
+import subprocess
+import sys
+
+CORE_MODULES = [
+    "boids.entities",
+    "boids.rules",
+    "boids.spatialgrid",
+    "boids.kdtree",
+    "boids.settings.settings",
+    "boids.simulation",
+    "boids.headless",
+    "boids.capture",
+]
+
+FRONTEND_MODULES = ["pygame", "imgui", "OpenGL", "numba", "asyncio"]
+
+# Generous enough for slow CI machines; the core currently imports in well under half of this.
+IMPORT_TIME_BUDGET = 1.5
+
+
+def _import_in_fresh_interpreter(modules: list[str]) -> dict:
+    script = (
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        f"for module in {modules!r}: __import__(module)\n"
+        "elapsed = time.perf_counter() - start\n"
+        "print(json.dumps({'elapsed': elapsed, 'modules': sorted(sys.modules)}))\n"
+    )
+    output = subprocess.run([sys.executable, "-c", script], capture_output=True, check=True, text=True).stdout
+    return json.loads(output)
+
+
+def test_core_does_not_import_frontends():
+    result = _import_in_fresh_interpreter(CORE_MODULES)
+    loaded = {module.split(".")[0] for module in result["modules"]}
+
+    assert loaded.isdisjoint(FRONTEND_MODULES)
+
+
+def test_core_import_time():
+    elapsed = min(_import_in_fresh_interpreter(CORE_MODULES)["elapsed"] for _ in range(3))
+
+    assert elapsed < IMPORT_TIME_BUDGET
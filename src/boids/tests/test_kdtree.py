@@ -1,11 +1,13 @@
 from __future__ import annotations
 
 import math
+import time
 from dataclasses import dataclass
 
+import numpy as np
 from pygame.math import Vector2
 
-from boids.kdtree import KDTree, PointLike
+from boids.kdtree import FlatKDTree, KDTree, PointLike
 
 
 @dataclass
@@ -88,3 +90,112 @@ def test_range_search_unique():
     assert len(inside_points) == len(results)
     assert results_set == expected_set
 
+
+def test_flat_tree_matches_brute_force():
+    rng = np.random.default_rng(6)
+    points = np.concatenate([rng.normal(100, 10, (300, 2)), rng.uniform(0, 400, (200, 2))]).astype(np.float32)
+    tree = FlatKDTree(points, leaf_size=8)
+    starts, indices = tree.search_radius_batch(points, 25.0)
+
+    assert len(tree) == 500
+    assert tree.nbytes < 500 * 64
+
+    for query in range(0, 500, 7):
+        offsets = points - points[query]
+        expected = set(np.flatnonzero((offsets**2).sum(axis=1) <= 25.0**2).tolist())
+
+        assert set(indices[starts[query] : starts[query + 1]].tolist()) == expected
+        assert set(tree.search_radius(points[query], 25.0).tolist()) == expected
+
+
+def test_flat_tree_handles_small_inputs():
+    for count in (0, 1, 3):
+        points = np.arange(count * 2, dtype=np.float64).reshape(count, 2)
+        starts, indices = FlatKDTree(points).search_radius_batch(points, 1.0)
+
+        assert starts.tolist() == list(range(count + 1))
+        assert indices.tolist() == list(range(count))
+
+
+def _depth(node) -> int:
+    return 0 if node is None else 1 + max(_depth(node.left), _depth(node.right))
+
+
+def test_sorted_insertions_stay_balanced():
+    tree = KDTree[Entity](2)
+
+    for index in range(1000):
+        tree.insert(Entity(Vector2(index, index)))
+
+    assert len(tree) == 1000
+    assert _depth(tree.root) <= math.log(1000, 1 / 0.7) + 1
+    assert tree.root.size == 1000
+
+
+def test_removal_leaves_tombstones_until_half_are_dead():
+    tree = KDTree[Entity](2)
+    entities = [Entity(Vector2(index % 17, index // 17)) for index in range(200)]
+
+    for entity in entities:
+        tree.insert(entity)
+
+    for entity in entities[:100]:
+        tree.remove(entity)
+
+    assert len(tree) == 100
+    assert tree.tombstones == 100
+    assert sorted(tuple(entity.position) for entity in tree) == sorted(
+        tuple(entity.position) for entity in entities[100:]
+    )
+
+    tree.remove(entities[100])
+
+    assert tree.tombstones == 0
+    assert tree.root.size == 99
+
+
+def test_moved_items_are_found_at_their_new_position():
+    rng = np.random.default_rng(3)
+    entities = [Entity(Vector2(*point)) for point in rng.uniform(0, 100, (300, 2))]
+    tree = KDTree[Entity](2)
+    handles = [tree.insert(entity) for entity in entities]
+
+    for _ in range(5):
+        for entity, handle in zip(entities, handles):
+            entity.position += Vector2(*rng.uniform(-5, 5, 2))
+            tree.move(handle)
+
+    query = Entity(Vector2(50, 50))
+    expected = [entity for entity in entities if entity.position.distance_to(query.position) <= 20]
+
+    assert len(tree) == 300
+    assert tree.size + tree.tombstones == tree.root.size
+    assert sorted(tuple(entity.position) for entity in tree.search_radius(query, 20)) == sorted(
+        tuple(entity.position) for entity in expected
+    )
+
+
+def test_a_frame_of_small_moves_is_cheaper_than_a_rebuild():
+    rng = np.random.default_rng(8)
+    entities = [Entity(Vector2(*point)) for point in rng.uniform(0, 1000, (5000, 2))]
+    tree = KDTree[Entity](2)
+    handles = [tree.insert(entity) for entity in entities]
+    tree.rebuild()
+    move_seconds = rebuild_seconds = math.inf
+
+    for _ in range(3):
+        for entity, step in zip(entities, rng.normal(0, 1, (len(entities), 2))):
+            entity.position += Vector2(*step)
+
+        started_at = time.perf_counter()
+
+        for handle in handles:
+            tree.move(handle)
+
+        move_seconds = min(move_seconds, time.perf_counter() - started_at)
+        started_at = time.perf_counter()
+        tree.rebuild()
+        rebuild_seconds = min(rebuild_seconds, time.perf_counter() - started_at)
+
+    assert len(tree) == len(entities)
+    assert move_seconds < rebuild_seconds
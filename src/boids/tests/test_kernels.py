@@ -0,0 +1,140 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+from boids.entities import Flock, State
+from boids.kernels import build_cell_layout, flocking_forces
+from boids.rules import RuleContext, accumulate_neighbor_sums, alignment, cohesion, separation
+from boids.settings.settings import Settings
+from boids.spatialgrid import SpatialGrid
+from boids.vector import Vector2
+
+KERNEL_SCRIPT = """
+import sys
+import numpy as np
+from boids.kernels import build_cell_layout, flocking_forces
+
+rng = np.random.default_rng(3)
+positions = rng.uniform(0, 300, (150, 2)).astype(np.float32)
+velocities = rng.uniform(-5, 5, (150, 2)).astype(np.float32)
+counts = np.zeros(150, dtype=np.int32)
+densities = np.zeros(150, dtype=np.float32)
+layout = build_cell_layout(positions, 50)
+forces = flocking_forces(positions, velocities, layout, 60.0, 25, 2, 0.05, 0.1, counts, densities)
+np.savez(sys.argv[1], forces=forces, counts=counts, densities=densities)
+"""
+
+
+def _random_state(count: int, size: float) -> State:
+    rng = np.random.default_rng(7)
+    flock = Flock()
+    grid = SpatialGrid(2, cell_size=50)
+
+    for _ in range(count):
+        boid = flock.add(position=Vector2(*rng.uniform(0, size, 2)), velocity=Vector2(*rng.uniform(-5, 5, 2)))
+        grid.insert(boid)
+
+    return State(flock=flock, boids=grid)
+
+
+def test_build_cell_layout():
+    positions = np.array([[10, 10], [60, 10], [15, 20], [120, 70]], dtype=np.float32)
+    layout = build_cell_layout(positions, cell_size=50)
+
+    assert layout.origin == (0, 0)
+    assert (layout.columns, layout.rows) == (3, 2)
+    assert layout.cell_starts.tolist() == [0, 2, 3, 3, 3, 3, 4]
+    assert layout.order.tolist() == [0, 2, 1, 3]
+
+
+def test_flocking_forces_match_rules():
+    settings = Settings()
+    state = _random_state(200, 400)
+    locality = 75.0
+    flock = state.flock
+    neighbor_counts = np.zeros(len(flock), dtype=np.int32)
+    densities = np.zeros(len(flock), dtype=np.float32)
+
+    forces = flocking_forces(
+        flock.positions,
+        flock.velocities,
+        build_cell_layout(flock.positions, 50),
+        locality=locality,
+        separation_distance=settings.get("boids", "separation_distance"),
+        separation_strength=settings.get("boids", "separation_strength"),
+        cohesion=settings.get("boids", "cohesion") / 100,
+        alignment=settings.get("boids", "alignment") / 100,
+        neighbor_counts=neighbor_counts,
+        densities=densities,
+    )
+
+    for boid in flock:
+        neighbors = state.boids.search_radius(boid, locality)
+        context = RuleContext(boid=boid, neighbors=neighbors, state=state, settings=settings)
+        expected = cohesion(context) + separation(context) + alignment(context)
+
+        assert neighbor_counts[boid.index] == len(neighbors) - 1
+        assert np.allclose(forces[boid.index], expected, atol=1e-2)
+
+
+def test_banded_sums_match_a_single_band(monkeypatch):
+    state = _random_state(400, 1200)
+    layout = build_cell_layout(state.flock.positions, 20)
+    results = []
+
+    for cpus in (1, 8):
+        monkeypatch.setattr(os, "cpu_count", lambda cpus=cpus: cpus)
+        counts = np.zeros(len(state.flock), dtype=np.int32)
+        densities = np.zeros(len(state.flock), dtype=np.float32)
+        forces = flocking_forces(
+            state.flock.positions, state.flock.velocities, layout, 60.0, 25, 2, 0.05, 0.1, counts, densities
+        )
+        results.append((forces, counts, densities))
+
+    (forces, counts, densities), (banded_forces, banded_counts, banded_densities) = results
+
+    assert np.allclose(forces, banded_forces, atol=1e-4)
+    assert (counts == banded_counts).all()
+    assert np.allclose(densities, banded_densities, atol=1e-4)
+
+
+def test_uncompiled_kernel_matches(tmp_path):
+    """
+    Runs the kernel as plain Python, as it runs without Numba, and compares it with this process.
+    """
+    environment = {**os.environ, "NUMBA_DISABLE_JIT": "1"}
+    subprocess.run([sys.executable, "-c", KERNEL_SCRIPT, str(tmp_path / "python.npz")], check=True, env=environment)
+    subprocess.run([sys.executable, "-c", KERNEL_SCRIPT, str(tmp_path / "default.npz")], check=True)
+    interpreted = np.load(tmp_path / "python.npz")
+    default = np.load(tmp_path / "default.npz")
+
+    assert np.allclose(interpreted["forces"], default["forces"], atol=1e-3)
+    assert (interpreted["counts"] == default["counts"]).all()
+    assert np.allclose(interpreted["densities"], default["densities"], atol=1e-3)
+
+
+def test_pairwise_sums_match_rules():
+    settings = Settings()
+    state = _random_state(150, 300)
+    locality = 60.0
+    found = [(a.index, b.index, distance) for a, b, distance in state.boids.search_pairs(locality)]
+    sums = accumulate_neighbor_sums(
+        state.flock.positions,
+        state.flock.velocities,
+        np.array([(a, b) for a, b, _ in found]),
+        np.array([distance for _, _, distance in found]),
+        locality,
+        settings.get("boids", "separation_distance"),
+    )
+
+    for boid in state.flock:
+        neighbors = state.boids.search_radius(boid, locality)
+        context = RuleContext(boid=boid, neighbors=neighbors, state=state, settings=settings)
+        summed = RuleContext(boid=boid, neighbors=[], state=state, settings=settings, sums=sums)
+
+        assert sums.counts[boid.index] == len(neighbors)
+        assert np.allclose(cohesion(summed), cohesion(context), atol=1e-3)
+        assert np.allclose(separation(summed), separation(context), atol=1e-3)
+        assert np.allclose(alignment(summed), alignment(context), atol=1e-3)
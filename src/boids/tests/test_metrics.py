@@ -0,0 +1,60 @@
+import json
+import urllib.request
+
+import numpy as np
+
+from boids.metrics import COUNT_BUCKETS, Histogram, JsonLinesSink, Metrics, PrometheusSink
+from boids.settings.settings import Settings
+from boids.simulation import setup_state, step
+
+
+def test_histogram_quantiles():
+    histogram = Histogram(bounds=[float(bound) for bound in range(1, 101)])
+    histogram.observe_many(np.arange(1, 101, dtype=np.float64))
+
+    assert histogram.count == 100
+    assert histogram.quantile(0.5) == 50
+    assert histogram.quantile(0.99) == 99
+    assert histogram.maximum == 100
+
+
+def test_step_records_metrics_to_json_lines(tmp_path):
+    path = tmp_path / "metrics.jsonl"
+    settings = Settings()
+    settings.set("boids", "count", 50)
+    state = setup_state(settings)
+    state.metrics = Metrics([JsonLinesSink(str(path))], interval=3600)
+
+    for _ in range(5):
+        step(state, settings, 1 / 60)
+        state.metrics.end_frame()
+
+    state.metrics.close()
+    record = json.loads(path.read_text().splitlines()[-1])
+
+    assert record["frames"] == 5
+    assert record["histograms"]["step_seconds"]["count"] == 5
+    assert record["histograms"]["neighbor_search_seconds"]["count"] == 5
+    assert record["histograms"]["cell_occupancy"]["sum"] == 5 * 50
+    assert record["gauges"]["boid_count"] == 50
+
+
+def test_prometheus_endpoint_serves_cumulative_histograms():
+    sink = PrometheusSink(port=0)
+    metrics = Metrics([sink], interval=3600)
+
+    try:
+        for value in (1, 2, 3):
+            metrics.observe("neighbors_max", value, COUNT_BUCKETS)
+
+        metrics.flush()
+        metrics.observe("neighbors_max", 4, COUNT_BUCKETS)
+        metrics.flush()
+
+        with urllib.request.urlopen(f"http://127.0.0.1:{sink.port}/metrics") as response:
+            text = response.read().decode()
+    finally:
+        sink.close()
+
+    assert 'boids_neighbors_max_bucket{le="2"} 2' in text
+    assert "boids_neighbors_max_count 4" in text
@@ -0,0 +1,41 @@
+import numpy as np
+
+from boids.obstacles import Circle, Mask, ObstacleField, Polygon
+
+WORLD_SIZE = (400.0, 300.0)
+
+
+def test_circle_field():
+    field = ObstacleField([Circle(center=(200, 150), radius=50)], WORLD_SIZE, resolution=4)
+    distances, gradients = field.sample(np.array([[200, 150], [280, 150], [200, 90]], dtype=np.float32))
+
+    assert np.allclose(distances, [-50, 30, 10], atol=2)
+    assert gradients[1, 0] > 0.9
+    assert gradients[2, 1] < -0.9
+
+
+def test_polygon_sign():
+    square = Polygon(vertices=((100, 100), (200, 100), (200, 200), (100, 200)))
+    distances = square.signed_distance(np.array([[150, 150], [150, 90], [250, 250]], dtype=np.float32))
+
+    assert np.allclose(distances, [-50, 10, 50 * np.sqrt(2)])
+    assert square.triangles().shape == (2, 3, 2)
+
+
+def test_mask_field():
+    pixels = np.zeros((30, 40), dtype=bool)
+    pixels[10:20, 10:20] = True
+    field = ObstacleField([Mask(pixels=pixels)], WORLD_SIZE, resolution=10)
+    distances, _ = field.sample(np.array([[150, 150], [50, 150]], dtype=np.float32))
+
+    assert distances[0] < 0
+    assert 40 <= distances[1] <= 60
+    assert len(field.triangles) == 2 * 100
+
+
+def test_steering_points_away():
+    field = ObstacleField([Circle(center=(200, 150), radius=50)], WORLD_SIZE, resolution=4)
+    steering = field.steering(np.array([[260, 150], [390, 150]], dtype=np.float32), distance=20, strength=10)
+
+    assert steering[0, 0] > 0
+    assert np.allclose(steering[1], 0)
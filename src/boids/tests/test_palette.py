@@ -0,0 +1,24 @@
+import numpy as np
+
+from boids.constants import BOID_COLOR, PALETTE_SIZE
+from boids.palette import get_palette, hsl_to_rgb, to_palette_indices
+
+
+def test_palette_shapes():
+    for mode in ["none", "heading", "speed", "neighbors", "density"]:
+        assert get_palette(mode).shape == (PALETTE_SIZE, 4)
+
+
+def test_solid_palette():
+    assert np.allclose(get_palette("none"), BOID_COLOR)
+
+
+def test_heading_palette_matches_hsl():
+    palette = get_palette("heading")
+    assert np.allclose(palette[64], hsl_to_rgb(64 / PALETTE_SIZE, 0.8, 0.5))
+
+
+def test_to_palette_indices():
+    indices = np.zeros(4, dtype=np.uint8)
+    to_palette_indices(np.array([-1.0, 0.0, 0.5, 2.0], dtype=np.float32), indices)
+    assert indices.tolist() == [0, 0, 127, PALETTE_SIZE - 1]
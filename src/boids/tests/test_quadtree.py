@@ -0,0 +1,121 @@
+import numpy as np
+import pytest
+
+from boids.entities import Flock
+from boids.quadtree import QuadTree
+from boids.settings.settings import Settings
+from boids.simulation import setup_state, step, update_boid_count
+from boids.vector import Vector2
+
+
+def _clustered(count: int, seed: int, dimensions: int = 2) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.uniform(-200, 600, (4, dimensions))
+    return centers[rng.integers(0, 4, count)] + rng.normal(0, 8, (count, dimensions))
+
+
+def _check_structure(tree: QuadTree):
+    for position, handle in enumerate(tree.handles):
+        assert handle.position == position
+        assert handle.leaf.handles[handle.slot] is handle
+        assert handle.leaf.contains(tree._point(handle.item))
+
+    leaves = list(tree.leaves())
+    assert sum(len(leaf.items) for leaf in leaves) == len(tree) == tree.root.count
+    assert all(len(leaf.items) <= tree.capacity or leaf.size / 2 < tree.min_size for leaf in leaves)
+
+
+@pytest.mark.parametrize("dimensions", [2, 3])
+def test_search_radius_and_nearest_match_brute_force(dimensions):
+    points = [tuple(point) for point in _clustered(400, dimensions, dimensions).tolist()]
+    tree = QuadTree(dimensions, capacity=8)
+
+    for point in points:
+        tree.insert(point)
+
+    _check_structure(tree)
+    assert tree.depth() > 3
+    array = np.array(points)
+
+    for query in points[:30]:
+        squared = ((array - query) ** 2).sum(axis=1)
+        distances: list[float] = []
+        found = tree.search_radius(query, 12.0, distances)
+
+        assert sorted(found) == sorted(p for p, d in zip(points, squared) if d <= 144.0)
+        assert np.allclose(sorted(distances), np.sort(squared[squared <= 144.0]))
+
+        nearest_distances: list[float] = []
+        nearest = tree.nearest(query, 5, nearest_distances)
+
+        assert len(nearest) == 5
+        assert np.allclose(nearest_distances, np.sort(squared)[:5])
+
+
+def test_search_pairs_visits_every_pair_once():
+    positions = _clustered(300, 3).astype(np.float32)
+    flock = Flock()
+    tree = QuadTree(2, capacity=6)
+
+    for x, y in positions.tolist():
+        tree.insert(flock.add(position=Vector2(x, y), velocity=Vector2(0, 0)))
+
+    found = [(a.index, b.index) for a, b, _ in tree.search_pairs(10.0)]
+    offsets = positions[:, np.newaxis] - positions[np.newaxis]
+    expected = np.argwhere(np.triu((offsets**2).sum(axis=-1) <= 10.0**2, k=1))
+
+    assert len(found) == len(set(found))
+    assert {tuple(sorted(pair)) for pair in found} == {(a, b) for a, b in expected.tolist()}
+
+
+def test_moves_and_removals_refile_items_and_collapse_leaves():
+    rng = np.random.default_rng(7)
+    flock = Flock()
+    tree = QuadTree(2, capacity=4)
+    handles = [
+        tree.insert(flock.add(position=Vector2(x, y), velocity=Vector2(0, 0)))
+        for x, y in rng.uniform(0, 100, (200, 2)).tolist()
+    ]
+
+    for _ in range(3):
+        flock.positions[:] += rng.normal(0, 15, flock.positions.shape)
+        moved = tree.displaced(flock.positions)
+
+        for index in moved.tolist():
+            tree.move(tree.handles[index])
+
+        assert not len(tree.displaced(flock.positions))
+        _check_structure(tree)
+
+    leaves = len(list(tree.leaves()))
+
+    for handle in handles[:190]:
+        tree.discard(handle)
+
+    _check_structure(tree)
+    assert len(tree) == 10
+    assert len(list(tree.leaves())) < leaves
+
+
+def test_quadtree_backend_matches_the_grid():
+    results = []
+
+    for backend in ["grid", "quadtree"]:
+        settings = Settings()
+        settings.set("boids", "count", 120)
+        settings.set("performance", "spatial_index", backend)
+        settings.set("performance", "double_buffered", True)
+        state = setup_state(settings, seed=3)
+
+        for _ in range(3):
+            step(state, settings, 1 / 60)
+
+        settings.set("boids", "count", 90)
+        update_boid_count(state, settings)
+        step(state, settings, 1 / 60)
+        results.append(state.flock.positions.copy())
+
+        assert len(state.boids) == 90
+
+    assert isinstance(state.boids, QuadTree)
+    assert np.allclose(results[0], results[1], atol=1e-3)
@@ -0,0 +1,92 @@
+import json
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from boids.ringbuffer import RingReader, RingWriter
+
+
+@pytest.fixture
+def writer():
+    ring = RingWriter(capacity=100, slots=3)
+    yield ring
+    ring.close()
+
+
+def _frame(count: int, value: float) -> tuple[np.ndarray, np.ndarray]:
+    return np.full((count, 2), value, dtype=np.float32), np.full((count, 2), -value, dtype=np.float32)
+
+
+def test_reader_maps_the_newest_frame_without_copying(writer):
+    reader = RingReader(writer.name)
+
+    assert reader.latest() is None
+
+    for frame in range(5):
+        writer.write(frame, *_frame(10 + frame, frame))
+
+    latest = reader.latest()
+
+    assert (latest.frame, len(latest.positions)) == (4, 14)
+    assert latest.positions[0].tolist() == [4, 4]
+    assert latest.velocities[0].tolist() == [-4, -4]
+    assert not latest.positions.flags.owndata
+    assert reader.is_current(latest)
+
+    writer.write(5, *_frame(10, 5))
+    writer.write(6, *_frame(10, 6))
+
+    assert reader.is_current(latest)
+
+    writer.write(7, *_frame(10, 7))
+
+    assert not reader.is_current(latest)
+    assert reader.read().frame == 7
+
+    del latest
+    reader.close()
+
+
+def test_reader_skips_a_slot_being_written(writer):
+    reader = RingReader(writer.name)
+    writer.write(0, *_frame(3, 1))
+    reader._views.slot_headers[0][0] += 1
+
+    assert reader.latest() is None
+    assert reader.read() is None
+
+    reader._views.slot_headers[0][0] += 1
+
+    assert reader.read().positions.tolist() == [[1, 1]] * 3
+
+    reader.close()
+
+
+def test_writer_rejects_more_boids_than_capacity(writer):
+    with pytest.raises(ValueError, match="holds 100"):
+        writer.write(0, *_frame(101, 0))
+
+
+def test_reader_in_another_process(writer):
+    writer.write(41, *_frame(20, 2.5))
+    script = (
+        "import json, sys\n"
+        "from boids.ringbuffer import RingReader\n"
+        f"reader = RingReader({writer.name!r})\n"
+        "frame = reader.read()\n"
+        "print(json.dumps([frame.frame, frame.positions.sum().item()]))\n"
+        "reader.close()\n"
+    )
+    output = subprocess.run([sys.executable, "-c", script], capture_output=True, check=True, text=True).stdout
+
+    assert json.loads(output) == [41, 100.0]
+
+    writer.write(42, *_frame(20, 1))
+
+    reader = RingReader(writer.name)
+
+    assert reader.read().frame == 42
+
+    reader.close()
@@ -0,0 +1,52 @@
+import numpy as np
+
+from boids.scheduler import UpdateScheduler, sweep_order
+from boids.settings.settings import Settings
+from boids.simulation import setup_state, update_boids
+
+
+def test_batches_sweep_the_flock_in_cell_order():
+    positions = np.random.default_rng(2).uniform(0, 500, (1000, 2)).astype(np.float32)
+    scheduler = UpdateScheduler()
+    scheduler.cost = 1e-3
+    batches = [scheduler.batch(positions, 50, budget=0.1) for _ in range(10)]
+    cells = np.floor(positions[np.concatenate(batches)] / 50)
+
+    assert [len(batch) for batch in batches] == [100] * 10
+    assert sorted(np.concatenate(batches).tolist()) == list(range(1000))
+    assert np.all(np.diff(cells[:, 1] * 10 + cells[:, 0]) >= 0)
+
+    batches = [scheduler.batch(positions, 50, budget=0.1) for _ in range(10)]
+
+    assert np.array_equal(np.concatenate(batches), sweep_order(positions, 50))
+    assert scheduler.update_rates.tolist() == [0.1] * 1000
+
+
+def test_batch_size_follows_measured_cost():
+    positions = np.zeros((5000, 2), dtype=np.float32)
+    scheduler = UpdateScheduler()
+
+    assert len(scheduler.batch(positions, 50, budget=0.01)) == 256
+
+    scheduler.record(0.02, 256)
+
+    assert 120 <= len(scheduler.batch(positions, 50, budget=0.01)) <= 130
+
+
+def test_boids_outside_the_batch_keep_their_velocity():
+    settings = Settings()
+    settings.set("boids", "count", 400)
+    settings.set("performance", "frame_budget_ms", 1.0)
+    state = setup_state(settings, seed=5)
+    positions = state.flock.positions.copy()
+    velocities = state.flock.velocities.copy()
+    update_boids(state, settings, 1 / 60)
+
+    batch = state.scheduler.order[: state.scheduler.cursor]
+    idle = np.setdiff1d(np.arange(400), batch)
+    speed = settings.get("boids", "speed") / 60
+
+    assert 0 < len(batch) < 400
+    assert np.array_equal(state.flock.velocities[idle], velocities[idle])
+    assert np.allclose(state.flock.positions[idle], (positions[idle] + velocities[idle] * speed) % (1920, 1080))
+    assert not np.array_equal(state.flock.velocities[batch], velocities[batch])
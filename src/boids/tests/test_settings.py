@@ -0,0 +1,45 @@
+import json
+import time
+
+from boids.settings.settings import Settings, SettingsWriter, save_settings
+
+
+def test_save_settings_is_atomic(tmp_path):
+    path = tmp_path / "settings.json"
+    settings = Settings()
+    settings.set("boids", "count", 123)
+    save_settings(settings, str(path))
+
+    assert json.loads(path.read_text())["boids"]["count"] == 123
+    assert [file.name for file in tmp_path.iterdir()] == ["settings.json"]
+
+
+def test_writer_debounces_requests(tmp_path):
+    path = tmp_path / "settings.json"
+    writer = SettingsWriter(str(path), delay=0.2)
+    settings = Settings()
+
+    for count in range(1, 50):
+        settings.set("boids", "count", count)
+        writer.request(settings)
+
+    assert not path.exists()
+
+    deadline = time.monotonic() + 5
+
+    while not path.exists() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    writer.close()
+    assert json.loads(path.read_text())["boids"]["count"] == 49
+
+
+def test_close_flushes_pending(tmp_path):
+    path = tmp_path / "settings.json"
+    writer = SettingsWriter(str(path), delay=60)
+    settings = Settings()
+    settings.set("boids", "count", 7)
+    writer.request(settings)
+    writer.close()
+
+    assert json.loads(path.read_text())["boids"]["count"] == 7
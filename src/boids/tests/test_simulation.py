@@ -0,0 +1,101 @@
+import numpy as np
+
+from boids.constants import SCREEN_HEIGHT, SCREEN_WIDTH
+from boids.rules import RuleContext, limit_position
+from boids.settings.settings import Settings
+from boids.simulation import setup_state, update_boid_count, update_boids
+from boids.vector import Vector2
+
+
+def _settings(double_buffered: bool) -> Settings:
+    settings = Settings()
+    settings.set("boids", "count", 120)
+    settings.set("performance", "double_buffered", double_buffered)
+    return settings
+
+
+def _run(settings: Settings, reverse: bool) -> np.ndarray:
+    state = setup_state(settings, seed=7)
+
+    for _ in range(3):
+        if reverse:
+            state.boids.items.reverse()
+
+        update_boids(state, settings, 1 / 60)
+
+    return state.flock.positions.copy()
+
+
+def test_double_buffered_steps_do_not_depend_on_visit_order():
+    settings = _settings(double_buffered=True)
+
+    assert np.array_equal(_run(settings, reverse=False), _run(settings, reverse=True))
+
+    settings = _settings(double_buffered=False)
+
+    assert not np.array_equal(_run(settings, reverse=False), _run(settings, reverse=True))
+
+
+def test_double_buffered_step_reads_the_previous_frame():
+    settings = _settings(double_buffered=True)
+    state = setup_state(settings, seed=3)
+    previous = state.flock.positions.copy()
+    update_boids(state, settings, 1 / 60)
+
+    assert not np.array_equal(state.flock.positions, previous)
+    assert np.array_equal(state.flock.back_buffers()[0], previous)
+    assert (state.flock.positions >= 0).all()
+    assert (state.flock.positions < (SCREEN_WIDTH, SCREEN_HEIGHT)).all()
+
+
+def test_rules_leave_the_boid_unchanged():
+    settings = _settings(double_buffered=False)
+    state = setup_state(settings, seed=1)
+    boid = state.flock[0]
+    boid.position = boid.position + Vector2(SCREEN_WIDTH, 0)
+    limit_position(RuleContext(boid=boid, neighbors=[], state=state, settings=settings))
+
+    assert boid.position.x >= SCREEN_WIDTH
+
+
+def test_index_refiles_boids_that_changed_cells():
+    settings = _settings(double_buffered=False)
+    state = setup_state(settings, seed=4)
+    index = state.boids
+
+    for _ in range(5):
+        update_boids(state, settings, 1 / 10)
+
+    cell_size = state.boids.cell_size
+
+    assert state.boids is index
+    assert len(index) == 120
+
+    for coords, cell in index.grid.items():
+        for boid in cell.items:
+            assert (int(boid[0] // cell_size), int(boid[1] // cell_size)) == coords
+
+
+def test_count_changes_keep_existing_boids():
+    settings = _settings(double_buffered=False)
+    state = setup_state(settings, seed=6)
+    update_boids(state, settings, 1 / 60)
+    flock = state.flock
+    positions = flock.positions.copy()
+    velocities = flock.velocities.copy()
+
+    settings.set("boids", "count", 300)
+    update_boid_count(state, settings)
+
+    assert state.flock is flock
+    assert np.array_equal(flock.positions[:120], positions)
+    assert np.array_equal(flock.velocities[:120], velocities)
+    assert len(state.boids) == len(state.index_cells) == 300
+
+    settings.set("boids", "count", 50)
+    update_boid_count(state, settings)
+    update_boids(state, settings, 1 / 60)
+
+    assert flock.ids.tolist() == list(range(50))
+    assert sorted(boid.index for boid in state.boids) == list(range(50))
+    assert [handle.item.index for handle in state.boids.handles] == list(range(50))
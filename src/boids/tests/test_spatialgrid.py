@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from boids.entities import Flock
+from boids.spatialgrid import SpatialGrid
+from boids.vector import Vector2
+
+
+def _grid(positions: np.ndarray, cell_size: float = 20) -> SpatialGrid:
+    flock = Flock()
+    grid = SpatialGrid(2, cell_size=cell_size)
+
+    for x, y in positions.tolist():
+        grid.insert(flock.add(position=Vector2(x, y), velocity=Vector2(0, 0)))
+
+    return grid
+
+
+def test_search_pairs_visits_every_pair_once():
+    positions = np.random.default_rng(2).uniform(-60, 200, (150, 2)).astype(np.float32)
+    grid = _grid(positions)
+    found = [(a.index, b.index) for a, b, _ in grid.search_pairs(45.0)]
+    offsets = positions[:, np.newaxis] - positions[np.newaxis]
+    expected = np.argwhere(np.triu((offsets**2).sum(axis=-1) <= 45.0**2, k=1))
+
+    assert len(found) == len(set(found))
+    assert {tuple(sorted(pair)) for pair in found} == {(a, b) for a, b in expected.tolist()}
+
+
+@pytest.mark.parametrize("dimensions", [2, 3, 4])
+def test_search_radius_matches_brute_force(dimensions):
+    rng = np.random.default_rng(dimensions)
+    points = [tuple(point) for point in rng.uniform(-100, 100, (300, dimensions)).tolist()]
+    grid = SpatialGrid(dimensions, cell_size=15)
+
+    for point in points:
+        grid.insert(point)
+
+    for query in points[:40]:
+        distances: list[float] = []
+        found = grid.search_radius(query, 35.0, distances)
+        expected = [point for point in points if sum((a - b) ** 2 for a, b in zip(point, query)) <= 35.0**2]
+
+        assert sorted(found) == sorted(expected)
+        assert distances == pytest.approx([sum((a - b) ** 2 for a, b in zip(point, query)) for point in found])
+
+
+def test_stencil_skips_unreachable_corners():
+    grid = SpatialGrid(2, cell_size=10)
+    stencil = grid.stencil(25.0)
+
+    assert (3, 3) not in stencil
+    assert (3, 0) in stencil
+    assert grid.stencil(25.0) is stencil
+
+
+def test_handles_remove_and_move_items():
+    flock = Flock()
+    grid = SpatialGrid(2, cell_size=10)
+    boids = [flock.add(position=Vector2(5, 5), velocity=Vector2(0, 0)) for _ in range(4)]
+    handles = [grid.insert(boid) for boid in boids]
+
+    grid.discard(handles[1])
+
+    assert [boid.id for boid in grid] == [0, 3, 2]
+    assert grid.search(boids[1]) is None
+    assert grid.search(boids[2]) == boids[2]
+
+    boids[0].position = Vector2(35, 5)
+    grid.move(handles[0])
+    grid.discard(handles[3])
+
+    assert [boid.id for boid in grid.search_radius(Vector2(5, 5), 1.0)] == [2]
+    assert [boid.id for boid in grid.search_radius(Vector2(35, 5), 1.0)] == [0]
+
+    grid.remove(boids[2])
+    grid.remove(boids[0])
+
+    assert len(grid) == 0
+    assert not grid.grid
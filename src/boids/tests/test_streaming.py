@@ -0,0 +1,135 @@
+import asyncio
+import socket
+
+import numpy as np
+import pytest
+
+from boids.entities import Flock
+from boids.streaming import ClientStats, FrameDecoder, FrameEncoder, StreamClient, StreamServer, quantize
+from boids.vector import Vector2
+
+WORLD_SIZE = (1920.0, 1080.0)
+
+
+def _random_flock(count: int, seed: int = 0) -> Flock:
+    rng = np.random.default_rng(seed)
+    flock = Flock(capacity=count)
+
+    for _ in range(count):
+        x, y = rng.uniform((0, 0), WORLD_SIZE)
+        vx, vy = rng.uniform(-5, 5, size=2)
+        flock.add(position=Vector2(x, y), velocity=Vector2(vx, vy))
+
+    return flock
+
+
+def test_round_trip_within_quantization_error():
+    flock = _random_flock(500)
+    encoder = FrameEncoder(keyframe_interval=10)
+    decoder = FrameDecoder()
+
+    for number in range(5):
+        flock.positions[:] += flock.velocities
+        np.clip(flock.positions, 0, WORLD_SIZE, out=flock.positions)
+        values = quantize(flock.positions, flock.velocities, WORLD_SIZE)
+        frame = decoder.decode(encoder.encode(number, values, WORLD_SIZE))
+        headings = np.arctan2(flock.velocities[:, 1], flock.velocities[:, 0]) % (2 * np.pi)
+        heading_error = np.abs((frame.headings - headings + np.pi) % (2 * np.pi) - np.pi)
+
+        assert frame.number == number
+        assert frame.is_keyframe == (number == 0)
+        assert np.abs(frame.positions - flock.positions).max() < 0.05
+        assert heading_error.max() < 1e-3
+
+
+def test_frames_are_smaller_than_raw_floats():
+    flock = _random_flock(10_000)
+    encoder = FrameEncoder()
+    raw_size = flock.positions.nbytes + flock.velocities.nbytes
+
+    keyframe = encoder.encode(0, quantize(flock.positions, flock.velocities, WORLD_SIZE), WORLD_SIZE)
+    flock.positions[:] += 0.5
+    delta = encoder.encode(1, quantize(flock.positions, flock.velocities, WORLD_SIZE), WORLD_SIZE)
+
+    assert len(keyframe) < raw_size / 2
+    assert len(delta) < raw_size / 4
+
+
+def test_stream_to_local_client():
+    flock = _random_flock(100)
+    server = StreamServer(keyframe_interval=3)
+    server.start()
+
+    async def receive_frames() -> list:
+        client = StreamClient()
+        await client.connect("127.0.0.1", server.port)
+
+        while not server.clients:
+            await asyncio.sleep(0.01)
+
+        frames = []
+
+        for number in range(5):
+            server.publish(flock, number)
+            frames.append(await client.receive())
+
+        await client.close()
+        return frames
+
+    try:
+        frames = asyncio.run(receive_frames())
+    finally:
+        server.stop()
+
+    assert [frame.number for frame in frames] == list(range(5))
+    assert [frame.is_keyframe for frame in frames] == [True, False, False, False, True]
+    assert np.abs(frames[-1].positions - flock.positions).max() < 0.05
+
+
+def test_slow_client_gets_latest_frame_and_drops_the_rest():
+    flock = _random_flock(20_000)
+    server = StreamServer(keyframe_interval=1)
+    server.start()
+    published = 50
+
+    async def receive_after_backlog() -> tuple[list, ClientStats]:
+        client = StreamClient()
+        await client.connect("127.0.0.1", server.port)
+
+        while not server.clients:
+            await asyncio.sleep(0.01)
+
+        stats = server.clients[0]
+
+        # Publish much faster than the client reads: nothing is read until every frame is out.
+        for number in range(published):
+            server.publish(flock, number)
+
+        await asyncio.sleep(0.2)
+        numbers = []
+
+        while not numbers or numbers[-1] != published - 1:
+            numbers.append((await asyncio.wait_for(client.receive(), timeout=5)).number)
+
+        await client.close()
+        return numbers, stats
+
+    try:
+        numbers, stats = asyncio.run(receive_after_backlog())
+    finally:
+        server.stop()
+
+    assert numbers == sorted(numbers)
+    assert len(numbers) < published
+    assert stats.frames_dropped > 0
+    assert stats.frames_sent + stats.frames_dropped <= published
+
+
+def test_start_reports_busy_port():
+    with socket.socket() as occupied:
+        occupied.bind(("127.0.0.1", 0))
+        occupied.listen()
+        server = StreamServer(port=occupied.getsockname()[1])
+
+        with pytest.raises(OSError):
+            server.start()
@@ -0,0 +1,47 @@
+import pytest
+
+from boids.settings.settings import Settings
+from boids.sweep import SweepRun, apply_parameters, create_runs, grid_points, run_simulation, run_sweep
+
+
+def test_grid_runs_get_distinct_seeds():
+    points = grid_points({"boids.cohesion": [1, 5], "boids.alignment": [0, 10, 20]})
+    runs = create_runs(points, repeats=2, frames=10, seed=3)
+
+    assert len(points) == 6
+    assert len(runs) == 12
+    assert len({run.seed for run in runs}) == 12
+    assert runs == create_runs(points, repeats=2, frames=10, seed=3)
+
+
+def test_runs_with_the_same_seed_are_reproducible():
+    run = SweepRun(parameters={"boids.count": 40, "boids.cohesion": 5.0}, seed=11, frames=5)
+    first = run_simulation(run, Settings().dump_dict())
+    second = run_simulation(run, Settings().dump_dict())
+
+    assert first["boids.cohesion"] == 5
+    assert first["polarization"] == second["polarization"]
+    assert first["clusters"] == second["clusters"]
+
+
+def test_sweep_on_process_pool():
+    runs = create_runs(grid_points({"boids.count": [20, 30]}), repeats=1, frames=3, seed=1)
+    results = run_sweep(runs, Settings().dump_dict(), workers=2)
+
+    assert [result["boids.count"] for result in results] == [20, 30]
+    assert all(result["frames_per_second"] > 0 for result in results)
+
+
+def test_apply_parameters_rejects_unsupported_settings():
+    settings = Settings()
+    apply_parameters(settings, {"boids.count": "12.6", "boundary.enabled": "false", "boids.color_by": "speed"})
+
+    assert settings.get("boids", "count") == 13
+    assert settings.get("boundary", "enabled") is False
+    assert settings.get("boids", "color_by") == "speed"
+
+    with pytest.raises(ValueError):
+        apply_parameters(settings, {"boundary.top_left": "1"})
+
+    with pytest.raises(ValueError):
+        apply_parameters(settings, {"boids.color_by": "rainbow"})
@@ -0,0 +1,60 @@
+import numpy as np
+
+from boids.settings.settings import Settings
+from boids.simulation import setup_state, update_boids
+from boids.verlet import VerletList, candidate_pairs
+
+
+def _brute_force(positions: np.ndarray, radius: float) -> set[tuple[int, int]]:
+    offsets = positions[:, np.newaxis] - positions[np.newaxis]
+    return {(i, j) for i, j in np.argwhere((offsets**2).sum(axis=-1) <= radius * radius).tolist()}
+
+
+def _listed(lists) -> set[tuple[int, int]]:
+    rows = np.repeat(np.arange(len(lists.starts) - 1), np.diff(lists.starts))
+    return set(zip(rows.tolist(), lists.indices.tolist()))
+
+
+def test_candidate_pairs_match_brute_force():
+    positions = np.random.default_rng(1).uniform(-50, 400, (300, 2)).astype(np.float32)
+    rows, columns = candidate_pairs(positions, 45.0)
+
+    assert set(zip(rows.tolist(), columns.tolist())) == _brute_force(positions, 45.0)
+    assert np.all(np.diff(rows) >= 0)
+
+
+def test_lists_are_reused_until_a_boid_moves_half_the_skin():
+    rng = np.random.default_rng(4)
+    positions = rng.uniform(0, 300, (200, 2)).astype(np.float32)
+    verlet = VerletList(skin=10)
+
+    for _ in range(12):
+        lists = verlet.neighbors(positions, 40.0)
+
+        assert _listed(lists) == _brute_force(positions, 40.0)
+
+        positions += rng.uniform(-1, 1, positions.shape).astype(np.float32)
+
+    # Each boid moves at most sqrt(2) per frame, so the lists last at least three frames.
+    assert 1 < verlet.rebuilds <= 4
+
+    positions[0] += 6
+    verlet.neighbors(positions, 40.0)
+    rebuilds = verlet.rebuilds
+    verlet.neighbors(positions, 50.0)
+
+    assert verlet.rebuilds == rebuilds + 1
+
+
+def test_update_boids_with_verlet_lists():
+    settings = Settings()
+    settings.set("boids", "count", 100)
+    settings.set("performance", "verlet_skin", 10)
+    state = setup_state(settings, seed=3)
+    positions = state.flock.positions.copy()
+    update_boids(state, settings, 1 / 60)
+
+    expected = [sum(1 for i, _ in _brute_force(positions, 75.0) if i == index) - 1 for index in range(100)]
+
+    assert state.verlet is not None
+    assert state.flock.neighbor_counts.tolist() == expected
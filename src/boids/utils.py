@@ -1,2 +1,23 @@
+import argparse
+
+
 def clamp(min_value: float, max_value: float, value: float) -> float:
     return min(max(min_value, value), max_value)
+
+
+def parse_address(value: str) -> tuple[str, int]:
+    host, _, port = value.rpartition(":")
+
+    if not host or not port.isdigit():
+        raise argparse.ArgumentTypeError(f"Expected HOST:PORT, got '{value}'.")
+
+    return host, int(port)
+
+
+def parse_size(value: str) -> tuple[int, int]:
+    width, _, height = value.partition("x")
+
+    if not width.isdigit() or not height.isdigit() or not int(width) or not int(height):
+        raise argparse.ArgumentTypeError(f"Expected WIDTHxHEIGHT, got '{value}'.")
+
+    return int(width), int(height)
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import math
+from typing import Iterator, Sequence
+
+
+class Vector2:
+    """
+    Minimal 2D vector with the subset of the `pygame.math.Vector2` API used by
+    the simulation core, so that the core does not have to import pygame.
+    """
+
+    __slots__ = ("x", "y")
+
+    def __init__(self, x: float | Sequence[float] = 0.0, y: float | None = None):
+        if y is None:
+            if isinstance(x, (int, float)):
+                self.x = self.y = x
+            else:
+                self.x, self.y = x  # type: ignore[misc]
+        else:
+            self.x = x
+            self.y = y
+
+    @property
+    def xy(self) -> tuple[float, float]:
+        return (self.x, self.y)
+
+    def length(self) -> float:
+        return math.hypot(self.x, self.y)
+
+    def length_squared(self) -> float:
+        return self.x * self.x + self.y * self.y
+
+    def normalize(self) -> Vector2:
+        length = math.hypot(self.x, self.y)
+
+        if length == 0:
+            raise ValueError("Can't normalize Vector of length zero")
+
+        return Vector2(self.x / length, self.y / length)
+
+    def rotate_rad(self, angle: float) -> Vector2:
+        cos = math.cos(angle)
+        sin = math.sin(angle)
+        return Vector2(self.x * cos - self.y * sin, self.x * sin + self.y * cos)
+
+    def distance_to(self, other: Vector2) -> float:
+        return math.hypot(self.x - other.x, self.y - other.y)
+
+    def __add__(self, other: Vector2) -> Vector2:
+        return Vector2(self.x + other.x, self.y + other.y)
+
+    def __sub__(self, other: Vector2) -> Vector2:
+        return Vector2(self.x - other.x, self.y - other.y)
+
+    def __iadd__(self, other: Vector2) -> Vector2:
+        self.x += other.x
+        self.y += other.y
+        return self
+
+    def __isub__(self, other: Vector2) -> Vector2:
+        self.x -= other.x
+        self.y -= other.y
+        return self
+
+    def __mul__(self, scalar: float) -> Vector2:
+        return Vector2(self.x * scalar, self.y * scalar)
+
+    __rmul__ = __mul__
+
+    def __imul__(self, scalar: float) -> Vector2:
+        self.x *= scalar
+        self.y *= scalar
+        return self
+
+    def __truediv__(self, scalar: float) -> Vector2:
+        return Vector2(self.x / scalar, self.y / scalar)
+
+    def __itruediv__(self, scalar: float) -> Vector2:
+        self.x /= scalar
+        self.y /= scalar
+        return self
+
+    def __neg__(self) -> Vector2:
+        return Vector2(-self.x, -self.y)
+
+    def __getitem__(self, index: int) -> float:
+        return (self.x, self.y)[index]
+
+    def __setitem__(self, index: int, value: float):
+        if index in (0, -2):
+            self.x = value
+        elif index in (1, -1):
+            self.y = value
+        else:
+            raise IndexError("Vector2 index out of range")
+
+    def __iter__(self) -> Iterator[float]:
+        yield self.x
+        yield self.y
+
+    def __len__(self) -> int:
+        return 2
+
+    def __eq__(self, other: object) -> bool:
+        try:
+            return len(other) == len(self) and self.x == other[0] and self.y == other[1]  # type: ignore[arg-type, index]
+        except TypeError:
+            return NotImplemented
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        return f"Vector2({self.x}, {self.y})"